@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """
+    Состояние одного ключа в памяти.
+
+    Attributes
+    __________
+    state: Optional[str] - состояние FSM
+    data: Dict[str, Any] - данные FSM
+    updated_at: float - время последнего изменения (clock())
+    """
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в SQLite с горячим слоем в памяти.
+
+    Чтения и записи идут в горячий слой (LRU не больше max_entries ключей); изменённые ключи
+    пачкой сбрасываются в таблицу t_fsm раз в flush_interval секунд, при накоплении batch_size
+    изменений и при close. Ключи, которые не менялись дольше ttl секунд, удаляются
+    и из памяти, и из SQLite, поэтому брошенные сценарии не копятся.
+
+    Файл может быть общим для нескольких процессов бота (webhook-воркеры). Запросы к SQLite
+    идут в цикле событий, поэтому база работает в режиме WAL (чтения не ждут записи),
+    а занятый файл ждём не дольше busy_timeout секунд. Если сброс не удался, изменения
+    остаются в памяти и записываются следующим сбросом.
+    """
+
+    def __init__(self, path: str = "fsm_storage.db", ttl: float = 7 * 24 * 3600,
+                 flush_interval: float = 5, batch_size: int = 500, max_entries: int = 10000,
+                 busy_timeout: float = 0.2, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path (str): Файл SQLite.
+            ttl (float): Через сколько секунд без изменений состояние пользователя забывается.
+            flush_interval (float): Как часто (в секундах) сбрасывать изменения в SQLite.
+            batch_size (int): При скольких несброшенных изменениях сбрасывать, не дожидаясь таймера.
+            max_entries (int): Максимальное число ключей в памяти (несброшенные ключи не вытесняются).
+            busy_timeout (float): Сколько секунд ждать, пока другой процесс освободит файл.
+            clock (Callable[[], float]): Источник текущего времени в секундах.
+        """
+        self._path = path
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._max_entries = max_entries
+        self._busy_timeout = busy_timeout
+        self._clock = clock
+        self._hot: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self.counters = {"hits": 0, "misses": 0, "flushes": 0, "written": 0, "expired": 0, "failed_flushes": 0}
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.business_connection_id or "", key.chat_id, key.thread_id or "",
+            key.user_id, key.destiny
+        ))
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение открывается заново, если в хранилище пишут уже после close
+        # (например, фоновые задачи, завершающиеся при остановке бота)
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout)
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS t_fsm (
+                        key TEXT PRIMARY KEY,
+                        state TEXT,
+                        data TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS i_fsm_updated_at ON t_fsm (updated_at)')
+                conn.commit()
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: StorageKey) -> _Entry:
+        name = self._key(key)
+        entry = self._hot.get(name)
+        if entry is not None and entry.updated_at >= self._clock() - self._ttl:
+            self.counters["hits"] += 1
+            self._hot.move_to_end(name)
+            return entry
+
+        self.counters["misses"] += 1
+        row = self._connection().execute(
+            'SELECT state, data, updated_at FROM t_fsm WHERE key = ? AND updated_at >= ?',
+            (name, self._clock() - self._ttl)
+        ).fetchone()
+        # Отсутствующий ключ тоже кэшируем: get_state вызывается на каждое сообщение
+        entry = _Entry(row[0], json.loads(row[1]), row[2]) if row else _Entry(None, {}, self._clock())
+        self._hot[name] = entry
+        self._dirty.discard(name)
+        self._evict()
+        return entry
+
+    def _put(self, key: StorageKey, entry: _Entry):
+        name = self._key(key)
+        entry.updated_at = self._clock()
+        self._hot[name] = entry
+        self._hot.move_to_end(name)
+        self._dirty.add(name)
+        if len(self._dirty) >= self._batch_size:
+            self._try_flush()
+        self._evict()
+        self._start_flusher()
+
+    def _evict(self):
+        if len(self._hot) <= self._max_entries:
+            return
+        # Вытесняем только сброшенные ключи, поэтому сначала сбрасываем изменения
+        if self._dirty:
+            self._try_flush()
+        for name in list(self._hot):
+            if len(self._hot) <= self._max_entries:
+                break
+            if name not in self._dirty:
+                del self._hot[name]
+
+    def _try_flush(self):
+        # Ошибка сброса не должна доходить до обработчика сообщения: изменения останутся в памяти
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось сбросить состояния FSM в SQLite, повторим позже: {e}")
+
+    def _start_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            self._try_flush()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = self._get(key)
+        state = state.state if isinstance(state, State) else state
+        self._put(key, _Entry(state, entry.data, entry.updated_at))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._get(key).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = self._get(key)
+        self._put(key, _Entry(entry.state, dict(data), entry.updated_at))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(self._get(key).data)
+
+    def flush(self):
+        """
+        Пачкой записывает изменённые ключи в SQLite (пустые — удаляет)
+        и удаляет ключи, не менявшиеся дольше ttl. Если запись не удалась,
+        ключи остаются несброшенными, а ошибка пробрасывается.
+        """
+        dirty, self._dirty = self._dirty, set()
+        try:
+            expired = self._write(dirty)
+        except Exception:
+            self._dirty |= dirty
+            self.counters["failed_flushes"] += 1
+            raise
+
+        cutoff = self._clock() - self._ttl
+        for name in [name for name, entry in self._hot.items() if entry.updated_at < cutoff]:
+            del self._hot[name]
+        self.counters["flushes"] += 1
+        self.counters["expired"] += expired
+
+    def _write(self, dirty: Set[str]) -> int:
+        upserts, deletes = [], []
+        for name in dirty:
+            entry = self._hot.get(name)
+            if entry is None:
+                continue
+            if entry.state is None and not entry.data:
+                deletes.append((name,))
+            else:
+                upserts.append((name, entry.state, json.dumps(entry.data, ensure_ascii=False), entry.updated_at))
+
+        conn = self._connection()
+        with conn:
+            conn.executemany('''
+                INSERT INTO t_fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+            ''', upserts)
+            conn.executemany('DELETE FROM t_fsm WHERE key = ?', deletes)
+            expired = conn.execute('DELETE FROM t_fsm WHERE updated_at < ?', (self._clock() - self._ttl,)).rowcount
+        self.counters["written"] += len(upserts) + len(deletes)
+        return expired
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Ключи в памяти, несброшенные изменения, попадания и промахи горячего слоя,
+        сбросы (удачные и нет), записанные и удалённые по TTL ключи.
+        """
+        return {"entries": len(self._hot), "dirty": len(self._dirty), **self.counters}
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновый сброс, сбрасывает изменения и закрывает соединение.
+        Повторный вызов безопасен.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._dirty:
+            try:
+                # При остановке ждём освобождения файла дольше, чтобы не потерять последние изменения
+                self._connection().execute('PRAGMA busy_timeout = 30000')
+                self.flush()
+            except sqlite3.Error as e:
+                logger.exception(f"Не удалось сбросить состояния FSM при остановке: {e}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач бота с ограниченным пулом воркеров.
+
+    Задачи одного чата выполняются строго по очереди и в порядке поступления:
+    пока воркер занят задачей чата, следующая задача этого чата ждёт, а другие воркеры
+    берут задачи других чатов.
+
+    Задача с ключом не ставится, если задача с тем же ключом этого чата ещё ждёт или выполняется:
+    так двойное нажатие не запускает разбор сообщения второй раз. Объединять одинаковые вызовы
+    внутри разбора бесполезно — задачи одного чата и так не выполняются одновременно.
+    """
+
+    def __init__(self, workers: int = 8, max_size: int = 1000):
+        """
+        Args:
+            workers (int): Число воркеров.
+            max_size (int): Максимальное число ожидающих задач; сверх него submit отказывает.
+        """
+        self._workers = workers
+        self._max_size = max_size
+        self._chats: Dict[int, Deque[Tuple[Callable[[], Awaitable], float, Optional[Hashable]]]] = {}
+        # Ключи ожидающих и выполняющихся задач: (чат, ключ)
+        self._keys: Set[Tuple[int, Hashable]] = set()
+        self._ready: "asyncio.Queue[int]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._pending = 0
+        self.counters = Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def start(self):
+        """
+        Запускает воркеры. Повторный вызов ничего не делает.
+        """
+        if self._tasks:
+            return
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self._workers)]
+
+    def submit(self, chat_id: int, job: Callable[[], Awaitable], key: Optional[Hashable] = None) -> bool:
+        """
+        Ставит задачу в очередь чата.
+
+        Args:
+            chat_id (int): Чат, в порядке которого выполняется задача.
+            job (Callable[[], Awaitable]): Функция, возвращающая корутину задачи.
+            key (Optional[Hashable]): Ключ задачи, например текст сообщения. None — без проверки повторов.
+        Returns:
+            bool: False, если задача не принята: очередь переполнена или задача с тем же ключом
+            этого чата уже ждёт или выполняется (см. has_job).
+        """
+        if key is not None and (chat_id, key) in self._keys:
+            self.counters["coalesced"] += 1
+            return False
+        if self._pending >= self._max_size:
+            self.counters["rejected"] += 1
+            return False
+        self._pending += 1
+        self.counters["submitted"] += 1
+        self.counters["max_depth"] = max(self.counters["max_depth"], self._pending)
+        if key is not None:
+            self._keys.add((chat_id, key))
+
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            # Чат простаивает — сразу отдаём его воркерам
+            self._chats[chat_id] = deque([(job, time.monotonic(), key)])
+            self._ready.put_nowait(chat_id)
+        else:
+            queue.append((job, time.monotonic(), key))
+        return True
+
+    def has_job(self, chat_id: int, key: Hashable) -> bool:
+        """
+        Ждёт или выполняется ли задача чата с ключом key.
+        """
+        return (chat_id, key) in self._keys
+
+    async def close(self, timeout: float = 30):
+        """
+        Дожидается выполнения принятых задач (не дольше timeout секунд) и останавливает воркеры.
+        """
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Очередь задач не опустела за {timeout} с, осталось {self._pending}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Глубина очереди, число задач (в том числе не поставленных повторов) и среднее/максимальное время ожидания и выполнения.
+        """
+        done = self.counters["completed"] + self.counters["failed"]
+        return {
+            "depth": self._pending,
+            "max_depth": self.counters["max_depth"],
+            "submitted": self.counters["submitted"],
+            "completed": self.counters["completed"],
+            "failed": self.counters["failed"],
+            "rejected": self.counters["rejected"],
+            "coalesced": self.counters["coalesced"],
+            "avg_wait": self._wait_total / done if done else 0.0,
+            "max_wait": self._wait_max,
+            "avg_run": self._run_total / done if done else 0.0,
+            "max_run": self._run_max,
+        }
+
+    async def _drain(self):
+        while self._pending:
+            await asyncio.sleep(0.05)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats[chat_id]
+            job, submitted_at, key = queue.popleft()
+
+            started = time.monotonic()
+            try:
+                await job()
+                self.counters["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["failed"] += 1
+                logger.exception(f"Ошибка в фоновой задаче чата {chat_id}: {e}")
+            finally:
+                finished = time.monotonic()
+                self._wait_total += started - submitted_at
+                self._wait_max = max(self._wait_max, started - submitted_at)
+                self._run_total += finished - started
+                self._run_max = max(self._run_max, finished - started)
+                self._pending -= 1
+                self._keys.discard((chat_id, key))
+                if queue:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
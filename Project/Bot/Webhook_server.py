@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import queue
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from Bot.Job_queue import JobQueue
+
+"""
+Вебхук-режим бота для продакшена: python -m Bot.Webhook_server --url https://example.com --workers 4
+
+Основной процесс принимает обновления Telegram в aiohttp-приложении и раскладывает их
+по N процессам-воркерам по from_user.id. Все обновления одного пользователя попадают
+в один воркер, поэтому его FSM-состояние и порядок сообщений остаются локальными для процесса,
+а разные пользователи обрабатываются на разных ядрах.
+
+Файлы SQLite у воркеров общие: fsm_storage.db, client_DB, gpt_cache.db и gpt_usage.db.
+Отдельные файлы на воркер не годятся: кэш и учёт расхода пришлось бы собирать по воркерам,
+а при смене числа воркеров пользователь попадал бы к воркеру без своих данных. Поэтому каждое
+хранилище работает в режиме WAL (чтения не ждут записи) и ждёт занятый файл не дольше busy_timeout.
+client_DB пишется в потоках пула с повторами. FSM, кэш и учёт расхода работают в цикле событий,
+поэтому копят записи в памяти и сбрасывают их пачками; пачка, которую не удалось записать
+из-за занятого файла, остаётся в памяти до следующего сброса.
+
+Настройки по умолчанию можно переопределить в Bot/credentials.py:
+WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET.
+"""
+try:
+    from Bot.credentials import WEBHOOK_URL
+except ImportError:
+    WEBHOOK_URL = None
+try:
+    from Bot.credentials import WEBHOOK_PATH
+except ImportError:
+    WEBHOOK_PATH = "/webhook"
+try:
+    from Bot.credentials import WEBHOOK_SECRET
+except ImportError:
+    WEBHOOK_SECRET = None
+
+"""
+- SHARD_QUEUE_SIZE: сколько обновлений может ждать у одного воркера; сверх этого вебхук отвечает 503
+  и Telegram повторит доставку позже;
+- DRAIN_TIMEOUT: сколько секунд при остановке ждать, пока воркеры обработают принятые обновления.
+"""
+SHARD_QUEUE_SIZE = 1000
+DRAIN_TIMEOUT = 30
+
+# Поля обновления, в которых Telegram передаёт объект с отправителем from
+UPDATE_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+    "chat_join_request", "message_reaction",
+)
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """
+    Возвращает Telegram ID пользователя, от которого пришло обновление.
+
+    Args:
+        update (Dict[str, Any]): Обновление Telegram в виде JSON.
+    Returns:
+        Optional[int]: from.id (или user.id у poll_answer/message_reaction) либо None,
+        если у обновления нет пользователя.
+    """
+    for field in UPDATE_FIELDS:
+        item = update.get(field)
+        if isinstance(item, dict):
+            user = item.get("from") or item.get("user")
+            if user and "id" in user:
+                return int(user["id"])
+    return None
+
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    """
+    Номер воркера для обновления: по from_user.id, а без пользователя — по update_id.
+    """
+    key = update_user_id(update)
+    if key is None:
+        key = int(update.get("update_id", 0))
+    return key % workers
+
+
+async def _process_updates(updates, bot, dp, jobs: JobQueue):
+    loop = asyncio.get_running_loop()
+    while True:
+        update = await loop.run_in_executor(None, updates.get)
+        if update is None:
+            return
+        user_id = update_user_id(update)
+        # Обновления одного пользователя — по порядку, разных — параллельно
+        accepted = jobs.submit(user_id if user_id is not None else -update.get("update_id", 0),
+                               lambda update=update: dp.feed_raw_update(bot, update))
+        if not accepted:
+            logger.warning(f"Обновление {update.get('update_id')} отброшено: очередь воркера переполнена")
+
+
+def run_worker(index: int, updates: "multiprocessing.Queue", concurrency: int):
+    """
+    Точка входа процесса-воркера: поднимает своего бота (Bot/bot.py) и обрабатывает
+    обновления из очереди updates, пока не получит None. Перед выходом дожидается
+    обработки принятых обновлений и вызывает shutdown-обработчики бота.
+
+    Args:
+        index (int): Номер воркера (для логов).
+        updates (multiprocessing.Queue): Очередь обновлений этого воркера.
+        concurrency (int): Сколько пользователей воркер обслуживает одновременно.
+    """
+    logging.basicConfig(level=logging.INFO)
+    from Bot.bot import bot, dp
+
+    async def main():
+        jobs = JobQueue(workers=concurrency, max_size=SHARD_QUEUE_SIZE)
+        jobs.start()
+        await dp.emit_startup(bot=bot)
+        try:
+            await _process_updates(updates, bot, dp, jobs)
+        finally:
+            await jobs.close(DRAIN_TIMEOUT)
+            await dp.emit_shutdown(bot=bot)
+            await bot.session.close()
+            logger.info(f"Воркер {index} остановлен: {jobs.stats()}")
+
+    asyncio.run(main())
+
+
+class WebhookServer:
+    """
+    Приём вебхуков Telegram и раздача обновлений по процессам-воркерам.
+
+    Attributes
+    __________
+    workers: int - число процессов-воркеров
+    queues: List[multiprocessing.Queue] - очередь обновлений каждого воркера
+    processes: List[multiprocessing.Process] - процессы-воркеры
+    counters: Dict[str, int] - принятые, отклонённые (503) и отброшенные обновления
+    """
+
+    def __init__(self, workers: int = 4, concurrency: int = 8, path: str = WEBHOOK_PATH,
+                 secret: Optional[str] = WEBHOOK_SECRET):
+        """
+        Args:
+            workers (int): Число процессов-воркеров.
+            concurrency (int): Сколько пользователей каждый воркер обслуживает одновременно.
+            path (str): Путь вебхука.
+            secret (Optional[str]): Секрет, который Telegram присылает в X-Telegram-Bot-Api-Secret-Token.
+        """
+        self.workers = workers
+        self.concurrency = concurrency
+        self.path = path
+        self.secret = secret
+        self.queues: List[multiprocessing.Queue] = []
+        self.processes: List[multiprocessing.Process] = []
+        self.counters = {"accepted": 0, "rejected": 0, "forbidden": 0}
+        self._draining = False
+
+    def start_workers(self):
+        """
+        Запускает процессы-воркеры.
+        """
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            updates = context.Queue(maxsize=SHARD_QUEUE_SIZE)
+            process = context.Process(target=run_worker, args=(index, updates, self.concurrency),
+                                      name=f"bot-worker-{index}")
+            process.start()
+            self.queues.append(updates)
+            self.processes.append(process)
+
+    def stop_workers(self, timeout: float = DRAIN_TIMEOUT):
+        """
+        Плавная остановка: новые обновления больше не принимаются, каждому воркеру
+        отправляется None после уже принятых обновлений, и процессы дожидаются.
+        Не завершившиеся за timeout процессы останавливаются принудительно.
+        """
+        self._draining = True
+        for updates in self.queues:
+            updates.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} не завершился за {timeout} с, останавливаем")
+                process.terminate()
+                process.join()
+        self.queues, self.processes = [], []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """
+        Обработчик вебхука: кладёт обновление в очередь воркера и сразу отвечает 200.
+        """
+        if self.secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            self.counters["forbidden"] += 1
+            return web.Response(status=403)
+        if self._draining:
+            return web.Response(status=503)
+
+        update = await request.json()
+        shard = shard_for(update, len(self.queues))
+        try:
+            self.queues[shard].put_nowait(update)
+        except queue.Full:
+            # Telegram повторит доставку, порядок обновлений пользователя сохранится
+            self.counters["rejected"] += 1
+            return web.Response(status=503)
+        self.counters["accepted"] += 1
+        return web.Response()
+
+    async def health(self, request: web.Request) -> web.Response:
+        """
+        Состояние сервера: живые воркеры, размеры их очередей и счётчики обновлений.
+        """
+        shards = []
+        for process, updates in zip(self.processes, self.queues):
+            try:
+                size = updates.qsize()
+            except NotImplementedError:
+                size = None
+            shards.append({"name": process.name, "alive": process.is_alive(), "queued": size})
+        return web.json_response({"shards": shards, **self.counters})
+
+    def make_app(self) -> web.Application:
+        """
+        Создаёт aiohttp-приложение с вебхуком и /health. Воркеры запускаются при старте
+        приложения и плавно останавливаются при его завершении.
+        """
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.router.add_get("/health", self.health)
+
+        async def on_startup(app):
+            self.start_workers()
+
+        async def on_shutdown(app):
+            await asyncio.get_running_loop().run_in_executor(None, self.stop_workers)
+
+        app.on_startup.append(on_startup)
+        app.on_shutdown.append(on_shutdown)
+        return app
+
+
+async def set_webhook(url: str, path: str = WEBHOOK_PATH, secret: Optional[str] = WEBHOOK_SECRET):
+    """
+    Регистрирует вебхук в Telegram.
+
+    Args:
+        url (str): Публичный адрес сервера, например https://example.com.
+    """
+    from aiogram import Bot
+    from Bot.credentials import API_TOKEN
+
+    bot = Bot(token=API_TOKEN)
+    try:
+        await bot.set_webhook(url.rstrip("/") + path, secret_token=secret)
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Вебхук-сервер бота с несколькими процессами-воркерами")
+    parser.add_argument("--url", default=WEBHOOK_URL, help="публичный адрес для регистрации вебхука")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(set_webhook(args.url))
+    server = WebhookServer(workers=args.workers, concurrency=args.concurrency)
+    print("Бот запущен")
+    web.run_app(server.make_app(), host=args.host, port=args.port)
@@ -1,11 +1,12 @@
 from aiogram import Bot, Dispatcher, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 import asyncio
+from typing import Optional
 from aiogram.types import FSInputFile
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import Counter
 import logging
 
 """
@@ -25,31 +26,75 @@ import sys
 sys.path.append('project')
 
 from Todoist.Todoist_module import TodoistModule
-from Database.Database import ClientsDB, Errors
+from Database.Database import Errors
+from Database.Async_database import AsyncClientsDB
 from Calendar.Calendar_module import CalendarModule
 from GPT.GPT_module import GPT
-from Request import RequestType
+from GPT.Cache import normalize_text
+from GPT.Rate_limiter import RateLimitExceeded
+from Request import Request, RequestType
 from Query import Query
+from Deadline import Deadline, DeadlineExceeded
+from Bot.Job_queue import JobQueue
+from Bot.Fsm_storage import SQLiteStorage
 from Bot.credentials import API_TOKEN
+try:
+    from Bot.credentials import ADMIN_IDS
+except ImportError:
+    ADMIN_IDS = ()
+try:
+    from Bot.credentials import QUICK_PREFIXES
+except ImportError:
+    QUICK_PREFIXES = {"!": "task", "@": "event"}
 
 """
 Создаём объекты бота и диспетчера.
 - Bot: для отправки и получения сообщений.
 - Dispatcher: отвечает за маршрутизацию сообщений к нужным обработчикам.
+- storage: состояния FSM в SQLite (fsm_storage.db) с горячим слоем в памяти;
+  переживают перезапуск, а брошенные сценарии забываются через неделю.
 """
 bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+storage = SQLiteStorage("fsm_storage.db")
 dp = Dispatcher(storage=storage)
 
 """
 Инициализация базы данных, CalendarModule и GPT:
-- db: для работы с локальной БД (sqlite3)
+- db: для работы с локальной БД (sqlite3) в отдельном потоке, чтобы не блокировать бота
 - calendar: для взаимодействия с Google Calendar
 - gpt_parser: для парсинга сообщений с помощью GPT
 """
-db = ClientsDB("client_DB")
+db = AsyncClientsDB("client_DB")
 calendar = CalendarModule()
-gpt_parser = GPT()
+gpt_parser = GPT(cache_path="gpt_cache.db", usage_path="gpt_usage.db")
+
+"""
+Бюджет времени на обработку одного сообщения (в секундах):
+- MESSAGE_BUDGET: на всё сообщение, включая запись в Calendar/Todoist;
+- PARSE_BUDGET: из него на разбор сообщения GPT. Если GPT не успел — разбираем локально.
+message_paths считает, как часто срабатывает каждый путь: llm, local_fallback, timeout.
+"""
+MESSAGE_BUDGET = 25
+PARSE_BUDGET = 15
+message_paths = Counter()
+
+"""
+Очередь фоновых задач: обработчик ставит разбор и запись в Calendar/Todoist в очередь
+и сразу отвечает "Обрабатываю…"; воркеры редактируют это сообщение результатом.
+- JOB_WORKERS: число одновременно обрабатываемых сообщений;
+- JOB_QUEUE_SIZE: сколько сообщений может ждать; сверх этого пользователь получает отказ.
+"""
+JOB_WORKERS = 8
+JOB_QUEUE_SIZE = 1000
+jobs = JobQueue(workers=JOB_WORKERS, max_size=JOB_QUEUE_SIZE)
+
+"""
+Быстрое добавление без определения типа запроса:
+- команды /t <текст> (задача) и /e <текст> (событие);
+- префиксы в начале сообщения: QUICK_PREFIXES (префикс -> "task" или "event"),
+  по умолчанию "!" — задача, "@" — событие. Переопределяются в Bot/credentials.py.
+"""
+QUICK_TYPES = {"task": RequestType.GOAL, "event": RequestType.EVENT}
 
 """
 Определение состояний:
@@ -89,19 +134,170 @@ def get_main_menu_keyboard() -> types.ReplyKeyboardMarkup:
     )
     return keyboard
 
-def is_user_registered(telegram_id: str) -> bool:
+async def is_user_registered(telegram_id: str) -> bool:
     """
     Проверяет, есть ли у пользователя (telegram_id) в БД данные
-    для Google Calendar и Todoist.
+    для Google Calendar и Todoist. Запись берётся из кэша ClientsDB.
 
     Args:
         telegram_id (str): Telegram ID пользователя.
     Returns:
         bool: True, если и calendar_id, и todoist_token найдены, иначе False.
     """
-    calendar_id = db.get_calendar_id(telegram_id)
-    todoist_token = db.get_todoist_token(telegram_id)
-    return bool(calendar_id and todoist_token)
+    client = await db.get_client(telegram_id)
+    return bool(client and client.google_calendar_id and client.todoist_token)
+
+async def parse_with_deadline(content: Query, deadline: Deadline,
+                              request_type: Optional[RequestType] = None) -> Optional[Request]:
+    """
+    Разбирает сообщение через GPT в пределах бюджета времени.
+    Если GPT не уложился или перегружен, пробует локальный разбор без LLM.
+
+    Args:
+        content (Query): Запрос пользователя.
+        deadline (Deadline): Бюджет времени на сообщение.
+        request_type (Optional[RequestType]): Тип, известный заранее; тогда он не определяется.
+    Returns:
+        Optional[Request]: Разобранный запрос или None, если тип не определён.
+    Raises:
+        DeadlineExceeded: если GPT не успел, а локально разобрать не удалось.
+        RateLimitExceeded: если GPT перегружен, а локально разобрать не удалось.
+    """
+    try:
+        parsed_request = await gpt_parser.parse_message(content, deadline.sub(PARSE_BUDGET), request_type)
+        message_paths["llm"] += 1
+        return parsed_request
+    except (DeadlineExceeded, RateLimitExceeded) as e:
+        parsed_request = gpt_parser.parse_locally(content, request_type)
+        if parsed_request is None:
+            message_paths["timeout" if isinstance(e, DeadlineExceeded) else "throttled"] += 1
+            raise
+        message_paths["local_fallback"] += 1
+        return parsed_request
+    finally:
+        logger.info(f"Пути обработки сообщений: {dict(message_paths)}")
+
+async def save_parsed_request(telegram_id: str, parsed_request: Optional[Request],
+                              deadline: Deadline) -> Optional[str]:
+    """
+    Сохраняет разобранный запрос: событие — в Google Calendar, задачу — в Todoist.
+
+    Returns:
+        Optional[str]: Текст результата для пользователя или None, если запрос не разобран
+        или его тип не определён.
+    """
+    client = await db.get_client(telegram_id)
+    if client is None:
+        return None
+    if parsed_request and parsed_request.type == RequestType.EVENT:
+        response = await calendar.create_event(parsed_request, client.google_calendar_id, deadline)
+        if response is None:
+            return f"Событие '{parsed_request.body}' успешно добавлено в Google Calendar."
+        return f"Не удалось добавить событие в Google Calendar. Ошибка: {response}"
+    if parsed_request and parsed_request.type == RequestType.GOAL:
+        todoist_module = TodoistModule(client.todoist_token)
+        response = await todoist_module.create_task(parsed_request, deadline)
+        if response is None:
+            return f"Задача '{parsed_request.body}' успешно добавлена в Todoist."
+        return f"Не удалось добавить задачу в Todoist. Ошибка: {response}"
+    return None
+
+async def process_request(message: types.Message, state: FSMContext, status: types.Message,
+                          text: str, request_type: Optional[RequestType], deadline: Deadline,
+                          expected_state: Optional[str], failure_text: str):
+    """
+    Фоновая задача очереди jobs: разбирает сообщение, сохраняет событие или задачу
+    и заменяет статусное сообщение "Обрабатываю…" результатом.
+
+    Args:
+        status (types.Message): Статусное сообщение, которое редактируется результатом.
+        text (str): Текст запроса.
+        request_type (Optional[RequestType]): Тип, известный заранее, или None.
+        deadline (Deadline): Бюджет времени на сообщение; время в очереди тоже входит в него.
+        expected_state (Optional[str]): Состояние пользователя на момент постановки в очередь.
+            Состояние сбрасывается, только если пользователь с тех пор его не сменил.
+        failure_text (str): Ответ, если запрос не удалось разобрать.
+    """
+    telegram_id = str(message.from_user.id)
+    try:
+        content = Query(
+            client_id=telegram_id,
+            current_time=datetime.now(),
+            content=text
+        )
+        parsed_request = await parse_with_deadline(content, deadline, request_type)
+        logger.info(f"Parsed request: {parsed_request}")
+
+        reply = await save_parsed_request(telegram_id, parsed_request, deadline)
+        if reply is None:
+            await status.edit_text(failure_text)
+            if request_type is None:
+                await message.answer("Пожалуйста, выберите действие из меню.", reply_markup=get_main_menu_keyboard())
+            return
+
+        await status.edit_text(reply)
+        if await state.get_state() == expected_state:
+            await state.clear()
+        await message.answer("Что хотите сделать дальше?", reply_markup=get_main_menu_keyboard())
+    except (DeadlineExceeded, RateLimitExceeded):
+        await status.edit_text("Сервис сейчас отвечает слишком долго. Пожалуйста, попробуйте ещё раз через минуту.")
+    except Exception as e:
+        logger.exception(f"Произошла ошибка: {e}")
+        await status.edit_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
+    finally:
+        logger.info(f"Очередь задач: {jobs.stats()}")
+
+async def enqueue_request(message: types.Message, state: FSMContext, text: str,
+                          request_type: Optional[RequestType], failure_text: str):
+    """
+    Ставит разбор и сохранение сообщения в очередь jobs и сразу отвечает "Обрабатываю…".
+    Сообщения одного чата обрабатываются по порядку; повтор сообщения, которое ещё
+    обрабатывается (двойное нажатие), в очередь не ставится.
+
+    Args:
+        text (str): Текст запроса.
+        request_type (Optional[RequestType]): Тип, известный заранее, или None.
+        failure_text (str): Ответ, если запрос не удалось разобрать.
+    """
+    deadline = Deadline(MESSAGE_BUDGET)
+    expected_state = await state.get_state()
+    status = await message.answer("Обрабатываю…")
+    key = (normalize_text(text), request_type)
+    accepted = jobs.submit(message.chat.id, lambda: process_request(
+        message, state, status, text, request_type, deadline, expected_state, failure_text
+    ), key)
+    if not accepted and jobs.has_job(message.chat.id, key):
+        await status.edit_text("Это сообщение уже обрабатывается.")
+    elif not accepted:
+        logger.warning(f"Очередь задач переполнена: {jobs.stats()}")
+        await status.edit_text("Сейчас слишком много запросов. Пожалуйста, попробуйте ещё раз через минуту.")
+
+async def quick_add(message: types.Message, state: FSMContext, request_type: RequestType, text: str):
+    """
+    Быстрое добавление (/t, /e, префиксы): тип уже известен, поэтому классификация
+    и повторные запросы типа пропускаются.
+
+    Args:
+        request_type (RequestType): Событие или задача.
+        text (str): Текст без команды или префикса.
+    """
+    try:
+        telegram_id = str(message.from_user.id)
+        if not await is_user_registered(telegram_id):
+            await message.answer("Пожалуйста, отправьте команду /start для начала работы.")
+            return
+
+        text = text.strip()
+        if not text:
+            await message.answer("Напишите текст после команды, например: /t купить продукты")
+            return
+
+        message_paths["quick_add"] += 1
+        await enqueue_request(message, state, text, request_type,
+                              "Не удалось разобрать сообщение. Пожалуйста, попробуйте сформулировать иначе.")
+    except Exception as e:
+        logger.exception(f"Произошла ошибка: {e}")
+        await message.answer("Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 @dp.message(Command("start"))
 async def start_handler(message: types.Message, state: FSMContext):
@@ -121,7 +317,7 @@ async def start_handler(message: types.Message, state: FSMContext):
 
 
 
-    if is_user_registered(telegram_id):
+    if await is_user_registered(telegram_id):
         await message.answer("Вы уже зарегистрированы.", reply_markup=get_main_menu_keyboard())
     else:
         calendar_image = FSInputFile("/Users/svatoslavpolonskiy/Documents/Deep_python/telegram-todo-with-gpt/Project/Bot/google_png.png")
@@ -159,6 +355,8 @@ async def info_handler(message: types.Message):
         "/update_todoist - обновить Todoist API токен\n"
         "/status - проверить текущие идентификаторы (Google Calendar ID и Todoist API токен)\n"
         "/info - посмотреть команды бота\n"
+        "/t <текст> - сразу добавить задачу в Todoist\n"
+        "/e <текст> - сразу добавить событие в Google Calendar\n"
         "Добавить событие - создать событие в Google Calendar\n"
         "Добавить задачу - создать задачу в Todoist\n\n"
         "Такие дела. 📖"
@@ -243,7 +441,7 @@ async def process_todoist_token(message: types.Message, state: FSMContext):
         return
 
     # Если токен валидный, продолжаем регистрацию
-    result = db.add_client(telegram_id, google_calendar_id, todoist_token)
+    result = await db.add_client(telegram_id, google_calendar_id, todoist_token)
     if result == Errors.INTEGRITY_ERROR.value:
         await message.answer("Вы уже зарегистрированы.", reply_markup=get_main_menu_keyboard())
     elif isinstance(result, Exception):
@@ -262,10 +460,7 @@ async def unreg_handler(message: types.Message):
     2) Сообщает о завершении операции.
     """
     telegram_id = str(message.from_user.id)
-    cursor = db.conn.cursor()
-    cursor.execute('DELETE FROM t_client WHERE telegram_id = ?', (telegram_id,))
-    db.conn.commit()
-    cursor.close()
+    await db.delete_client(telegram_id)
 
     await message.answer_sticker("CAACAgIAAxkBAAENXV1nZpOnX_PwZ4Xsmr1CSLBipbB6JQACml0AAp1FOEuRZgX-KGhUnjYE") # вы успешно отписались
 
@@ -278,12 +473,11 @@ async def status_handler(message: types.Message):
     """
     telegram_id = str(message.from_user.id)
 
-    calendar_id = db.get_calendar_id(telegram_id)
-    todoist_token = db.get_todoist_token(telegram_id)
-
-    if not calendar_id or not todoist_token:
+    client = await db.get_client(telegram_id)
+    if not client or not client.google_calendar_id or not client.todoist_token:
         await message.answer("Вы ещё не зарегистрированы. Используйте команду /start для начала работы.")
         return
+    calendar_id, todoist_token = client.google_calendar_id, client.todoist_token
     status_message = (
         f"📋 **Ваш текущий статус:** 📋\n\n"
         f"🔹 **Google Calendar ID**: '{calendar_id}'\n"
@@ -294,6 +488,70 @@ async def status_handler(message: types.Message):
     )
     await message.answer(status_message, parse_mode="Markdown")
 
+def is_admin(message: types.Message) -> bool:
+    """
+    Проверяет, что сообщение от администратора бота (ADMIN_IDS в Bot/credentials.py).
+    """
+    return str(message.from_user.id) in {str(admin_id) for admin_id in ADMIN_IDS}
+
+@dp.message(Command("usage"))
+async def usage_handler(message: types.Message):
+    """
+    Команда администратора /usage [kind|model|client_id|day] [дней].
+
+    Показывает расход токенов GigaChat за последние дни (по умолчанию за 7),
+    сгруппированный по виду промпта (по умолчанию), модели, пользователю или дню.
+    """
+    if not is_admin(message):
+        return
+    args = (message.text or "").split()[1:]
+    group = args[0] if args and args[0] in ("kind", "model", "client_id", "day") else "kind"
+    days = max(int(args[-1]), 1) if args and args[-1].isdigit() else 7
+    since = (datetime.now() - timedelta(days=days - 1)).date()
+
+    rows = gpt_parser.usage.report((group,), since, limit=20)
+    if not rows:
+        await message.answer("Данных о расходе токенов пока нет.")
+        return
+    lines = [f"Расход токенов за {days} дн. по {group}:"]
+    for row in rows:
+        lines.append(
+            f"{row[group] or '—'}: {row['requests']} запр., {row['total_tokens']} ток. "
+            f"(промпт {row['prompt_tokens']}, из кэша {row['precached_prompt_tokens']}, "
+            f"ответ {row['completion_tokens']}), {row['cost']:.2f} ₽"
+            + (f", по оценке: {row['estimated_requests']} запр." if row['estimated_requests'] else "")
+        )
+    await message.answer("\n".join(lines))
+
+@dp.message(Command("usage_export"))
+async def usage_export_handler(message: types.Message):
+    """
+    Команда администратора /usage_export: присылает CSV с расходом токенов
+    по дням, видам промптов, моделям и пользователям.
+    """
+    if not is_admin(message):
+        return
+    path = "gpt_usage.csv"
+    count = gpt_parser.usage.export(path)
+    await message.answer_document(FSInputFile(path), caption=f"Строк: {count}")
+
+@dp.message(Command("jobs"))
+async def jobs_handler(message: types.Message):
+    """
+    Команда администратора /jobs: глубина очереди фоновых задач и задержки
+    ожидания и обработки сообщений.
+    """
+    if not is_admin(message):
+        return
+    stats = jobs.stats()
+    await message.answer(
+        f"В очереди: {stats['depth']} (максимум {stats['max_depth']})\n"
+        f"Принято: {stats['submitted']}, выполнено: {stats['completed']}, "
+        f"с ошибкой: {stats['failed']}, отклонено: {stats['rejected']}\n"
+        f"Ожидание: в среднем {stats['avg_wait']:.2f} с, максимум {stats['max_wait']:.2f} с\n"
+        f"Обработка: в среднем {stats['avg_run']:.2f} с, максимум {stats['max_run']:.2f} с"
+    )
+
 @dp.message(Command("update_calendar"))
 async def update_calendar_handler(message: types.Message, state: FSMContext):
     """
@@ -304,7 +562,7 @@ async def update_calendar_handler(message: types.Message, state: FSMContext):
 
 
     telegram_id = str(message.from_user.id)
-    if not is_user_registered(telegram_id):
+    if not await is_user_registered(telegram_id):
         await message.answer("Сначала зарегистрируйтесь с помощью команды /start.")
         return
 
@@ -331,7 +589,7 @@ async def process_new_calendar_id(message: types.Message, state: FSMContext):
         await message.answer_sticker("CAACAgIAAxkBAAENXVVnZpAk9PS1lNx4P-nqpTvDiFaDaQACt2IAA7QwSwxxEbxXoU5MNgQ") # неверный гугол календарь айди
         return
 
-    result = db.update_calendar_id(telegram_id, new_calendar_id)
+    result = await db.update_calendar_id(telegram_id, new_calendar_id)
     if result:
         await message.answer("Ваш Google Calendar ID успешно обновлён!")
     else:
@@ -348,7 +606,7 @@ async def update_todoist_handler(message: types.Message, state: FSMContext):
     """
 
     telegram_id = str(message.from_user.id)
-    if not is_user_registered(telegram_id):
+    if not await is_user_registered(telegram_id):
         await message.answer("Сначала зарегистрируйтесь с помощью команды /start.")
         return
 
@@ -376,7 +634,7 @@ async def process_new_todoist_token(message: types.Message, state: FSMContext):
         await message.answer_sticker("CAACAgIAAxkBAAENXVlnZpBVoCDz9AbxflDAeW1KWVXSCAACuWEAAq-EMUuLDDAtDmQyNzYE") # неверный тудуист токен
         return
 
-    result = db.update_todoist_token(telegram_id, new_todoist_token)
+    result = await db.update_todoist_token(telegram_id, new_todoist_token)
     if result:
         await message.answer("Ваш Todoist API токен успешно обновлён!")
     else:
@@ -384,6 +642,20 @@ async def process_new_todoist_token(message: types.Message, state: FSMContext):
 
     await state.clear()
 
+@dp.message(Command("t"))
+async def quick_task_handler(message: types.Message, state: FSMContext, command: CommandObject):
+    """
+    Обработчик команды /t <текст>: добавляет задачу без определения типа.
+    """
+    await quick_add(message, state, RequestType.GOAL, command.args or "")
+
+@dp.message(Command("e"))
+async def quick_event_handler(message: types.Message, state: FSMContext, command: CommandObject):
+    """
+    Обработчик команды /e <текст>: добавляет событие без определения типа.
+    """
+    await quick_add(message, state, RequestType.EVENT, command.args or "")
+
 @dp.message(lambda message: message.text == "Добавить событие")
 async def handle_add_event(message: types.Message, state: FSMContext):
     """
@@ -428,7 +700,7 @@ async def handle_user_message(message: types.Message, state: FSMContext):
                 "CAACAgIAAxkBAAENXmhnZwP0bfeLzZea9nsK2PT0fXS9mAACBmYAAr3eOEsPP42OGI3_aDYE")  # надо вводить буковки
             return
 
-        if not is_user_registered(telegram_id):
+        if not await is_user_registered(telegram_id):
             await message.answer("Пожалуйста, отправьте команду /start для начала работы.")
             return
 
@@ -444,51 +716,21 @@ async def handle_user_message(message: types.Message, state: FSMContext):
                 "CAACAgIAAxkBAAENXUxnZo1mls407mn6UDUpVUF99h5WbwAChlwAAvosOEt4WHe1UgFjQTYE")  # my honest reaction
             return
 
+        # Префикс быстрого добавления: тип задан пользователем
+        for prefix, kind in QUICK_PREFIXES.items():
+            if user_input.startswith(prefix):
+                await quick_add(message, state, QUICK_TYPES[kind], user_input[len(prefix):])
+                return
+
         # Логика обработки состояний:
+        # Пользователь сам выбрал "Добавить событие" или "Добавить задачу" — тип не определяем
         if current_state == UserStates.waiting_for_event.state:
-            content = Query(
-                client_id=telegram_id,
-                current_time=datetime.now(),
-                content=user_input
-            )
-            parsed_request = await gpt_parser.parse_message(content)
-            logger.info(f"Parsed request: {parsed_request}")
-
-            if parsed_request and parsed_request.type == RequestType.EVENT:
-                calendar_id = db.get_calendar_id(telegram_id)
-                response = await calendar.create_event(parsed_request, calendar_id)
-                if response is None:
-                    await message.answer(f"Событие '{parsed_request.body}' успешно добавлено в Google Calendar.")
-                else:
-                    await message.answer(f"Не удалось добавить событие в Google Calendar. Ошибка: {response}")
-
-                await state.clear()
-                await message.answer("Что хотите сделать дальше?", reply_markup=get_main_menu_keyboard())
-            else:
-                await message.answer("Не удалось распознать событие. Пожалуйста, введите информацию о событии ещё раз.")
+            await enqueue_request(message, state, user_input, RequestType.EVENT,
+                                  "Не удалось распознать событие. Пожалуйста, введите информацию о событии ещё раз.")
 
         elif current_state == UserStates.waiting_for_task.state:
-            content = Query(
-                client_id=telegram_id,
-                current_time=datetime.now(),
-                content=user_input
-            )
-            parsed_request = await gpt_parser.parse_message(content)
-            logger.info(f"Parsed task: {parsed_request}")
-
-            if parsed_request and parsed_request.type == RequestType.GOAL:
-                todoist_token = db.get_todoist_token(telegram_id)
-                todoist_module = TodoistModule(todoist_token)
-                response = await todoist_module.create_task(parsed_request)
-                if response is None:
-                    await message.answer(f"Задача '{parsed_request.body}' успешно добавлена в Todoist.")
-                else:
-                    await message.answer(f"Не удалось добавить задачу в Todoist. Ошибка: {response}")
-
-                await state.clear()
-                await message.answer("Что хотите сделать дальше?", reply_markup=get_main_menu_keyboard())
-            else:
-                await message.answer("Не удалось распознать задачу. Пожалуйста, введите информацию о задаче ещё раз.")
+            await enqueue_request(message, state, user_input, RequestType.GOAL,
+                                  "Не удалось распознать задачу. Пожалуйста, введите информацию о задаче ещё раз.")
 
         else:
             # Если состояние не waiting_for_event и не waiting_for_task
@@ -499,43 +741,35 @@ async def handle_user_message(message: types.Message, state: FSMContext):
                 await message.answer("Пожалуйста, введите информацию о задаче.")
                 await state.set_state(UserStates.waiting_for_task)
             else:
-                content = Query(
-                    client_id=telegram_id,
-                    current_time=datetime.now(),
-                    content=user_input
-                )
-                parsed_request = await gpt_parser.parse_message(content)
-                logger.info(f"Parsed task: {parsed_request}")
-
-                if parsed_request and parsed_request.type == RequestType.GOAL:
-                    todoist_token = db.get_todoist_token(telegram_id)
-                    todoist_module = TodoistModule(todoist_token)
-                    response = await todoist_module.create_task(parsed_request)
-                    if response is None:
-                        await message.answer(f"Задача '{parsed_request.body}' успешно добавлена в Todoist.")
-                    else:
-                        await message.answer(f"Не удалось добавить задачу в Todoist. Ошибка: {response}")
-
-                    await state.clear()
-                    await message.answer("Что хотите сделать дальше?", reply_markup=get_main_menu_keyboard())
-                elif parsed_request and parsed_request.type == RequestType.EVENT:
-                    calendar_id = db.get_calendar_id(telegram_id)
-                    response = await calendar.create_event(parsed_request, calendar_id)
-                    if response is None:
-                        await message.answer(f"Событие '{parsed_request.body}' успешно добавлено в Google Calendar.")
-                    else:
-                        await message.answer(f"Не удалось добавить событие в Google Calendar. Ошибка: {response}")
-
-                    await state.clear()
-                    await message.answer("Что хотите сделать дальше?", reply_markup=get_main_menu_keyboard())
-                
-                await message.answer("Пожалуйста, выберите действие из меню.", reply_markup=get_main_menu_keyboard())
+                await enqueue_request(message, state, user_input, None,
+                                      "Не удалось понять, событие это или задача.")
 
     except Exception as e:
         logger.exception(f"Произошла ошибка: {e}")
         await message.answer("Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 
+@dp.startup()
+async def on_startup():
+    """
+    Открывает общий пул HTTP-соединений GPT и запускает воркеры очереди задач при запуске бота.
+    """
+    await gpt_parser.start()
+    jobs.start()
+
+@dp.shutdown()
+async def on_shutdown():
+    """
+    Дожидается принятых задач очереди, закрывает базу и пул HTTP-соединений GPT при остановке бота.
+    aiogram закрывает storage раньше этого обработчика, а задачи очереди ещё могут менять
+    состояния, поэтому storage закрывается повторно — уже после очереди.
+    """
+    await jobs.close()
+    await storage.close()
+    await db.close()
+    await gpt_parser.close()
+
+
 if __name__ == "__main__":
     print("Бот запущен")
     asyncio.run(dp.start_polling(bot))
\ No newline at end of file
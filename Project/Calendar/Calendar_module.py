@@ -3,7 +3,7 @@ import googleapiclient
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from pathlib import Path
-from typing import Dict, Union
+from typing import Dict, Optional, Union
 import aiohttp
 import asyncio
 
@@ -19,6 +19,7 @@ import sys
 sys.path.append('project')
 
 from Request import Request
+from Deadline import Deadline
 
 class CalendarModule:
     """
@@ -63,7 +64,8 @@ class CalendarModule:
             return False
         return False
 
-    async def create_event(self, event: Union[Dict[str, str], Request], calendarId: str):
+    async def create_event(self, event: Union[Dict[str, str], Request], calendarId: str,
+                           deadline: Optional[Deadline] = None):
         """
         Создаёт событие в Google Calendar.
 
@@ -73,6 +75,9 @@ class CalendarModule:
         Args:
             event (Union[Dict[str, str], Request]): Данные о событии или Request.
             calendarId (str): ID календаря, куда вставляем событие.
+            deadline (Optional[Deadline]): Бюджет времени на запрос. Если он истёк до вставки, возвращаем ошибку.
+                Начатую вставку не прерываем: поток всё равно создал бы событие, и повторная отправка
+                сообщения продублировала бы его.
 
         Returns:
             None при успешном создании события, иначе строка с описанием ошибки.
@@ -98,6 +103,8 @@ class CalendarModule:
 
             event = new_dict
             
+        if deadline is not None and deadline.expired():
+            return "Google Calendar не ответил вовремя"
         loop = asyncio.get_event_loop()
         
         try:
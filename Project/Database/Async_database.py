@@ -0,0 +1,157 @@
+import asyncio
+import typing as tp
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from pathlib import Path
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from Database.Database import Client, ClientsDB
+
+
+class AsyncClientsDB:
+    """
+    Асинхронная обёртка над ClientsDB с тем же набором методов.
+
+    Все запросы к SQLite выполняются в отдельном потоке, поэтому ожидание диска
+    или блокировки файла не останавливает цикл событий бота. Записи, пришедшие,
+    пока предыдущая транзакция фиксируется, объединяются в одну транзакцию (group commit).
+    Чтения, которые можно ответить из кэша ClientsDB, в поток не отправляются, а промахи
+    кэша читаются параллельно через пул соединений только для чтения (readers потоков).
+    """
+
+    def __init__(self, db_name: str = "clients.db", max_batch: int = 256, readers: int = 4, **kwargs) -> None:
+        """
+        Args:
+            db_name (str): Файл SQLite.
+            max_batch (int): Максимальное число записей в одной транзакции.
+            readers (int): Число соединений и потоков для чтения. 0 — читать в потоке записи.
+            kwargs: Остальные параметры ClientsDB (cache_size, cache_ttl, clock, busy_timeout, retries).
+        """
+        self._max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clients-db")
+        self._read_executor = (ThreadPoolExecutor(max_workers=readers, thread_name_prefix="clients-db-read")
+                               if readers else self._executor)
+        # Соединение для записи создаётся в потоке БД и используется только из него
+        self.db: ClientsDB = self._executor.submit(self._open, db_name, readers, kwargs).result()
+        self._pending: tp.List[tp.Tuple[str, tuple, asyncio.Future]] = []
+        self._writer: tp.Optional[asyncio.Task] = None
+        self.counters = Counter()
+
+    @staticmethod
+    def _open(db_name: str, readers: int, kwargs: tp.Dict) -> ClientsDB:
+        return ClientsDB(db_name, readers=readers, wal=True, **kwargs)
+
+    async def _run(self, function: tp.Callable, *args) -> tp.Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _submit_write(self, name: str, args: tuple) -> tp.Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((name, args, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._write_pending())
+        return await future
+
+    async def _write_pending(self):
+        while self._pending:
+            batch, self._pending = self._pending[:self._max_batch], self._pending[self._max_batch:]
+            try:
+                results = await self._run(self.db.write_batch, [(name, args) for name, args, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.counters["batches"] += 1
+            self.counters["writes"] += len(batch)
+            self.counters["max_batch"] = max(self.counters["max_batch"], len(batch))
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def add_client(self, telegram_id: str, google_calendar_id: str, todoist_token: str) -> tp.Any:
+        """
+        См. ClientsDB.add_client.
+        """
+        return await self._submit_write("add_client", (telegram_id, google_calendar_id, todoist_token))
+
+    async def get_client(self, telegram_id: str) -> tp.Optional[Client]:
+        """
+        См. ClientsDB.get_client. Попадание в кэш обслуживается без перехода в поток БД.
+        """
+        hit, client = self.db.cached_client(telegram_id)
+        if hit:
+            return client
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, self.db._load_client, telegram_id)
+
+    async def get_calendar_id(self, telegram_id: str) -> tp.Optional[str]:
+        """
+        См. ClientsDB.get_calendar_id.
+        """
+        client = await self.get_client(telegram_id)
+        return (client.google_calendar_id if client else None)
+
+    async def get_todoist_token(self, telegram_id: str) -> tp.Optional[str]:
+        """
+        См. ClientsDB.get_todoist_token.
+        """
+        client = await self.get_client(telegram_id)
+        return (client.todoist_token if client else None)
+
+    async def delete_client(self, telegram_id: str) -> None:
+        """
+        См. ClientsDB.delete_client.
+        """
+        error = await self._submit_write("delete_client", (telegram_id,))
+        if error is not None:
+            raise error
+
+    async def update_calendar_id(self, telegram_id: str, new_calendar_id: str) -> bool:
+        """
+        См. ClientsDB.update_calendar_id.
+        """
+        try:
+            return await self._submit_write("update_calendar_id", (telegram_id, new_calendar_id))
+        except Exception:
+            return False
+
+    async def update_todoist_token(self, telegram_id: str, new_todoist_token: str) -> bool:
+        """
+        См. ClientsDB.update_todoist_token.
+        """
+        try:
+            return await self._submit_write("update_todoist_token", (telegram_id, new_todoist_token))
+        except Exception:
+            return False
+
+    def stats(self) -> tp.Dict[str, float]:
+        """
+        Транзакции записи, записи в них, средний и максимальный размер транзакции,
+        статистика кэша и ожидания блокировок (см. ClientsDB.lock_stats).
+        """
+        batches, writes = self.counters["batches"], self.counters["writes"]
+        return {
+            "batches": batches,
+            "writes": writes,
+            "max_batch": self.counters["max_batch"],
+            "avg_batch": writes / batches if batches else 0.0,
+            **{f"cache_{name}": value for name, value in self.db.cache_stats().items()},
+            **{f"lock_{name}": value for name, value in self.db.lock_stats().items()},
+        }
+
+    async def close(self) -> None:
+        """
+        Дожидается записи накопленных изменений и закрывает соединения и потоки БД.
+        """
+        if self._writer is not None:
+            await self._writer
+        self._read_executor.shutdown()
+        await self._run(self.db.close)
+        self._executor.shutdown()
@@ -0,0 +1,280 @@
+"""
+Массовый импорт и экспорт клиентов в CSV (с заголовком) или JSONL (объект на строку)
+с полями FIELDS. Формат определяется по расширению файла; "-" — стандартный ввод/вывод в JSONL.
+
+Строки читаются и пишутся потоком пачками по batch_size, поэтому память не зависит от размера таблицы.
+
+Запуск из папки Project:
+    python -m Database.Bulk export clients.csv --db client_DB
+    python -m Database.Bulk import clients.csv --db client_DB --conflicts conflicts.jsonl [--replace]
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+import typing as tp
+from dataclasses import dataclass
+from itertools import islice
+
+from pathlib import Path
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+sys.path.append('project')
+
+from Database.Database import ClientsDB
+
+FIELDS = ("telegram_id", "google_calendar_id", "todoist_token")
+
+# telegram_id хранится в колонке с INTEGER affinity: целые числа таблица хранит как числа ("0123" -> 123),
+# дробные тоже приводит к числу, а остальной текст ("@name") хранит как есть
+_ID_RE = re.compile(r"[+-]?\d+", re.ASCII)
+_NUMBER_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?", re.ASCII)
+
+Row = tp.Tuple[str, str, str]
+
+
+@dataclass
+class ImportReport:
+    """
+        Result of a bulk import
+
+        Attributes
+        __________
+        imported: int - new clients inserted
+
+        updated: int - existing clients overwritten (only with replace=True)
+
+        conflicts: int - rows skipped because the telegram_id already exists in the table or earlier in the file
+
+        invalid: int - rows skipped because a field is missing or empty, or the telegram_id is fractional
+
+        seconds: float - time spent on the import
+    """
+    imported: int = 0
+    updated: int = 0
+    conflicts: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+
+
+def _format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_clients(path: str) -> tp.Iterator[tp.Tuple[int, Row]]:
+    """
+    Потоково читает клиентов из CSV или JSONL.
+
+    Args:
+        path (str): Файл или "-" для стандартного ввода.
+
+    Returns:
+        Iterator[Tuple[int, Row]]: Пары (номер строки в файле, значения FIELDS без пробелов по краям;
+        отсутствующее поле — пустая строка). Строка JSONL, которая не является JSON-объектом,
+        отдаётся с пустыми полями, чтобы импорт отметил её как "invalid", а не остановился.
+    """
+    file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if _format(path) == "csv":
+            reader = csv.reader(file)
+            header = next(reader, [])
+            columns = [header.index(field) if field in header else None for field in FIELDS]
+            for row in reader:
+                yield reader.line_num, tuple(
+                    row[column].strip() if column is not None and column < len(row) else ""
+                    for column in columns
+                )
+        else:
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = None
+                    if not isinstance(record, dict):
+                        yield line_number, ("", "", "")
+                        continue
+                    yield line_number, tuple(
+                        "" if record.get(field) is None else str(record[field]).strip() for field in FIELDS
+                    )
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def export_clients(db: ClientsDB, path: str, batch_size: int = 10000) -> int:
+    """
+    Потоково выгружает всех клиентов в CSV или JSONL.
+
+    Args:
+        db (ClientsDB): База клиентов.
+        path (str): Файл или "-" для стандартного вывода.
+        batch_size (int): Сколько строк читать из SQLite за раз.
+
+    Returns:
+        int: Число выгруженных клиентов.
+    """
+    count = 0
+    file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    cursor = db.conn.cursor()
+    try:
+        cursor.execute(f'SELECT {", ".join(FIELDS)} FROM t_client ORDER BY telegram_id')
+        writer = csv.writer(file) if _format(path) == "csv" else None
+        # json.dumps с параметрами создаёт кодировщик на каждую строку
+        encoder = json.JSONEncoder(ensure_ascii=False)
+        if writer is not None:
+            writer.writerow(FIELDS)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                file.writelines(encoder.encode(dict(zip(FIELDS, map(str, row)))) + "\n" for row in rows)
+            count += len(rows)
+    finally:
+        cursor.close()
+        if file is not sys.stdout:
+            file.close()
+    return count
+
+
+def import_clients(db: ClientsDB, records: tp.Iterable[tp.Tuple[int, Row]],
+                   replace: bool = False, batch_size: int = 10000,
+                   on_conflict: tp.Optional[tp.Callable[[int, str, str], None]] = None) -> ImportReport:
+    """
+    Импортирует клиентов пачками: каждая пачка — одна транзакция с executemany.
+
+    Конфликты не прерывают импорт: строка, чей telegram_id уже есть в таблице
+    (или встречался выше в той же пачке), пропускается и передаётся в on_conflict.
+    Числовой telegram_id приводится к каноническому виду целого числа ("0123" -> "123"), как его хранит таблица,
+    текстовый ("@name") импортируется как есть; строка с пустым полем или дробным telegram_id
+    считается некорректной. Каждая пачка пишется под блокировкой записи ClientsDB
+    и повторяется, если файл занят другим процессом.
+    С replace=True существующие записи перезаписываются.
+
+    Args:
+        db (ClientsDB): База клиентов.
+        records (Iterable[Tuple[int, Row]]): Пары (номер строки, значения FIELDS), например из read_clients.
+        replace (bool): Перезаписывать существующих клиентов вместо пропуска.
+        batch_size (int): Сколько строк в одной транзакции.
+        on_conflict (Optional[Callable[[int, str, str], None]]): Вызывается для каждой пропущенной
+            строки с номером строки, telegram_id и причиной ("exists", "duplicate" или "invalid").
+
+    Returns:
+        ImportReport: Итоги импорта.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        _import_batch(db, batch, replace, report, on_conflict or (lambda line, telegram_id, reason: None))
+    db.clear_cache()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _import_batch(db: ClientsDB, batch, replace: bool, report: ImportReport, on_conflict):
+    rows: tp.Dict[str, tp.Tuple[int, Row]] = {}
+    for line, values in batch:
+        if not all(values) or (_NUMBER_RE.fullmatch(values[0]) and not _ID_RE.fullmatch(values[0])):
+            report.invalid += 1
+            on_conflict(line, values[0], "invalid")
+            continue
+        if _ID_RE.fullmatch(values[0]):
+            values = (str(int(values[0])),) + values[1:]
+        if values[0] in rows:
+            report.conflicts += 1
+            on_conflict(line, values[0], "duplicate")
+        else:
+            rows[values[0]] = (line, values)
+
+    with db._write_lock:
+        existing = db._retry(lambda: _write_rows(db.conn, rows, replace))
+    if replace:
+        report.updated += len(existing)
+    else:
+        for telegram_id in sorted(existing, key=lambda telegram_id: rows[telegram_id][0]):
+            report.conflicts += 1
+            on_conflict(rows[telegram_id][0], telegram_id, "exists")
+    report.imported += len(rows) - len(existing)
+
+
+def _write_rows(conn, rows: tp.Dict[str, tp.Tuple[int, Row]], replace: bool) -> tp.Set[str]:
+    """
+    Записывает пачку одной транзакцией и возвращает telegram_id, которые уже были в таблице.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Существующие telegram_id ищем в той же транзакции, чтобы между проверкой и вставкой никто не успел записать
+        existing = set()
+        keys = list(rows)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            existing.update(str(row[0]) for row in conn.execute(
+                f'SELECT telegram_id FROM t_client WHERE telegram_id IN ({", ".join("?" * len(chunk))})', chunk
+            ))
+
+        if replace:
+            conn.executemany(f'''
+                INSERT INTO t_client ({", ".join(FIELDS)}) VALUES (?, ?, ?)
+                ON CONFLICT (telegram_id) DO UPDATE SET
+                google_calendar_id = excluded.google_calendar_id, todoist_token = excluded.todoist_token
+            ''', (values for _, values in rows.values()))
+        else:
+            conn.executemany(f'INSERT INTO t_client ({", ".join(FIELDS)}) VALUES (?, ?, ?)',
+                             (values for telegram_id, (_, values) in rows.items() if telegram_id not in existing))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return existing
+
+
+def main(argv: tp.Optional[tp.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Массовый импорт и экспорт клиентов ClientsDB (CSV/JSONL)")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help='файл .csv или .jsonl; "-" — стандартный ввод/вывод в JSONL')
+    parser.add_argument("--db", default="client_DB", help="файл базы клиентов")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--replace", action="store_true", help="перезаписывать существующих клиентов")
+    parser.add_argument("--conflicts", help="куда записать пропущенные строки (JSONL); по умолчанию stderr")
+    args = parser.parse_args(argv)
+
+    db = ClientsDB(args.db, cache_size=0)
+    try:
+        if args.command == "export":
+            count = export_clients(db, args.path, args.batch_size)
+            print(f"Выгружено клиентов: {count}", file=sys.stderr)
+            return 0
+
+        conflicts = open(args.conflicts, "w", encoding="utf-8") if args.conflicts else sys.stderr
+
+        def on_conflict(line: int, telegram_id: str, reason: str):
+            conflicts.write(json.dumps({"line": line, "telegram_id": telegram_id, "reason": reason},
+                                       ensure_ascii=False) + "\n")
+
+        try:
+            report = import_clients(db, read_clients(args.path), args.replace, args.batch_size, on_conflict)
+        finally:
+            if conflicts is not sys.stderr:
+                conflicts.close()
+        print(f"Добавлено: {report.imported}, обновлено: {report.updated}, конфликтов: {report.conflicts}, "
+              f"некорректных строк: {report.invalid}, за {report.seconds:.1f} с", file=sys.stderr)
+        return 0
+    finally:
+        db.conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
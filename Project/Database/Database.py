@@ -1,50 +1,290 @@
+import logging
+import queue
 import sqlite3
+import threading
+import time
 import typing as tp
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
 from enum import Enum
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+"""
+Настройки SQLite для нескольких процессов и потоков (ClientsDB(..., wal=True)):
+- WAL: чтения не ждут записи, а запись — чтений;
+- synchronous=NORMAL: в режиме WAL fsync только при checkpoint, транзакции не теряются при падении процесса;
+- temp_store и cache_size: временные данные и кэш страниц (8 МБ) в памяти.
+Ожидание блокировки файла задаётся параметром busy_timeout.
+"""
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+def is_busy(error: Exception) -> bool:
+    """
+    Ошибка из-за блокировки файла другим соединением ("database is locked" / "database is busy").
+    """
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
 
 class Errors(Enum):
     INTEGRITY_ERROR = "integrityError"
 
+def schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Возвращает версию схемы базы (PRAGMA user_version).
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def _compact_t_client(conn: sqlite3.Connection, batch_size: int) -> None:
+    """
+    Миграция 1: t_client (id AUTOINCREMENT, telegram_id TEXT UNIQUE) переносится в таблицу
+    WITHOUT ROWID с telegram_id INTEGER PRIMARY KEY: строки лежат прямо в B-дереве ключа,
+    без второго индекса и суррогатного id, поэтому страниц меньше, а поиск по telegram_id —
+    один проход по дереву. Нечисловые telegram_id (например, "@name") сохраняются как текст.
+
+    Копирование онлайн и с возобновлением:
+    - изменения t_client во время копирования повторяются в новой таблице триггерами;
+    - строки копируются пачками по batch_size, каждая пачка — своя транзакция,
+      позиция сохраняется в t_migration_progress, поэтому прерванная миграция продолжается
+      с последней пачки;
+    - в конце одной транзакцией старая таблица заменяется новой.
+
+    Миграцию могут одновременно начать несколько процессов: каждая транзакция берёт
+    блокировку записи сразу (BEGIN IMMEDIATE) и заново проверяет версию схемы, поэтому
+    процессы по очереди продолжают общие пачки, а после замены таблицы просто выходят.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    if schema_version(conn) >= 1:
+        conn.commit()
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS t_client_v1 (
+            telegram_id INTEGER PRIMARY KEY,
+            google_calendar_id TEXT NOT NULL,
+            todoist_token TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS t_migration_progress (
+            version INTEGER PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO t_migration_progress (version, last_id) VALUES (1, 0)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS t_client_v1_insert AFTER INSERT ON t_client BEGIN
+            INSERT OR REPLACE INTO t_client_v1 VALUES (NEW.telegram_id, NEW.google_calendar_id, NEW.todoist_token);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS t_client_v1_update AFTER UPDATE ON t_client BEGIN
+            DELETE FROM t_client_v1 WHERE telegram_id = OLD.telegram_id;
+            INSERT OR REPLACE INTO t_client_v1 VALUES (NEW.telegram_id, NEW.google_calendar_id, NEW.todoist_token);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS t_client_v1_delete AFTER DELETE ON t_client BEGIN
+            DELETE FROM t_client_v1 WHERE telegram_id = OLD.telegram_id;
+        END
+    ''')
+    conn.commit()
+
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        if schema_version(conn) >= 1:
+            # Миграцию закончил другой процесс, пока этот ждал блокировку
+            conn.commit()
+            return
+        progress = conn.execute('SELECT last_id FROM t_migration_progress WHERE version = 1').fetchone()
+        if progress is None:
+            # Строку прогресса удалили вручную: копируем заново, INSERT OR IGNORE не задублирует строки
+            conn.execute('INSERT INTO t_migration_progress (version, last_id) VALUES (1, 0)')
+        last_id = progress[0] if progress else 0
+        batch_end, count = conn.execute('''
+            SELECT MAX(id), COUNT(*) FROM (SELECT id FROM t_client WHERE id > ? ORDER BY id LIMIT ?)
+        ''', (last_id, batch_size)).fetchone()
+        if not count:
+            conn.commit()
+            break
+        # Строки, уже записанные триггерами, новее копируемых — их не перезаписываем
+        conn.execute('''
+            INSERT OR IGNORE INTO t_client_v1 (telegram_id, google_calendar_id, todoist_token)
+            SELECT telegram_id, google_calendar_id, todoist_token FROM t_client WHERE id > ? AND id <= ?
+        ''', (last_id, batch_end))
+        conn.execute('UPDATE t_migration_progress SET last_id = ? WHERE version = 1', (batch_end,))
+        conn.commit()
+
+    conn.execute('BEGIN IMMEDIATE')
+    if schema_version(conn) >= 1:
+        # Миграцию успел закончить другой процесс
+        conn.commit()
+        return
+    for trigger in ("t_client_v1_insert", "t_client_v1_update", "t_client_v1_delete"):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('DROP TABLE t_client')
+    conn.execute('ALTER TABLE t_client_v1 RENAME TO t_client')
+    conn.execute('DELETE FROM t_migration_progress WHERE version = 1')
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+
+"""
+Миграции схемы: (версия, описание, функция(conn, batch_size)).
+Функция миграции сама фиксирует свои транзакции и последней из них выставляет PRAGMA user_version.
+Новые миграции добавляются в конец списка со следующим номером версии.
+"""
+MIGRATIONS = [
+    (1, "t_client: telegram_id INTEGER PRIMARY KEY, WITHOUT ROWID", _compact_t_client),
+]
+
+def migrate(conn: sqlite3.Connection, target: tp.Optional[int] = None, batch_size: int = 10000) -> int:
+    """
+    Применяет к базе миграции новее её текущей версии.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой.
+        target (Optional[int]): До какой версии обновлять; None — до последней.
+        batch_size (int): Размер пачки при копировании строк.
+
+    Returns:
+        int: Версия схемы после миграций.
+    """
+    for version, description, migration in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if schema_version(conn) >= version:
+            continue
+        started = time.perf_counter()
+        try:
+            migration(conn, batch_size)
+        except Exception:
+            # Откатываем незаконченную пачку, чтобы миграцию можно было сразу повторить на этом же соединении
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        logger.info(f"Миграция {version} ({description}) выполнена за {time.perf_counter() - started:.1f} с")
+    return schema_version(conn)
+
+@dataclass(frozen=True)
+class Client:
+    """
+        Client record from t_client
+
+        Attributes
+        __________
+        telegram_id: str - telegram id of the user
+
+        google_calendar_id: str - id of the user's Google Calendar
+
+        todoist_token: str - Todoist API token of the user
+    """
+    telegram_id: str
+    google_calendar_id: str
+    todoist_token: str
+
 class ClientsDB:
     """
     Класс для работы с локальной базой данных (SQLite).
     Осуществляет:
     - Создание таблицы t_client
     - Добавление пользователя
-    - Получение Google Calendar ID
-    - Получение Todoist токена
+    - Получение записи пользователя (get_client), Google Calendar ID и Todoist токена
     - Обновление идентификаторов
     - Удаление пользователя
+
+    Записи пользователей кэшируются в памяти (LRU на cache_size записей с TTL cache_ttl секунд),
+    поэтому для активных пользователей чтения не ходят в SQLite. Методы записи этого класса
+    сбрасывают запись из кэша; TTL ограничивает устаревание, если таблицу меняет другой процесс.
+
+    Для нескольких процессов на одном файле: все записи идут через одно соединение conn
+    по очереди и начинаются с BEGIN IMMEDIATE, чтобы блокировка записи бралась сразу, а не
+    при повышении уровня посреди транзакции; чтения — через пул из readers соединений только
+    для чтения. Занятый файл ждём до busy_timeout секунд и повторяем до retries раз;
+    время ожидания блокировок видно в lock_stats().
     """
 
-    def __init__(self, db_name: str = "clients.db") -> None:
+    def __init__(self, db_name: str = "clients.db", cache_size: int = 10000, cache_ttl: float = 300,
+                 clock: tp.Callable[[], float] = time.monotonic, readers: int = 0, wal: bool = False,
+                 busy_timeout: float = 5.0, retries: int = 5) -> None:
         """
         Инициализация базы данных:
         1) Открываем/создаём файл db_name
         2) Вызываем create_tables() для гарантированного наличия нужных таблиц
+        3) Открываем пул соединений для чтения
+
+        Args:
+            cache_size (int): Сколько записей пользователей держать в памяти. 0 — без кэша.
+            cache_ttl (float): Сколько секунд запись в кэше считается актуальной.
+            clock (Callable[[], float]): Источник текущего времени в секундах.
+            readers (int): Число соединений только для чтения. 0 — читать через conn.
+            wal (bool): Включить WAL и остальные PRAGMAS (нужно, чтобы чтения не блокировали запись).
+            busy_timeout (float): Сколько секунд SQLite ждёт занятый файл, прежде чем вернуть ошибку.
+            retries (int): Сколько раз повторять операцию, если файл так и не освободился.
         """
-        self.conn = sqlite3.connect(db_name)
+        self.conn = sqlite3.connect(db_name, timeout=busy_timeout)
+        self._busy_timeout = busy_timeout
+        self._retries = retries
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._clock = clock
+        self._cache: "OrderedDict[str, tp.Tuple[tp.Optional[Client], float]]" = OrderedDict()
+        # Кэш читают и из потока событий (AsyncClientsDB), и из потоков БД
+        self._cache_lock = threading.Lock()
+        # Растёт при каждом сбросе кэша: чтение, начатое до записи, не должно вернуть старую строку в кэш
+        self._cache_generation = 0
+        self.cache_counters = Counter()
+        self._write_lock = threading.Lock()
+        self.lock_counters = Counter()
+        self._lock_max = Counter()
+        if wal:
+            # Смена режима журнала требует монопольной блокировки, а её может держать другой процесс
+            for pragma in PRAGMAS:
+                self._retry(lambda: self.conn.execute(pragma))
         self.create_tables()
 
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(readers):
+            reader = sqlite3.connect(f"{Path(db_name).resolve().as_uri()}?mode=ro", uri=True, timeout=busy_timeout,
+                                     check_same_thread=False)
+            self._readers.put(reader)
+        self.readers = readers
+
     def create_tables(self) -> None:
         """
-        Создаёт таблицу t_client, если её ещё нет.
+        Создаёт таблицу t_client, если её ещё нет, и применяет миграции схемы (migrate).
 
-        Структура:
-        - telegram_id: уникальный ID пользователя (TEXT)
+        Структура после миграций:
+        - telegram_id: уникальный ID пользователя (INTEGER PRIMARY KEY, таблица WITHOUT ROWID)
         - google_calendar_id: хранит идентификатор календаря
         - todoist_token: хранит токен Todoist
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        # Исходная схема (версия 0); дальше её меняют только миграции из MIGRATIONS
+        self._retry(lambda: self.conn.execute('''
             CREATE TABLE IF NOT EXISTS t_client (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 telegram_id TEXT UNIQUE NOT NULL,
                 google_calendar_id TEXT NOT NULL,
                 todoist_token TEXT NOT NULL
             )
-        ''')
+        '''))
         self.conn.commit()
+        self.migrate()
+
+    def migrate(self, target: tp.Optional[int] = None, batch_size: int = 10000) -> int:
+        """
+        Применяет миграции схемы (см. migrate) и сбрасывает кэш записей.
+        Если файл занят другим процессом, миграция повторяется: она продолжается с последней пачки.
+
+        Returns:
+            int: Версия схемы после миграций.
+        """
+        version = self._retry(lambda: migrate(self.conn, target, batch_size))
+        self.clear_cache()
+        return version
 
     def add_client(self, telegram_id: str, google_calendar_id: str, todoist_token: str) -> int:
         """
@@ -56,20 +296,222 @@ class ClientsDB:
             todoist_token (str): Токен доступа к Todoist.
 
         Returns:
-            int or Errors.INTEGRITY_ERROR: ID записи, либо Errors.INTEGRITY_ERROR при конфликте, либо Exception.
+            int or Errors.INTEGRITY_ERROR: Число добавленных строк (1), либо Errors.INTEGRITY_ERROR при конфликте, либо Exception.
+        """
+        return self.write_batch([("add_client", (telegram_id, google_calendar_id, todoist_token))])[0]
+
+    def write_batch(self, writes: tp.Sequence[tp.Tuple[str, tuple]]) -> tp.List[tp.Any]:
+        """
+        Выполняет несколько записей одной транзакцией с одним commit.
+        Каждая запись идёт в своей точке сохранения, поэтому ошибка одной
+        (например, повторная регистрация) не отменяет остальные.
+
+        Args:
+            writes (Sequence[Tuple[str, tuple]]): Пары (имя метода записи, его аргументы):
+                "add_client", "update_calendar_id", "update_todoist_token" или "delete_client".
+
+        Returns:
+            List: Результаты в том же порядке и того же вида, что у соответствующих методов;
+            для "delete_client" — None или ошибка удаления (её возбуждает сам delete_client).
         """
+        started = time.perf_counter()
+        with self._write_lock:
+            self._record_wait("write", time.perf_counter() - started)
+            return self._retry(lambda: self._write_batch(writes))
+
+    def _write_batch(self, writes: tp.Sequence[tp.Tuple[str, tuple]]) -> tp.List[tp.Any]:
+        results = []
         cursor = self.conn.cursor()
         try:
+            if not self.conn.in_transaction:
+                started = time.perf_counter()
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                finally:
+                    self._record_wait("begin", time.perf_counter() - started)
+            for name, args in writes:
+                cursor.execute('SAVEPOINT client_write')
+                try:
+                    results.append(self._write(cursor, name, args))
+                except sqlite3.Error as e:
+                    if is_busy(e):
+                        raise
+                    # Неудавшаяся запись откатывается, не затрагивая остальные записи пакета
+                    cursor.execute('ROLLBACK TO client_write')
+                    results.append(self._write_error(name, e))
+                cursor.execute('RELEASE client_write')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            for _, args in writes:
+                self._invalidate(args[0])
+        return results
+
+    def _retry(self, operation: tp.Callable[[], tp.Any]) -> tp.Any:
+        """
+        Выполняет операцию, повторяя её с растущей паузой, пока файл занят другим процессом.
+        """
+        for attempt in range(self._retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not is_busy(e):
+                    raise
+                self.lock_counters["busy"] += 1
+                if attempt == self._retries:
+                    logger.warning(f"База занята, попыток: {attempt + 1}: {e}")
+                    raise
+                self.lock_counters["retries"] += 1
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+    def _record_wait(self, kind: str, seconds: float) -> None:
+        self.lock_counters[f"{kind}_waits"] += 1
+        self.lock_counters[f"{kind}_wait_total"] += seconds
+        self._lock_max[kind] = max(self._lock_max[kind], seconds)
+
+    def lock_stats(self) -> tp.Dict[str, float]:
+        """
+        Ожидание блокировок: очередь к писателю в процессе (write), блокировка файла
+        при BEGIN IMMEDIATE (begin) и свободное соединение для чтения (read) —
+        число ожиданий, среднее и максимальное время в секундах; а также ошибки занятости
+        файла (busy) и повторы после них (retries).
+        """
+        stats = {"busy": self.lock_counters["busy"], "retries": self.lock_counters["retries"]}
+        for kind in ("write", "begin", "read"):
+            waits = self.lock_counters[f"{kind}_waits"]
+            stats[f"{kind}_waits"] = waits
+            stats[f"{kind}_wait_avg"] = self.lock_counters[f"{kind}_wait_total"] / waits if waits else 0.0
+            stats[f"{kind}_wait_max"] = self._lock_max[kind]
+        return stats
+
+    def close(self) -> None:
+        """
+        Закрывает соединения для чтения и соединение для записи.
+        """
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self.conn.close()
+
+    @staticmethod
+    def _write(cursor: sqlite3.Cursor, name: str, args: tuple) -> tp.Any:
+        if name == "add_client":
             cursor.execute('INSERT INTO t_client (telegram_id, google_calendar_id, todoist_token) VALUES (?, ?, ?)',
-                           (telegram_id, google_calendar_id, todoist_token))
-        except sqlite3.IntegrityError:
-            return Errors.INTEGRITY_ERROR
-        except Exception as e:
-            return e
-        self.conn.commit()
-        client_id = cursor.lastrowid
-        cursor.close()
-        return client_id
+                           args)
+            # В таблице WITHOUT ROWID нет rowid, поэтому lastrowid не имеет смысла
+            return cursor.rowcount
+        if name == "update_calendar_id":
+            telegram_id, new_calendar_id = args
+            cursor.execute("UPDATE t_client SET google_calendar_id = ? WHERE telegram_id = ?",
+                           (new_calendar_id, telegram_id))
+            return cursor.rowcount > 0
+        if name == "update_todoist_token":
+            telegram_id, new_todoist_token = args
+            cursor.execute("UPDATE t_client SET todoist_token = ? WHERE telegram_id = ?",
+                           (new_todoist_token, telegram_id))
+            return cursor.rowcount > 0
+        if name == "delete_client":
+            cursor.execute('DELETE FROM t_client WHERE telegram_id = ?', args)
+            return None
+        raise ValueError(f"Неизвестная запись: {name}")
+
+    @staticmethod
+    def _write_error(name: str, error: sqlite3.Error) -> tp.Any:
+        if name == "add_client":
+            return Errors.INTEGRITY_ERROR if isinstance(error, sqlite3.IntegrityError) else error
+        if name == "delete_client":
+            # Ошибку отдаёт вызывающему delete_client, остальные записи пакета сохраняются
+            return error
+        return False
+
+    def get_client(self, telegram_id: str) -> tp.Optional[Client]:
+        """
+        Получает запись пользователя одним запросом; повторные обращения обслуживаются из кэша.
+
+        Args:
+            telegram_id (str): Идентификатор пользователя в Telegram.
+
+        Returns:
+            Client или None: Запись пользователя, если есть, иначе None.
+        """
+        hit, client = self.cached_client(telegram_id)
+        if hit:
+            return client
+        return self._load_client(telegram_id)
+
+    def _load_client(self, telegram_id: str) -> tp.Optional[Client]:
+        # Чтение из SQLite после промаха кэша; сам промах уже учёл cached_client
+        with self._cache_lock:
+            generation = self._cache_generation
+        result = self._retry(lambda: self._select_client(telegram_id))
+        # Числовые telegram_id хранятся как INTEGER, а наружу отдаются строкой, как их передают
+        client = Client(str(result[0]), result[1], result[2]) if result else None
+
+        # Отсутствие записи тоже кэшируем: незарегистрированные пользователи пишут не реже остальных
+        if self._cache_size > 0:
+            with self._cache_lock:
+                if generation != self._cache_generation:
+                    return client
+                self._cache[telegram_id] = (client, self._clock() + self._cache_ttl)
+                self._cache.move_to_end(telegram_id)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return client
+
+    def _select_client(self, telegram_id: str) -> tp.Optional[tuple]:
+        query = '''
+            SELECT telegram_id, google_calendar_id, todoist_token
+            FROM t_client
+            WHERE telegram_id = ?
+        '''
+        if not self.readers:
+            return self.conn.execute(query, (telegram_id,)).fetchone()
+
+        started = time.perf_counter()
+        reader = self._readers.get()
+        self._record_wait("read", time.perf_counter() - started)
+        try:
+            return reader.execute(query, (telegram_id,)).fetchone()
+        finally:
+            self._readers.put(reader)
+
+    def cached_client(self, telegram_id: str) -> tp.Tuple[bool, tp.Optional[Client]]:
+        """
+        Ищет запись пользователя только в кэше, не обращаясь к SQLite.
+
+        Returns:
+            Tuple[bool, Optional[Client]]: (найдена ли актуальная запись в кэше, запись).
+        """
+        with self._cache_lock:
+            cached = self._cache.get(telegram_id)
+            if cached is not None and cached[1] > self._clock():
+                self._cache.move_to_end(telegram_id)
+                self.cache_counters["hits"] += 1
+                return True, cached[0]
+            self.cache_counters["misses"] += 1
+            return False, None
+
+    def cache_stats(self) -> tp.Dict[str, int]:
+        """
+        Записи в кэше, попадания и промахи.
+        """
+        return {"entries": len(self._cache), "hits": self.cache_counters["hits"],
+                "misses": self.cache_counters["misses"]}
+
+    def clear_cache(self) -> None:
+        """
+        Сбрасывает весь кэш записей, например после массового изменения таблицы.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_generation += 1
+
+    def _invalidate(self, telegram_id: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(telegram_id, None)
+            self._cache_generation += 1
 
     def get_calendar_id(self, telegram_id: str) -> tp.Optional[str]:
         """
@@ -81,15 +523,8 @@ class ClientsDB:
         Returns:
             str или None: Значение google_calendar_id из БД, если есть, иначе None.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT google_calendar_id
-            FROM t_client
-            WHERE telegram_id = ?
-        ''', (telegram_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return (result[0] if result else None)
+        client = self.get_client(telegram_id)
+        return (client.google_calendar_id if client else None)
 
     def get_todoist_token(self, telegram_id: str) -> tp.Optional[str]:
         """
@@ -101,15 +536,8 @@ class ClientsDB:
         Returns:
             str или None: Значение todoist_token из БД, если есть, иначе None.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT todoist_token
-            FROM t_client
-            WHERE telegram_id = ?
-        ''', (telegram_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return (result[0] if result else None)
+        client = self.get_client(telegram_id)
+        return (client.todoist_token if client else None)
 
     def delete_client(self, telegram_id: str):
         """
@@ -118,10 +546,9 @@ class ClientsDB:
         Args:
             telegram_id (str): Идентификатор пользователя в Telegram.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM t_client WHERE telegram_id = ?', (telegram_id,))
-        self.conn.commit()
-        cursor.close()
+        error = self.write_batch([("delete_client", (telegram_id,))])[0]
+        if error is not None:
+            raise error
 
     def update_calendar_id(self, telegram_id, new_calendar_id):
         """
@@ -134,13 +561,7 @@ class ClientsDB:
             bool: True, если обновили хотя бы одну строку, False иначе.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("UPDATE t_client SET google_calendar_id = ? WHERE telegram_id = ?",
-                           (new_calendar_id, telegram_id))
-            self.conn.commit()
-            updated_rows = cursor.rowcount
-            cursor.close()
-            return updated_rows > 0
+            return self.write_batch([("update_calendar_id", (telegram_id, new_calendar_id))])[0]
         except Exception:
             return False
 
@@ -156,12 +577,6 @@ class ClientsDB:
             bool: True, если обновили хотя бы одну строку, False иначе.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("UPDATE t_client SET todoist_token = ? WHERE telegram_id = ?",
-                           (new_todoist_token, telegram_id))
-            self.conn.commit()
-            updated_rows = cursor.rowcount
-            cursor.close()
-            return updated_rows > 0
+            return self.write_batch([("update_todoist_token", (telegram_id, new_todoist_token))])[0]
         except Exception:
             return False
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+        Latency budget of a message has run out
+    """
+
+
+class Deadline:
+    """
+        Latency budget of one client's message, passed from the bot down to GPT, Calendar and Todoist
+
+        Attributes
+        __________
+        expires_at: float - moment (clock() seconds) after which the work is cancelled
+    """
+
+    def __init__(self, budget: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self) -> float:
+        """
+            Seconds left, never negative
+        """
+        return max(self.expires_at - self._clock(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def sub(self, budget: float) -> "Deadline":
+        """
+            Deadline for one stage: no later than budget seconds from now and no later than this one
+        """
+        child = Deadline(0, self._clock)
+        child.expires_at = min(self.expires_at, self._clock() + budget)
+        return child
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """
+            Awaits awaitable, cancels it and raises DeadlineExceeded when the budget runs out
+        """
+        if self.expired():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded()
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded() from e
+
+
+async def within(deadline: Optional[Deadline], awaitable: Awaitable[T]) -> T:
+    """
+        Awaits awaitable under deadline, or without a limit if deadline is None
+    """
+    if deadline is None:
+        return await awaitable
+    return await deadline.run(awaitable)
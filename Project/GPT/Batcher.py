@@ -0,0 +1,114 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    '''
+    Собирает одиночные запросы разных корутин в пакеты:
+    пакет отправляется, когда прошло window секунд с первого запроса или набралось max_items запросов.
+
+    process получает список элементов пакета и возвращает список результатов той же длины;
+    каждый результат возвращается корутине, которая отправила соответствующий элемент.
+    '''
+
+    def __init__(self, process: Callable[[List[T]], Awaitable[Sequence[R]]],
+                 window: float = 0.03, max_items: int = 16):
+        '''
+        :param process: Обработчик пакета
+        :param window: Сколько секунд ждать остальных запросов после первого
+        :param max_items: Максимальный размер пакета
+        '''
+        self._process = process
+        self._window = window
+        self._max_items = max_items
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.counters = Counter()
+
+    async def submit(self, item: T) -> R:
+        '''
+        Добавляет элемент в текущий пакет и ждёт его результат.
+        Если обработчик пакета упал, исключение получает каждая ожидающая корутина.
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self._max_items:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self.flush)
+        return await future
+
+    def flush(self):
+        '''
+        Немедленно отправляет накопленный пакет.
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Число пакетов и элементов, средний и максимальный размер пакета.
+        '''
+        batches, items = self.counters["batches"], self.counters["items"]
+        return {
+            "batches": batches,
+            "items": items,
+            "max_size": self.counters["max_size"],
+            "avg_size": items / batches if batches else 0.0,
+        }
+
+    async def close(self):
+        '''
+        Отменяет таймер, отправленные пакеты и ожидающие запросы.
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]):
+        # Корутины, которые уже отменены (например, по дедлайну), в пакет не попадают
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        self.counters["batches"] += 1
+        self.counters["items"] += len(batch)
+        self.counters["max_size"] = max(self.counters["max_size"], len(batch))
+        try:
+            results = await self._process([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if len(results) != len(batch):
+            error = ValueError(f"Обработчик вернул {len(results)} результатов на пакет из {len(batch)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Слова, с которыми время в сообщении отсчитывается от текущего момента, а не от даты
+RELATIVE_TIME_RE = re.compile(r"\b(?:через|спустя|сейчас|позже|попозже|скоро)\b")
+
+
+def normalize_text(text: str) -> str:
+    '''
+    Приводит текст пользователя к виду для ключа кэша:
+    нижний регистр, "ё" -> "е", без лишних пробелов и знаков препинания по краям.
+    '''
+    text = text.lower().replace("ё", "е")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .,!?;:…\"'«»")
+
+
+def relative_to_now(text: str) -> bool:
+    '''
+    Задаёт ли текст время относительно текущего момента ("через час", "сейчас").
+    Ответ на такой текст зависит от времени суток, поэтому по дате его кэшировать нельзя.
+    '''
+    return bool(RELATIVE_TIME_RE.search(normalize_text(text)))
+
+
+class ResponseCache:
+    '''
+    Двухуровневый кэш ответов LLM:
+    - в памяти: LRU на max_items записей;
+    - на диске: таблица SQLite на max_rows записей, переживает перезапуск бота.
+
+    Записи старше ttl секунд считаются устаревшими на обоих уровнях.
+
+    Кэш вызывается из цикла событий, поэтому новые ответы пишутся в SQLite не по одному, а пачкой
+    (flush_size записей или раз в flush_interval секунд, а также при close) в режиме WAL
+    без fsync на каждый commit; занятый другим процессом файл ждём не дольше busy_timeout.
+    Если запись не удалась, пачка остаётся в памяти до следующей попытки.
+    Из цикла событий кэш читается через aget: запрос к SQLite идёт в отдельном потоке
+    по соединению только для чтения. Ошибка чтения SQLite считается промахом.
+    '''
+
+    def __init__(self, path: Optional[str] = None, max_items: int = 10000,
+                 max_rows: int = 200000, ttl: float = 7 * 24 * 3600, flush_size: int = 100,
+                 flush_interval: float = 5, busy_timeout: float = 0.2,
+                 clock: Callable[[], float] = time.time):
+        '''
+        :param path: Файл SQLite. None — только кэш в памяти
+        :param max_items: Размер LRU в памяти
+        :param max_rows: Максимальное число строк в SQLite
+        :param ttl: Время жизни записи в секундах
+        :param flush_size: Сколько новых ответов копить перед записью в SQLite
+        :param flush_interval: Не реже чем раз во сколько секунд записывать накопленные ответы
+        :param busy_timeout: Сколько секунд ждать файл, занятый другим процессом
+        :param clock: Источник текущего времени в секундах
+        '''
+        self._max_items = max_items
+        self._max_rows = max_rows
+        self._ttl = ttl
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._flushed_at = clock()
+        self._writes = 0
+        self.counters = Counter()
+
+        # Таблицу создаём один раз при запуске, когда воркеры стартуют одновременно,
+        # поэтому здесь ждём занятый файл дольше, чем при записи пачек
+        self.conn = sqlite3.connect(path, timeout=30) if path else None
+        if self.conn is not None:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS t_gpt_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS i_gpt_cache_created ON t_gpt_cache (created_at)')
+            self.conn.commit()
+            self.conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+        self._reader = (sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                                        timeout=busy_timeout, check_same_thread=False) if path else None)
+        self._read_executor = (ThreadPoolExecutor(max_workers=1, thread_name_prefix="gpt-cache-read")
+                               if path else None)
+
+    @staticmethod
+    def make_key(kind: str, text: str, day: Optional[date] = None, **params) -> str:
+        '''
+        Строит ключ кэша.
+
+        :param kind: Вид промпта ("type", "event_title", "time_from", ...)
+        :param text: Текст пользователя
+        :param day: Дата запроса для промптов, ответ на которые зависит от текущей даты
+        :param params: Прочие параметры, влияющие на ответ (например, температура)
+        '''
+        parts = [kind, normalize_text(text), day.isoformat() if day else ""]
+        parts.extend(f"{name}={params[name]}" for name in sorted(params))
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        '''
+        Возвращает закэшированный ответ или None. SQLite читается в текущем потоке.
+        '''
+        now = self._clock()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+
+        # Ответ, вытесненный из LRU до записи на диск, ещё лежит в пачке
+        row = self._pending.get(key)
+        if row is None and self.conn is not None:
+            row = self._select(self.conn, key)
+        return self._disk_result(key, row, now)
+
+    async def aget(self, key: str) -> Optional[Dict]:
+        '''
+        То же, что get, но запрос к SQLite выполняется в потоке чтения и не блокирует цикл событий.
+        '''
+        now = self._clock()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+
+        row = self._pending.get(key)
+        if row is None and self._reader is not None:
+            row = await asyncio.get_running_loop().run_in_executor(self._read_executor, self._select,
+                                                                   self._reader, key)
+        return self._disk_result(key, row, now)
+
+    def set(self, key: str, value: Dict):
+        '''
+        Сохраняет ответ в памяти и добавляет его в пачку для записи в SQLite.
+        '''
+        now = self._clock()
+        self._remember(key, value, now)
+        if self.conn is None:
+            return
+        self._pending[key] = (json.dumps(value, ensure_ascii=False), now)
+        if len(self._pending) >= self._flush_size or now - self._flushed_at >= self._flush_interval:
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning(f"Не удалось записать кэш ответов в SQLite, повторим позже: {e}")
+
+    def flush(self):
+        '''
+        Записывает накопленные ответы в SQLite одной транзакцией.
+        '''
+        self._flushed_at = self._clock()
+        if self.conn is None or not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO t_gpt_cache (key, value, created_at) VALUES (?, ?, ?)',
+                                  [(key, value, created_at) for key, (value, created_at) in self._pending.items()])
+        self._writes += len(self._pending)
+        self._pending.clear()
+        # Чистим таблицу не на каждой записи, а примерно раз в 1000
+        if self._writes >= 1000:
+            self._writes = 0
+            self.evict()
+
+    def evict(self):
+        '''
+        Удаляет из SQLite устаревшие записи и самые старые сверх max_rows.
+        '''
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.execute('DELETE FROM t_gpt_cache WHERE created_at < ?', (self._clock() - self._ttl,))
+        self.conn.execute('''
+            DELETE FROM t_gpt_cache WHERE key IN (
+                SELECT key FROM t_gpt_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self._max_rows,))
+        self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Счётчики попаданий, промахов и ошибок чтения SQLite, размер кэша в памяти и доля попаданий.
+        '''
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        total = hits + self.counters["misses"]
+        return {
+            "memory_hits": self.counters["memory_hits"],
+            "disk_hits": self.counters["disk_hits"],
+            "misses": self.counters["misses"],
+            "read_errors": self.counters["read_errors"],
+            "memory_size": len(self._memory),
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def close(self):
+        '''
+        Записывает накопленные ответы и закрывает соединения с SQLite.
+        '''
+        if self._reader is not None:
+            self._read_executor.shutdown()
+            self._reader.close()
+            self._reader = None
+        if self.conn is not None:
+            self.conn.execute('PRAGMA busy_timeout = 30000')
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning(f"Не удалось записать кэш ответов при закрытии: {e}")
+            self.conn.close()
+            self.conn = None
+
+    def _remember(self, key: str, value: Dict, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_items:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if now - created_at >= self._ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.counters["memory_hits"] += 1
+        return value
+
+    def _select(self, conn: sqlite3.Connection, key: str) -> Optional[Tuple[str, float]]:
+        try:
+            return conn.execute('SELECT value, created_at FROM t_gpt_cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            self.counters["read_errors"] += 1
+            logger.warning(f"Не удалось прочитать кэш ответов из SQLite, считаем промахом: {e}")
+            return None
+
+    def _disk_result(self, key: str, row: Optional[Tuple[str, float]], now: float) -> Optional[Dict]:
+        if row is not None and now - row[1] < self._ttl:
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            self.counters["disk_hits"] += 1
+            return value
+
+        self.counters["misses"] += 1
+        return None
@@ -0,0 +1,126 @@
+import base64
+import time
+from collections import Counter
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from GPT.Token_manager import TokenManager
+
+
+class Credential:
+    '''
+    Один ключ GigaChat: свой TokenManager и свой учёт нагрузки и квоты.
+
+    Attributes
+    __________
+    name: str - имя ключа для логов и статистики (client_id без секрета)
+    weight: float - доля запросов относительно других ключей
+    tokens: TokenManager - OAuth токен этого ключа
+    in_flight: int - запросы, ожидающие ответа
+    exhausted_until: float - до какого момента (clock()) ключ выведен из ротации после 429
+    '''
+
+    def __init__(self, name: str, weight: float, tokens: TokenManager):
+        self.name = name
+        self.weight = weight
+        self.tokens = tokens
+        self.in_flight = 0
+        self.exhausted_until = 0.0
+        self.counters = Counter()
+
+
+class CredentialPool:
+    '''
+    Пул ключей GigaChat. Каждый запрос получает наименее загруженный ключ с учётом веса;
+    при равной загрузке ключи чередуются пропорционально весам (взвешенный round-robin).
+
+    Ключ, на который API ответил 429, выводится из ротации до конца окна квоты.
+    '''
+
+    def __init__(self, credentials: Sequence[Union[str, Tuple[str, float]]],
+                 fetch: Callable[[str], Awaitable[Dict]], refresh_margin: float = 60,
+                 exhausted_seconds: float = 10, clock: Callable[[], float] = time.monotonic):
+        '''
+        :param credentials: Строки "client_id:secret" или пары (строка, вес)
+        :param fetch: Корутина, запрашивающая токен по закодированным в base64 учётным данным
+        :param refresh_margin: За сколько секунд до истечения обновлять токен
+        :param exhausted_seconds: На сколько секунд выводить ключ из ротации, если 429 без Retry-After
+        :param clock: Источник текущего времени в секундах
+        '''
+        if not credentials:
+            raise ValueError("Нужен хотя бы один ключ GigaChat")
+        self._exhausted_seconds = exhausted_seconds
+        self._clock = clock
+        self.credentials: List[Credential] = []
+        for index, item in enumerate(credentials):
+            secret, weight = (item, 1.0) if isinstance(item, str) else item
+            encoded = base64.b64encode(secret.encode('utf-8')).decode('utf-8')
+            self.credentials.append(Credential(
+                f"{index}-{secret.split(':')[0][:8]}", weight,
+                TokenManager(partial(fetch, encoded), refresh_margin=refresh_margin)
+            ))
+
+    def choose(self) -> Credential:
+        '''
+        Возвращает ключ для следующего запроса, не занимая его.
+        Если все ключи исчерпаны, возвращает тот, чьё окно закончится раньше.
+        '''
+        now = self._clock()
+        available = [credential for credential in self.credentials if credential.exhausted_until <= now]
+        if not available:
+            return min(self.credentials, key=lambda credential: credential.exhausted_until)
+        return min(available, key=lambda credential: (credential.in_flight / credential.weight,
+                                                      credential.counters["requests"] / credential.weight))
+
+    def acquire(self) -> Credential:
+        '''
+        Занимает ключ под запрос. После ответа нужно вызвать release.
+        '''
+        credential = self.choose()
+        credential.in_flight += 1
+        credential.counters["requests"] += 1
+        return credential
+
+    def release(self, credential: Credential, used_tokens: int = 0):
+        credential.in_flight -= 1
+        credential.counters["tokens"] += used_tokens
+
+    def exhausted(self, credential: Credential, retry_after: Optional[float] = None):
+        '''
+        Выводит ключ из ротации до конца окна квоты.
+        '''
+        credential.counters["throttled"] += 1
+        window = self._exhausted_seconds if retry_after is None else retry_after
+        credential.exhausted_until = max(credential.exhausted_until, self._clock() + window)
+
+    def available(self) -> bool:
+        '''
+        Есть ли ключ, не выведенный из ротации.
+        '''
+        return self.reset_in() == 0
+
+    def reset_in(self) -> float:
+        '''
+        Через сколько секунд освободится хотя бы один ключ.
+        '''
+        return max(min(credential.exhausted_until for credential in self.credentials) - self._clock(), 0.0)
+
+    def stats(self) -> Dict[str, Dict]:
+        '''
+        По каждому ключу: запросы, израсходованные токены, число 429, в работе ли он сейчас.
+        '''
+        now = self._clock()
+        return {
+            credential.name: {
+                "requests": credential.counters["requests"],
+                "tokens": credential.counters["tokens"],
+                "throttled": credential.counters["throttled"],
+                "in_flight": credential.in_flight,
+                "exhausted_for": max(credential.exhausted_until - now, 0.0),
+            }
+            for credential in self.credentials
+        }
+
+    def close(self):
+        for credential in self.credentials:
+            credential.tokens.close()
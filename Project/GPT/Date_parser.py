@@ -0,0 +1,307 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+'''
+Детерминированный разбор дат и времени в русских фразах вида
+"завтра в 15:00", "в пятницу", "послезавтра в 10 утра", "через неделю", "с 10 до 12", "на полчаса".
+
+Если фраза разобрана однозначно, get_time_from и get_time_to не ходят в LLM.
+Если во фразе остались слова, похожие на дату или время, которые разбор не понял,
+parse_time возвращает None, и тогда используется LLM.
+'''
+
+
+@dataclass
+class ParsedTime:
+    """
+        Result of local date/time parsing
+
+        Attributes
+        __________
+        timefrom: Dict[str, str] - start, {'date': ...} or {'dateTime': ...}
+
+        dateto: Dict[str, str] - end in the same format as timefrom
+    """
+    timefrom: Dict[str, str]
+    dateto: Dict[str, str]
+
+
+UNITS = {
+    "ноль": 0, "один": 1, "одна": 1, "одну": 1, "два": 2, "две": 2, "три": 3, "четыре": 4,
+    "пять": 5, "шесть": 6, "семь": 7, "восемь": 8, "девять": 9, "десять": 10,
+    "одиннадцать": 11, "двенадцать": 12, "тринадцать": 13, "четырнадцать": 14,
+    "пятнадцать": 15, "шестнадцать": 16, "семнадцать": 17, "восемнадцать": 18,
+    "девятнадцать": 19,
+}
+TENS = {"двадцать": 20, "тридцать": 30, "сорок": 40, "пятьдесят": 50}
+
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+
+WEEKDAYS = {
+    "понедельник": 0, "вторник": 1, "среду": 2, "четверг": 3,
+    "пятницу": 4, "субботу": 5, "воскресенье": 6,
+}
+
+
+def _alternation(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+NUM_WORDS = rf"(?:(?:{_alternation(TENS)})(?:\s+(?:{_alternation(k for k, v in UNITS.items() if 0 < v < 10)}))?|{_alternation(UNITS)})"
+NUM = rf"(?:\d{{1,2}}|{NUM_WORDS})"
+MODIFIER = r"(?:утра|дня|вечера|ночи)"
+
+
+def _time(name: str) -> str:
+    '''
+    Регулярное выражение для времени суток с именованными группами <name>h, <name>m, <name>w, <name>mod.
+    '''
+    return (rf"(?:(?P<{name}h>\d{{1,2}})(?:[:.](?P<{name}m>\d{{2}}))?|(?P<{name}w>{NUM_WORDS}|час))"
+            rf"(?:\s+час(?:а|ов)?)?"
+            rf"(?:\s+(?P<{name}min>\d{{1,2}}|{NUM_WORDS})\s+минут\w*)?"
+            rf"(?:\s+(?P<{name}mod>{MODIFIER}))?")
+
+
+EXPLICIT_MONTH_RE = re.compile(rf"\b(\d{{1,2}})\s+({_alternation(MONTHS)})(?:\s+(\d{{4}})(?:\s+года?)?)?\b")
+EXPLICIT_DOTS_RE = re.compile(r"(?<!в )(?<!к )(?<!до )(?<!с )\b(\d{1,2})\.(\d{2})(?:\.(\d{2}|\d{4}))?\b")
+RELATIVE_DAY_RE = re.compile(r"\b(послезавтра|завтра|сегодня)\b")
+RELATIVE_SHIFT_RE = re.compile(rf"\bчерез\s+(?:(?P<n>{NUM}|пару)\s+)?(?P<unit>дня|дней|день|неделю|недели|недель)\b")
+RELATIVE_CLOCK_RE = re.compile(rf"\bчерез\s+(?:(?:(?P<n>{NUM}|пару)\s+)?(?P<unit>часа|часов|час|минуту|минуты|минут)|(?P<half>полчаса))\b")
+WEEKDAY_RE = re.compile(rf"\b(?:в|во)\s+({_alternation(WEEKDAYS)})\b")
+RANGE_RE = re.compile(rf"\bс\s+{_time('a')}\s+до\s+{_time('b')}\b")
+DASH_RANGE_RE = re.compile(r"\b(\d{1,2}):(\d{2})\s*[-–—]\s*(\d{1,2}):(\d{2})\b")
+UNTIL_RE = re.compile(rf"\bдо\s+{_time('b')}\b")
+DURATION_RE = re.compile(rf"\b(?:на|длится|продолжительностью)\s+(?:(?P<half>полчаса)|(?:(?P<n>{NUM}|полтора|полторы|пару)\s+)?(?P<unit>часа|часов|час|минуту|минуты|минут))\b")
+NOON_RE = re.compile(r"\b(?:в|к)\s+(полдень|полночь)\b")
+START_RE = re.compile(rf"\b(?:в|во|к)\s+{_time('a')}\b")
+BARE_CLOCK_RE = re.compile(r"\b(\d{1,2}):(\d{2})\b")
+PART_OF_DAY_RE = re.compile(r"\b(утром|днем|вечером|ночью)\b")
+
+'''
+Если после разбора в тексте остались такие слова, разбор считается неуверенным.
+'''
+HINT_RE = re.compile(
+    rf"\d|\b(?:{NUM_WORDS}|пару|без)\b|\b(?:утр|вечер|ноч|днем|полдень|полноч|пол[а-я]+ого|половин|час|минут|недел|месяц|год|"
+    r"числ|следующ|после|через|выходн|понедельн|вторник|сред|четверг|пятниц|суббот|воскресен|"
+    r"январ|феврал|март|апрел|ма[йя]\b|июн|июл|август|сентябр|октябр|ноябр|декабр|сегодня|завтра|вчера)"
+)
+
+PART_OF_DAY_MODIFIER = {"утром": "утра", "днем": "дня", "вечером": "вечера", "ночью": "ночи"}
+
+'''
+Если конец раньше начала, событие переносится через полночь, но только если оно не длиннее этого.
+"в 14:00 до 13:00" — скорее опечатка, чем событие на 23 часа.
+'''
+MAX_OVERNIGHT = timedelta(hours=12)
+
+
+class _Ambiguous(Exception):
+    pass
+
+
+def _number(word: Optional[str], default: int = 1) -> float:
+    if not word:
+        return default
+    if word.isdigit():
+        return int(word)
+    if word == "пару":
+        return 2
+    if word in ("полтора", "полторы"):
+        return 1.5
+    if word == "час":
+        return 1
+    parts = word.split()
+    value = TENS.get(parts[0], UNITS.get(parts[0], 0))
+    if len(parts) > 1:
+        value += UNITS[parts[1]]
+    return value
+
+
+def _clock(match: re.Match, name: str, modifier: Optional[str]) -> Tuple[int, int]:
+    '''
+    Достаёт часы и минуты из совпадения _time(name) с учётом "утра/дня/вечера/ночи".
+    '''
+    digits, minutes, words = match.group(f"{name}h"), match.group(f"{name}m"), match.group(f"{name}w")
+    spoken_minutes = match.group(f"{name}min")
+    modifier = match.group(f"{name}mod") or modifier
+
+    hour = int(digits) if digits is not None else int(_number(words))
+    minute = int(minutes) if minutes is not None else int(_number(spoken_minutes, 0))
+
+    if modifier is None and minutes is None and (words is not None or hour < 8) and hour != 0:
+        # "в три", "в 5" — непонятно, утро или вечер
+        raise _Ambiguous()
+    if modifier in ("дня", "вечера") and hour < 12 and (modifier == "вечера" or hour <= 6):
+        hour += 12
+    elif modifier in ("утра", "ночи") and hour == 12:
+        hour = 0
+    elif modifier == "ночи" and 9 <= hour < 12:
+        hour += 12
+
+    if hour > 23 or minute > 59:
+        raise _Ambiguous()
+    return hour, minute
+
+
+def _date(day: int, month: int, year: Optional[int], today: date) -> date:
+    if year is not None:
+        return date(year + 2000 if year < 100 else year, month, day)
+    result = date(today.year, month, day)
+    if result < today:
+        result = date(today.year + 1, month, day)
+    return result
+
+
+def _format(moment) -> Dict[str, str]:
+    if isinstance(moment, datetime):
+        return {'dateTime': moment.strftime("%Y-%m-%dT%H:%M:%S+03:00")}
+    return {'date': moment.strftime("%Y-%m-%d")}
+
+
+def parse_time(text: str, now: datetime) -> Optional[ParsedTime]:
+    '''
+    Разбирает дату и время события в тексте сообщения.
+
+    :param text: Сообщение пользователя
+    :param now: Текущее время (Query.current_time), относительно него считаются "завтра", "в пятницу" и т.п.
+
+    :return: ParsedTime или None, если в тексте нет даты либо её не удалось разобрать однозначно
+    '''
+    try:
+        return _parse(text, now)
+    except (_Ambiguous, ValueError):
+        return None
+
+
+def _parse(text: str, now: datetime) -> Optional[ParsedTime]:
+    s = " " + text.lower().replace("ё", "е") + " "
+    today = now.date()
+
+    def consume(regex: re.Pattern) -> List[re.Match]:
+        nonlocal s
+        matches = list(regex.finditer(s))
+        for match in matches:
+            start, end = match.span()
+            s = s[:start] + " " * (end - start) + s[end:]
+        return matches
+
+    days: List[date] = []
+    for match in consume(EXPLICIT_MONTH_RE):
+        days.append(_date(int(match.group(1)), MONTHS[match.group(2)],
+                          int(match.group(3)) if match.group(3) else None, today))
+    dotted = consume(EXPLICIT_DOTS_RE)
+    for match in dotted:
+        days.append(_date(int(match.group(1)), int(match.group(2)),
+                          int(match.group(3)) if match.group(3) else None, today))
+    for match in consume(RELATIVE_DAY_RE):
+        days.append(today + timedelta(days={"сегодня": 0, "завтра": 1, "послезавтра": 2}[match.group(1)]))
+    for match in consume(RELATIVE_SHIFT_RE):
+        step = 7 if match.group("unit").startswith("недел") else 1
+        days.append(today + timedelta(days=_number(match.group("n")) * step))
+    for match in consume(WEEKDAY_RE):
+        ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+        days.append(today + timedelta(days=ahead))
+
+    shifts = consume(RELATIVE_CLOCK_RE)
+    ranges = consume(RANGE_RE)
+    dash_ranges = consume(DASH_RANGE_RE)
+    untils = consume(UNTIL_RE)
+    durations = consume(DURATION_RE)
+    noons = consume(NOON_RE)
+    starts = consume(START_RE)
+    bare = consume(BARE_CLOCK_RE)
+
+    parts_of_day = {match.group(1) for match in PART_OF_DAY_RE.finditer(s)}
+    if len(parts_of_day) > 1 or len(days) > 1:
+        raise _Ambiguous()
+    modifier = PART_OF_DAY_MODIFIER[parts_of_day.pop()] if parts_of_day else None
+
+    start_clock: Optional[Tuple[int, int]] = None
+    end_clock: Optional[Tuple[int, int]] = None
+    # Конец без своего "утра/вечера" относится к той же части суток, что и начало:
+    # "в 10 вечера до 11" — до 23:00
+    start_modifier = modifier
+    candidates = len(ranges) + len(dash_ranges) + len(noons) + len(starts) + len(bare)
+    if candidates > 1 or len(untils) > 1 or len(durations) > 1 or len(shifts) > 1:
+        raise _Ambiguous()
+    if ranges:
+        start_clock = _clock(ranges[0], "a", ranges[0].group("bmod") or modifier)
+        end_clock = _clock(ranges[0], "b", ranges[0].group("amod") or modifier)
+    elif dash_ranges:
+        h1, m1, h2, m2 = map(int, dash_ranges[0].groups())
+        start_clock, end_clock = (h1, m1), (h2, m2)
+    elif noons:
+        start_clock = (12, 0) if noons[0].group(1) == "полдень" else (0, 0)
+    elif starts:
+        start_clock = _clock(starts[0], "a", modifier)
+        start_modifier = starts[0].group("amod") or modifier
+    elif bare:
+        start_clock = (int(bare[0].group(1)), int(bare[0].group(2)))
+    if untils:
+        if end_clock is not None:
+            raise _Ambiguous()
+        end_clock = _clock(untils[0], "b", start_modifier)
+
+    if modifier is not None:
+        if start_clock is None:
+            # "завтра вечером" без точного времени — пусть решает LLM
+            raise _Ambiguous()
+        consume(PART_OF_DAY_RE)
+
+    if HINT_RE.search(s):
+        raise _Ambiguous()
+
+    if shifts:
+        if start_clock is not None or days:
+            raise _Ambiguous()
+        shift = shifts[0]
+        if shift.group("half"):
+            delta = timedelta(minutes=30)
+        elif shift.group("unit").startswith("час"):
+            delta = timedelta(hours=_number(shift.group("n")))
+        else:
+            delta = timedelta(minutes=_number(shift.group("n")))
+        begin = (now + delta).replace(second=0, microsecond=0)
+        start_clock = (begin.hour, begin.minute)
+        days = [begin.date()]
+
+    # "встреча 12.05" — 12 мая или 12:05; без года и без другого времени не угадываем
+    if start_clock is None and any(match.group(3) is None and int(match.group(1)) <= 23
+                                   and int(match.group(2)) <= 59 for match in dotted):
+        raise _Ambiguous()
+
+    if not days and start_clock is None:
+        return None
+    day = days[0] if days else today
+
+    if start_clock is None:
+        if end_clock is not None or durations:
+            raise _Ambiguous()
+        return ParsedTime(_format(day), _format(day))
+
+    begin = datetime.combine(day, datetime.min.time()).replace(hour=start_clock[0], minute=start_clock[1])
+    if end_clock is not None:
+        if durations:
+            raise _Ambiguous()
+        finish = begin.replace(hour=end_clock[0], minute=end_clock[1])
+        if finish <= begin:
+            finish += timedelta(days=1)
+            if finish - begin > MAX_OVERNIGHT:
+                raise _Ambiguous()
+    elif durations:
+        duration = durations[0]
+        if duration.group("half"):
+            delta = timedelta(minutes=30)
+        elif duration.group("unit").startswith("час"):
+            delta = timedelta(hours=_number(duration.group("n")))
+        else:
+            delta = timedelta(minutes=_number(duration.group("n")))
+        finish = begin + delta
+    else:
+        finish = begin + timedelta(hours=1)
+    return ParsedTime(_format(begin), _format(finish))
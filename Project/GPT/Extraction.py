@@ -0,0 +1,153 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pathlib import Path
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from Request import Request, RequestType
+
+
+class ExtractionError(ValueError):
+    '''
+    Ответ LLM не является корректным JSON по схеме EXTRACTION_SCHEMA.
+    '''
+
+
+'''
+Схема ответа на запрос извлечения: имя поля -> (допустимые типы, обязательное ли поле).
+'''
+EXTRACTION_SCHEMA = {
+    "type": ((str,), True),
+    "title": ((str,), True),
+    "description": ((str, type(None)), False),
+    "start": ((str, type(None)), False),
+    "end": ((str, type(None)), False),
+}
+
+TYPES = {
+    "event": RequestType.EVENT,
+    "task": RequestType.GOAL,
+    "else": RequestType.ELSE,
+}
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DATETIME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})[T ](\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+
+def parse_extraction(raw: str, request_type: Optional[str] = None) -> Dict[str, Any]:
+    '''
+    Достаёт JSON-объект из ответа модели и проверяет его по схеме.
+
+    :param raw: Текст ответа модели, возможно обёрнутый в ```json ... ```
+    :param request_type: Тип ("event" или "task"), заданный пользователем явно; заменяет тип из ответа
+                         до проверки, поэтому событие без даты начала тоже считается ошибкой
+
+    :return: словарь с полями type, title, description, start, end
+    '''
+    start, end = raw.find("{"), raw.rfind("}")
+    if start == -1 or end <= start:
+        raise ExtractionError(f"В ответе нет JSON-объекта: {raw!r}")
+    try:
+        data = json.loads(raw[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ExtractionError(f"Некорректный JSON: {e}") from e
+    return validate_extraction(data, request_type)
+
+
+def validate_extraction(data: Any, request_type: Optional[str] = None) -> Dict[str, Any]:
+    '''
+    Проверяет словарь по EXTRACTION_SCHEMA и приводит значения к единому виду.
+
+    :param data: Разобранный JSON
+    :param request_type: Тип, заданный явно (см. parse_extraction)
+
+    :return: словарь со всеми полями схемы
+    '''
+    if not isinstance(data, dict):
+        raise ExtractionError("Ответ должен быть JSON-объектом")
+    if request_type is not None:
+        data = dict(data, type=request_type)
+
+    result = {}
+    for field, (types, required) in EXTRACTION_SCHEMA.items():
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is None and required:
+            raise ExtractionError(f"Нет обязательного поля {field}")
+        if not isinstance(value, types):
+            raise ExtractionError(f"Поле {field} имеет неверный тип")
+        result[field] = value
+
+    result["type"] = result["type"].lower()
+    if result["type"] not in TYPES:
+        raise ExtractionError(f"Неизвестный тип {result['type']}")
+
+    for field in ("start", "end"):
+        if result[field] is not None and not to_time(result[field]):
+            raise ExtractionError(f"Поле {field} не является датой: {result[field]}")
+
+    if result["type"] == "event" and result["start"] is None:
+        raise ExtractionError("У события нет даты начала")
+    return result
+
+
+def to_time(value: Optional[str]) -> Dict[str, str]:
+    '''
+    Приводит дату из JSON к формату Google Calendar.
+
+    :param value: "yyyy-mm-dd" или "yyyy-mm-ddThh:mm[:ss]"
+
+    :return: {'date': ...}, {'dateTime': 'yyyy-mm-ddThh:mm:ss+03:00'} или {}, если дата некорректна
+    '''
+    if not value:
+        return {}
+    value = value.strip()
+    try:
+        if _DATE_RE.match(value):
+            datetime.strptime(value, "%Y-%m-%d")
+            return {'date': value}
+        match = _DATETIME_RE.match(value)
+        if match:
+            date, hours, minutes, seconds = match.groups()
+            dt = datetime.strptime(f"{date} {hours}:{minutes}:{seconds or '00'}", "%Y-%m-%d %H:%M:%S")
+            return {'dateTime': dt.strftime("%Y-%m-%dT%H:%M:%S+03:00")}
+    except ValueError:
+        return {}
+    return {}
+
+
+def to_request(data: Dict[str, Any], client_id: str) -> Optional[Request]:
+    '''
+    Превращает проверенный ответ извлечения в Request.
+
+    :param data: Результат validate_extraction
+    :param client_id: Telegram ID пользователя
+
+    :return: Request или None, если тип запроса не определён
+    '''
+    request_type = TYPES[data["type"]]
+    if request_type == RequestType.ELSE:
+        return None
+
+    timefrom = to_time(data["start"])
+    if request_type == RequestType.GOAL:
+        return Request(request_type, client_id, data["title"], timefrom, {}, data["description"])
+
+    # Начало и конец должны быть в одном формате и идти по порядку
+    dateto = to_time(data["end"])
+    key = "dateTime" if "dateTime" in timefrom else "date"
+    if key not in dateto:
+        dateto = dict(timefrom)
+    elif dateto[key] < timefrom[key]:
+        timefrom, dateto = dateto, timefrom
+    return Request(request_type, client_id, data["title"], timefrom, dateto, data["description"])
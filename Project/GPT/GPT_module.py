@@ -2,9 +2,12 @@ import requests
 import base64
 import uuid
 import json
+from collections import Counter
+import re
 from datetime import datetime, timedelta
 from pathlib import Path
 import asyncio
+import time
 import aiohttp
 
 search_directory = Path('../')
@@ -17,19 +20,169 @@ sys.path.append('project')
 
 from Query import Query
 from Request import Request, RequestType
+from Deadline import Deadline, within
 
 from GPT.credentials import cal_credentials
+from GPT.Credential_pool import CredentialPool
+from GPT.Extraction import ExtractionError, parse_extraction, to_request
+from GPT.Date_parser import parse_time
+from GPT.Intent_classifier import IntentClassifier
+from GPT.Cache import ResponseCache, relative_to_now
+from GPT.Router import ModelRouter
+from GPT.Timings import StageTimings, TimingStats
+from GPT.Batcher import MicroBatcher
+from GPT.Usage import UsageTracker
+from GPT.Prompts import (TYPE_SYSTEM, TYPE_BATCH_SYSTEM, EVENT_TITLE_SYSTEM, TASK_TITLE_SYSTEM,
+                         TIME_FROM_SYSTEM, TIME_TO_SYSTEM, DESCRIPTION_SYSTEM, EXTRACT_SYSTEM)
+from GPT.Rate_limiter import (RateLimiter, RateLimitExceeded,
+                              PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
 
 import logging
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 logging.captureWarnings(True)
 
+WEEKDAYS = ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+
+TYPE_WORDS_RE = re.compile(r"event|task|todo|else|событие|мероприятие")
+
+
+def type_decided(text: str) -> bool:
+    '''
+    Условие остановки потока для get_type: в ответе уже есть слово с типом.
+    '''
+    return bool(TYPE_WORDS_RE.search(text.lower()))
+
+
+def bracket_closed(text: str) -> bool:
+    '''
+    Условие остановки потока для промптов дат: ответ "[<дата>; <время>]" уже закрыт.
+    '''
+    return "]" in text
+
+
+def extraction_cacheable(raw: str, request_type: Optional[str] = None) -> bool:
+    '''
+    Условие кэширования ответа extract: корректный JSON с определённым типом.
+    Ответ, после которого приходится переходить на запросы по полям, не кэшируется.
+    '''
+    try:
+        return parse_extraction(raw, request_type)["type"] != "else"
+    except ExtractionError:
+        return False
+
+
 class GPT:
-    _token = None
-    _model = "GigaChat-Max"
     _url = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
 
+    def __init__(self, connections_limit: int = 100, connections_per_host: int = 20,
+                 keepalive_timeout: float = 30, request_timeout: float = 60,
+                 token_refresh_margin: float = 60, extraction_mode: str = "json",
+                 intent_threshold: float = 0.85, intent_history_path: Optional[str] = None,
+                 intent_audit_rate: float = 0.05,
+                 cache_path: Optional[str] = None, cache_size: int = 10000,
+                 cache_ttl: float = 7 * 24 * 3600, models=ModelRouter.DEFAULT_MODELS,
+                 routing_policy: str = "quality", latency_budget: float = 5.0, speculative: bool = False,
+                 batch_window: float = 0.03, batch_size: int = 16, rps: float = 10,
+                 tpm: Optional[float] = None, max_concurrency: int = 20, max_queue: int = 500,
+                 throttle_retries: int = 3, credentials: Optional[Sequence] = None,
+                 key_cooldown: float = 10, usage_path: Optional[str] = None,
+                 prices: Optional[Dict[str, float]] = None):
+        '''
+        :param connections_limit: Максимальное число одновременных соединений в пуле
+        :param connections_per_host: Максимальное число соединений к одному хосту
+        :param keepalive_timeout: Сколько секунд держать простаивающее соединение открытым
+        :param request_timeout: Общий таймаут одного HTTP-запроса в секундах
+        :param token_refresh_margin: За сколько секунд до истечения обновлять API токен
+        :param extraction_mode: "json" — один запрос на всё сообщение, "fields" — отдельный запрос на каждое поле
+        :param intent_threshold: Уверенность локального классификатора, при которой get_type не спрашивает LLM
+        :param intent_history_path: JSONL-файл с историей ответов LLM для дообучения классификатора
+        :param intent_audit_rate: Доля уверенных ответов классификатора, которые всё равно перепроверяются LLM,
+                                  чтобы stats() классификатора показывал его точность. 0 — без проверок
+        :param cache_path: Файл SQLite для кэша ответов LLM. None — кэш только в памяти
+        :param cache_size: Число ответов в LRU-кэше в памяти
+        :param cache_ttl: Время жизни закэшированного ответа в секундах
+        :param models: Пары (модель, относительная стоимость) в порядке убывания качества
+        :param routing_policy: Политика выбора модели: "quality", "latency" или "cost"
+        :param latency_budget: Допустимая задержка модели в секундах для политики "quality"
+        :param speculative: Запрашивать поля параллельно с определением типа, не дожидаясь его
+        :param batch_window: Сколько секунд get_type ждёт других сообщений, чтобы спросить их типы одним запросом.
+                             0 — без пакетов
+        :param batch_size: Максимальное число сообщений в одном пакете get_type
+        :param rps: Лимит запросов к GigaChat в секунду
+        :param tpm: Лимит токенов в минуту. None — без ограничения
+        :param max_concurrency: Максимальное число одновременных запросов к GigaChat
+        :param max_queue: Максимальная длина очереди ожидающих запросов
+        :param throttle_retries: Сколько раз повторять запрос после 429, прежде чем сдаться
+        :param credentials: Ключи GigaChat — строки "client_id:secret" или пары (строка, вес).
+                            По умолчанию один ключ cal_credentials из GPT/credentials.py
+        :param key_cooldown: На сколько секунд выводить ключ из ротации после 429 без Retry-After
+        :param usage_path: Файл SQLite для учёта расхода токенов. None — учёт только в памяти
+        :param prices: Цена 1000 токенов по моделям для отчётов о стоимости
+        '''
+        self._connections_limit = connections_limit
+        self._connections_per_host = connections_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._request_timeout = request_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.credentials = CredentialPool(credentials or [cal_credentials], self._fetch_token,
+                                          token_refresh_margin, key_cooldown)
+        self._extraction_mode = extraction_mode
+        self.classifier = IntentClassifier(intent_threshold, intent_history_path, intent_audit_rate)
+        self.cache = ResponseCache(cache_path, max_items=cache_size, ttl=cache_ttl)
+        self.router = ModelRouter(models, routing_policy, latency_budget)
+        self._speculative = speculative
+        self.timing_stats = TimingStats()
+        self.stream_counters = Counter()
+        self._session_ids: Dict[Tuple[str, str], str] = {}
+        self.usage = UsageTracker(usage_path, prices=prices)
+        self.limiter = RateLimiter(rps, tpm, max_concurrency, max_queue)
+        self._throttle_retries = throttle_retries
+        self._type_batcher = MicroBatcher(
+            lambda items: self.classify_batch([text for text, _ in items], [client for _, client in items]),
+            batch_window, batch_size
+        ) if batch_window > 0 else None
+
+    async def start(self):
+        '''
+        Создаёт общую HTTP-сессию с keep-alive пулом соединений.
+        Вызывается при старте бота; повторный вызов ничего не делает.
+        '''
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self._connections_limit,
+            limit_per_host=self._connections_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+            ssl=False
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self._request_timeout)
+        )
+
+    async def close(self):
+        '''
+        Закрывает общую HTTP-сессию и все соединения пула. Вызывается при остановке бота.
+        '''
+        if self._type_batcher is not None:
+            await self._type_batcher.close()
+        self.limiter.close()
+        self.credentials.close()
+        self.cache.close()
+        self.usage.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        '''
+        Возвращает общую HTTP-сессию, при необходимости создавая её.
+        '''
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
     async def get_token(self, auth_token, scope='GIGACHAT_API_PERS'):
         '''
         Функция возвращает API токен для gigachat
@@ -49,57 +202,268 @@ class GPT:
             'scope': scope
         }
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, data=payload, ssl=False) as response:
-                    return await response.json()
+            session = await self.get_session()
+            async with session.post(url, headers=headers, data=payload) as response:
+                return await response.json()
         except aiohttp.ClientError as e:
             print(f"Ошибка: {str(e)}")
             return -1
 
-    async def check_token(self):
+    async def _fetch_token(self, encoded_credentials: str):
+        '''
+        Запрашивает новый API токен для одного ключа пула.
+        Используется TokenManager-ом этого ключа.
         '''
-        Проверяет, получен ли API токен, и, если нет, устанавливает токен в соответствующее поле.
+        return await self.get_token(encoded_credentials)
+
+    async def check_token(self) -> str:
         '''
-        if self._token is None:
-            encoded_credentials = base64.b64encode(cal_credentials.encode('utf-8')).decode('utf-8')
-            self._token = (await self.get_token(encoded_credentials))["access_token"]
+        Проверяет, что API токен ключа, который получит следующий запрос, получен и не истекает,
+        при необходимости обновляет его. Запросам к модели это не нужно: _post сам получает
+        и обновляет токен того ключа, который занял, — метод годится для прогрева при старте.
 
-    async def request(self, message: str, max_tockens: int = 50, temp=1):
+        :return: действующий токен
+        '''
+        return await self.credentials.choose().tokens.get_token()
+
+    async def request(self, message: str, max_tockens: int = 50, temp=1, cache_key: Optional[str] = None,
+                      priority: int = PRIORITY_NORMAL, stop: Optional[Callable[[str], bool]] = None,
+                      system: Optional[str] = None, kind: Optional[str] = None,
+                      client_id: Union[str, Sequence[str], None] = None,
+                      cacheable: Optional[Callable[[str], bool]] = None):
         '''
         Функция для запросов к API
         
         :param message: Сообщение, отправляемое LLM
         :param max_tockens: Максимальное количество токенов в ответе
         :param temp: Температура. Влияет на ответ
+        :param cache_key: Ключ кэша (ResponseCache.make_key). Если задан, повторный запрос не уходит в API
+        :param priority: Приоритет в очереди RateLimiter
+        :param stop: Условие остановки. Если задано, ответ читается потоком (stream) и соединение
+                     закрывается, как только stop(уже полученный текст) вернёт True
+        :param system: Неизменяемое системное сообщение промпта (см. GPT/Prompts.py)
+        :param kind: Вид промпта ("type", "time_from", ...). Запросы одного вида идут в одной сессии
+                     GigaChat (X-Session-ID), чтобы общий префикс кэшировался на стороне API
+        :param client_id: Пользователь (или пользователи пакета), на которого записывается расход токенов
+        :param cacheable: Условие на текст ответа: если задано, в кэш попадают только ответы, для которых оно истинно
+                          (неопределённый тип, некорректный JSON не должны повторяться из кэша)
         
         :return: словарь
         '''
-        payload = json.dumps({
-            "model": self._model,
-            "messages": [
+        if cache_key is not None:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        response = await self._post(message, max_tockens, temp, priority, stop, system, kind, client_id)
+        if cache_key is not None and "choices" in response and (
+                cacheable is None or cacheable(response["choices"][0]["message"]["content"])):
+            self.cache.set(cache_key, response)
+        return response
+
+    def _dated_key(self, kind: str, content: Query, **params) -> Optional[str]:
+        '''
+        Ключ кэша для промпта, в котором есть текущее время. Ключ включает дату; сообщения со временем
+        относительно текущего момента ("через час") не кэшируются — ответ зависит от времени суток.
+        '''
+        if relative_to_now(content.content):
+            return None
+        return self.cache.make_key(kind, content.content, content.current_time.date(), **params)
+
+    async def _post(self, message: str, max_tockens: int, temp, priority: int = PRIORITY_NORMAL,
+                    stop: Optional[Callable[[str], bool]] = None, system: Optional[str] = None,
+                    kind: Optional[str] = None, client_id: Union[str, Sequence[str], None] = None):
+        '''
+        Отправляет запрос к API без кэша. Модель выбирает ModelRouter, ему же сообщается результат.
+        Каждая попытка проходит через общий RateLimiter и получает ключ из пула CredentialPool.
+        Ответ 429 выводит ключ из ротации, и запрос уходит с другим ключом; если свободных ключей нет,
+        лимитер замедляется, и запрос ждёт в его очереди, а не повторяется сразу.
+
+        :raises RateLimitExceeded: если очередь лимитера переполнена или все ключи исчерпаны throttle_retries раз подряд
+        '''
+        model = self.router.choose()
+        recorded = False
+
+        def record(latency: float, ok: bool):
+            nonlocal recorded
+            recorded = True
+            self.router.record(model, latency, ok)
+
+        try:
+            messages = [
                 {
                     "role": "user",
                     "content": message
                 }
-            ],
-            "stream": False,
-            "max_tokens": max_tockens,
-            "temerature": temp
-        })
+            ]
+            if system is not None:
+                messages.insert(0, {"role": "system", "content": system})
+            payload = json.dumps({
+                "model": model,
+                "messages": messages,
+                "stream": stop is not None,
+                "max_tokens": max_tockens,
+                "temerature": temp
+            })
+
+            session = await self.get_session()
+            # Грубая оценка: ~3 символа на токен промпта плюс максимум ответа
+            prompt_tokens = (len(message) + len(system or "")) // 3
+            estimated = prompt_tokens + max_tockens
+            refreshed = set()
+            throttled = 0
+
+            while True:
+                async with self.limiter.limit(estimated, priority):
+                    credential = self.credentials.acquire()
+                    used_tokens = 0
+                    try:
+                        token = await credential.tokens.get_token()
+                        headers = {
+                            'Content-Type': 'application/json',
+                            'Accept': 'application/json',
+                            'Authorization': f'Bearer {token}'
+                        }
+                        if kind is not None:
+                            headers['X-Session-ID'] = self._session_id(credential.name, kind)
+                        started = time.monotonic()
+                        try:
+                            async with session.post(self._url, headers=headers, data=payload) as response:
+                                status = response.status
+                                retry_after = response.headers.get("Retry-After")
+                                if status == 200 and stop is not None:
+                                    result = await self._read_stream(response, stop)
+                                elif status != 401 or credential in refreshed:
+                                    result = await response.json()
+                                else:
+                                    result = None
+                        except Exception:
+                            record(time.monotonic() - started, False)
+                            raise
+                        latency = time.monotonic() - started
+                        if isinstance(result, dict) and isinstance(result.get("usage"), dict):
+                            used_tokens = result["usage"].get("total_tokens", 0)
+                    finally:
+                        self.credentials.release(credential, used_tokens)
+
+                # Токен отозван или истёк раньше срока — обновляем и повторяем один раз
+                if status == 401 and credential not in refreshed:
+                    refreshed.add(credential)
+                    credential.tokens.invalidate(token)
+                    continue
+
+                # 401 и 429 — проблемы токена и квоты, а не модели
+                record(latency, status in (200, 401, 429))
+                if status == 429:
+                    # Ключ исчерпал квоту — уходим на другой; если свободных нет, ждём в очереди лимитера
+                    self.credentials.exhausted(
+                        credential, float(retry_after) if retry_after and retry_after.isdigit() else None)
+                    if not self.credentials.available():
+                        self.limiter.backoff(self.credentials.reset_in())
+                        throttled += 1
+                        if throttled > self._throttle_retries:
+                            raise RateLimitExceeded("GigaChat отвечает 429 на всех ключах")
+                    continue
+
+                self.limiter.success()
+                if used_tokens:
+                    self.limiter.correct(estimated, used_tokens)
+                    self.usage.record(kind, model, client_id, result["usage"])
+                else:
+                    # Ответ без usage (поток, закрытый досрочно, или ошибка) — учитываем запрос по оценке
+                    self.usage.record(kind, model, client_id, self._estimate_usage(prompt_tokens, result),
+                                      estimated=True)
+                return result
+        finally:
+            # Запрос отменён (дедлайн, CancelledError) или не дошёл до модели (очередь лимитера, токен):
+            # о модели это ничего не говорит, но пробный запрос предохранителя нужно освободить
+            if not recorded:
+                self.router.release(model)
+
+    @staticmethod
+    def _estimate_usage(prompt_tokens: int, result) -> Dict[str, int]:
+        '''
+        Оценка блока usage по длине промпта и полученной (возможно, неполной) части ответа.
+        '''
+        try:
+            content = result["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            content = ""
+        completion_tokens = len(content) // 3 + (1 if content else 0)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _session_id(self, credential: str, kind: str) -> str:
+        '''
+        Идентификатор сессии GigaChat для вида промпта. Кэш префикса живёт в рамках аккаунта,
+        поэтому у каждого ключа пула свои сессии.
+        '''
+        key = (credential, kind)
+        if key not in self._session_ids:
+            self._session_ids[key] = str(uuid.uuid4())
+        return self._session_ids[key]
 
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'Authorization': f'Bearer {self._token}'
-        }
+    def prompt_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        '''
+        По каждому виду промпта: запросы, оплаченные и закэшированные (precached_prompt_tokens) токены промпта,
+        токены ответа и доля промпта, взятая из кэша.
+        '''
+        result = {}
+        for row in self.usage.report(("kind",)):
+            billed, cached = row["prompt_tokens"], row["precached_prompt_tokens"]
+            result[row["kind"]] = dict(row, cached_share=cached / (billed + cached) if billed + cached else 0.0)
+        return result
+
+    @staticmethod
+    def _user_message(text: str, current_time: Optional[datetime] = None) -> str:
+        '''
+        Короткое изменяемое сообщение промпта: текст пользователя и, для дат, текущее время.
+        '''
+        message = f'Сообщение пользователя: "{text}".'
+        if current_time is not None:
+            message += f' Текущее время: {current_time.strftime("%Y-%m-%d %H:%M:%S")} ({WEEKDAYS[current_time.weekday()]}).'
+        return message
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self._url, headers=headers, data=payload, ssl=False) as response:
-                return await response.json()
+    async def _read_stream(self, response: aiohttp.ClientResponse, stop: Callable[[str], bool]) -> Dict:
+        '''
+        Читает ответ GigaChat в режиме stream (server-sent events: строки "data: {...}", в конце "data: [DONE]").
+        Как только stop(полученный текст) истинно, закрывает соединение, не дожидаясь остальных токенов.
+
+        :return: словарь в формате обычного (не потокового) ответа API
+        '''
+        self.stream_counters["streams"] += 1
+        parts = []
+        finish_reason = None
+        usage = None
+        async for line in response.content:
+            line = line.decode('utf-8').strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices", []):
+                parts.append(choice.get("delta", {}).get("content") or "")
+                finish_reason = choice.get("finish_reason") or finish_reason
+            if finish_reason is None and stop("".join(parts)):
+                self.stream_counters["early_stops"] += 1
+                finish_reason = "early_stop"
+                response.close()
+                break
+
+        result = {"choices": [{"message": {"role": "assistant", "content": "".join(parts)},
+                               "finish_reason": finish_reason}]}
+        if usage is not None:
+            result["usage"] = usage
+        return result
 
     async def get_type(self, content: Query, temp=1) -> RequestType:
         '''
         Получает тип запроса пользователя. 
+        Очевидные случаи решает локальный классификатор, LLM спрашивается, только если он не уверен.
+        Запросы с temp=1 от разных пользователей собираются в пакеты (см. classify_batch).
         
         :param content: Запрос пользователя
         :param temp: Температура. Влияет на ответ
@@ -107,52 +471,99 @@ class GPT:
         :return: RequestType
         '''
         
-        await self.check_token()
-
-        message = f'''Вся информация, которую я упоминаю в этом чате, должна остаться строго в рамках этого чата. Не сохраняй её, не используй ни в каких других контекстах и не упоминай её нигде в будущем. Считай, что вся информация исчезает сразу после завершения беседы, и ты не знаешь, что она когда-либо существовала. Не сохраняй и не используй эти данные в других чатах или беседях.
-                        Не используй какого-либо контекста кроме этого сообщения, считай его первым, которое ты видел.
-                        Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией календаря и todo-лист. У тебя лимит в 8 слов. 
-        Пользователь отправил сообщение: "{content.content}". Твоя задача — определить, хочет ли пользователь:
-        1. Создать событие в календаре (например, встреча, контрольная, концерт, какой-нибудь праздник, экзамен, поездка, и так далее).
-        2. Создать задачу для выполнения в todo-листе (например, купить продукты, обнять друга, покормить котят, сделать дз, и так далее).
-        Если пользователь хочет создать событие, напиши "event". Если это задача, напиши "task". Если невозможно определить, напиши "else".
-
-        Примеры:
-        1. "Сделать домашнее задание" -> task
-        2. "Обнять Костю" -> task
-        3. "Встреча с Олегом завтра в 19:00" -> event
-        4. "Купить продукты" -> task
-        5. "Посмотреть фильм с друзьями" -> task
-        6. "Позвонить маме в воскресенье" -> task
-        7. "Покормить бездомных собак" -> task
-        8. "Репетиция хора в 18:00" -> event
-        9. "Собрание в школе в пятницу" -> event
-        10. "Приготовить ужин для семьи" -> task
-        11. "Сходить на каток с друзьями" -> task
-        12. "День рождения Анны завтра в 18:00" -> event
-        13. "Подготовка к контрольной в среду" -> task
-        14. "Встреча с заказчиком через неделю" -> event
-        15. "Уборка квартиры" -> task
-
-        Напиши только тип ("event", "task" или "else")!'''
-
+        if temp == 1:
+            local = self.classifier.classify(content.content)
+            if local is not None:
+                return local
+
+        # Повторы с высокой температурой — попытки исправить неудачный ответ, их не кэшируем
+        cache_key = self.cache.make_key("type", content.content, temp=temp) if temp == 1 else None
+        cached = await self.cache.aget(cache_key) if cache_key is not None else None
+        if cached is not None:
+            # Ответ LLM на эту фразу классификатор уже учёл
+            return self._type_from_answer(cached['choices'][0]['message']['content'])
         try:
-            ans = ((await self.request(message, 100, temp))['choices'][0]['message']['content']).lower()
-        except Exception as e:
-            print(e)
-            if "Max" in self._model:
-                self._model = "GigaChat-Pro"
-                return RequestType.ELSE
+            if temp == 1 and self._type_batcher is not None:
+                ans = await self._get_type_batched(content.content, cache_key, content.client_id)
             else:
-                self._model = "GigaChat"
-                return RequestType.ELSE
-        
+                ans = await self._get_type_single(content.content, temp, cache_key, content.client_id)
+        except RateLimitExceeded:
+            # Повтор с другой температурой только усилит перегрузку
+            raise
+        except Exception as e:
+            # Неработающую модель отключит ModelRouter, следующий запрос уйдёт в другую
+            logging.warning("Ошибка в get_type: %s", e)
+            return RequestType.ELSE
+
+        result = self._type_from_answer(ans)
+        if temp == 1:
+            self.classifier.record_llm(content.content, result)
+        return result
+
+    @staticmethod
+    def _type_from_answer(ans: str) -> RequestType:
+        ans = ans.lower()
         if "event" in ans or "событие" in ans or "мероприятие" in ans:
             return RequestType.EVENT
-        elif "todo" in ans or "task" in ans:
+        if "todo" in ans or "task" in ans:
             return RequestType.GOAL
-        else:
-            return RequestType.ELSE
+        return RequestType.ELSE
+
+    async def _get_type_single(self, text: str, temp, cache_key: Optional[str],
+                               client_id: Union[str, Sequence[str], None] = None) -> str:
+        '''
+        Спрашивает тип одного сообщения отдельным запросом; понятный ответ кладётся в кэш под cache_key.
+        Кэш здесь не читается: get_type проверяет его сам, чтобы отличать ответы из кэша от новых.
+        '''
+        message = self._user_message(text)
+
+        ans = (await self.request(message, 100, temp, None, PRIORITY_HIGH, type_decided,
+                                  TYPE_SYSTEM, "type", client_id))['choices'][0]['message']['content'].lower()
+        self._cache_type(cache_key, ans)
+        return ans
+
+    async def _get_type_batched(self, text: str, cache_key: str, client_id: Optional[str] = None) -> str:
+        '''
+        Спрашивает тип сообщения в общем пакете; ответ кладётся в кэш под тем же ключом,
+        что и у одиночного запроса.
+        '''
+        ans = await self._type_batcher.submit((text, client_id))
+        if ans is None:
+            # Модель пропустила пункт списка — спрашиваем отдельно
+            return await self._get_type_single(text, 1, cache_key, client_id)
+        self._cache_type(cache_key, ans)
+        return ans
+
+    def _cache_type(self, cache_key: Optional[str], ans: str):
+        # Непонятный ответ не кэшируем, чтобы повтор снова спросил модель
+        if cache_key is not None and self._type_from_answer(ans) != RequestType.ELSE:
+            self.cache.set(cache_key, {"choices": [{"message": {"role": "assistant", "content": ans}}]})
+
+    async def classify_batch(self, texts: List[str],
+                             client_ids: Optional[List[str]] = None) -> List[Optional[str]]:
+        '''
+        Определяет тип нескольких сообщений одним запросом: сообщения передаются нумерованным списком,
+        модель отвечает по строке на каждое.
+
+        :param texts: Сообщения пользователей
+        :param client_ids: Авторы сообщений; расход токенов пакета делится между ними
+        
+        :return: ответы модели ("event", "task", "else") в порядке texts; None, если ответа на пункт нет
+        '''
+        if len(texts) == 1:
+            return [await self._get_type_single(texts[0], 1, None, client_ids)]
+
+        message = "\n".join(f'{i}. "{" ".join(text.split())}"' for i, text in enumerate(texts, 1))
+
+        ans = (await self.request(message, 8 * len(texts) + 10, priority=PRIORITY_HIGH,
+                                  system=TYPE_BATCH_SYSTEM, kind="type_batch", client_id=client_ids))['choices'][0]['message']['content']
+        answers: List[Optional[str]] = [None] * len(texts)
+        for line in ans.splitlines():
+            number = re.match(r"\s*(\d+)", line)
+            kinds = TYPE_WORDS_RE.findall(line.lower())
+            if number and kinds and 1 <= int(number.group(1)) <= len(texts):
+                answers[int(number.group(1)) - 1] = kinds[-1]
+        return answers
 
     async def get_event_content(self, content: Query) -> str:
         '''
@@ -163,31 +574,11 @@ class GPT:
         :return: название события
         '''
         
-        await self.check_token()
-
-        message = f'''Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией календаря. 
-        Пользователь отправил сообщение "{content.content}". Пользователь хочет поставить это событие в календарь.Твоя задача — определить название события максимально понятно, сохранить важную информацию и эмоции.
-
-        Примеры:
-        1. "Встреча с Олегом завтра в 19:00" -> "Встреча с Олегом"
-        2. "Праздник у бабушки в субботу" -> "Праздник у бабушки"
-        3. "Репетиция рэпа" -> "Репетиция рэпа"
-        4. "Контрольная по матанализу в пятницу" -> "Контрольная по матанализу"
-        5. "День рождения Анечки завтра в 18:00" -> "День рождения Анечки"
-        6. "Собрание в школе в пятницу" -> "Собрание в школе"
-        7. "Свадьба у Лехи через неделю" -> "Свадьба у Лехи"
-        8. "Поездка на природу с друзьями" -> "Поездка на природу"
-        9. "Презентация проекта в на покре" -> "Презентация проекта"
-        10. "Курсы по программированию" -> "Курсы по программированию"
-        11. "Экзамен в университете" -> "Экзамен"
-        12. "кошачья посиделка в ресторане" -> "Кошачья посиделка"
-        13. "тренировка по алгоритмам" -> "Тренировка по алгоритмам"
-        14. "Свидание с девушкой из тиндера в кафе" -> "Свидание с девушкой из тиндера"
-        15. "тусовка на крыше" -> "Тусовка на крыше"
-
-        Напиши только название события, без времени и других деталей!'''
-
-        return (await self.request(message, 10))['choices'][0]['message']['content']
+        message = self._user_message(content.content)
+
+        return (await self.request(message, 10, cache_key=self.cache.make_key("event_title", content.content),
+                                   system=EVENT_TITLE_SYSTEM, kind="event_title",
+                                   client_id=content.client_id))['choices'][0]['message']['content']
 
     async def get_task_content(self, content: Query) -> str:
         '''
@@ -198,31 +589,11 @@ class GPT:
         :return: название задачи
         '''
         
-        self.check_token()
-
-        message = f'''Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией todo-листа. 
-        Пользователь отправил сообщение "{content.content}". Пользователь хочет поставить эту таску в todolist. Твоя задача — определить и выписать формулировку задачи максимально просто и понятно, но сохранить эмоциональную окраску, если она есть.
-
-        Примеры:
-        1. "Нужно купить продукты" -> "Купить продукты"
-        2. "Обнять Костю" -> "Обнять Костю"
-        3. "Позвонить маме" -> "Позвонить маме"
-        4. "Надо сделать домашнее задание" -> "Сделать домашнее задание"
-        5. "Покормить котят" -> "Покормить котят"
-        6. "Как-нибудь помочь бабушке по хозяйству" -> "Помочь бабушке по хозяйству"
-        7. "Убраться где-то на кухне" -> "Убраться на кухне"
-        8. "Погладить бельё" -> "Погладить бельё"
-        9. "Пока есть время прочитать книгу" -> "Прочитать книгу"
-        10. "Написать Насте про шляпу" -> "Написать Насте про шляпу"
-        11. "Поцеловать парня" -> "Поцеловать парня"
-        12. "Сходить в спортзал" -> "Сходить в спортзал"
-        13. "Собрать чемодан для поездки" -> "Собрать чемодан"
-        14. "Покормить бездомных собак" -> "Покормить бездомных собак"
-        15. "побегать вокруг кровати" -> "побегать вокруг кровати"
-
-        Напиши только текст задачи, без времени или других деталей!'''
-
-        return (await self.request(message, 15))['choices'][0]['message']['content']
+        message = self._user_message(content.content)
+
+        return (await self.request(message, 15, cache_key=self.cache.make_key("task_title", content.content),
+                                   system=TASK_TITLE_SYSTEM, kind="task_title",
+                                   client_id=content.client_id))['choices'][0]['message']['content']
 
     async def check_date(self, date: str) -> bool:
         '''
@@ -299,28 +670,21 @@ class GPT:
     async def get_time_from(self, content: Query) -> Dict[str, str]:
         '''
         Получает дату(и время) начала события из сообщения пользователя. 
+        Сначала пробует локальный разбор (Date_parser), LLM — только если он не справился.
         
         :param content: Запрос пользователя
         
         :return: дату(и время)
         '''
         
-        await self.check_token()
-
-        message = f'''Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией календаря. Ты умеешь писать только даты и часы. Не используй слова!!!! У тебя лимит в 5-6 слов.
-        Преобразуй запрос "{content.content}" в формат даты и времени начала события: "[<дата>; <время>]". Учитывай, что текущее время: {content.current_time.strftime("%Y-%m-%d %H:%M:%S")}.
-
-        Примеры: (пример если сегодня 2024-12-21)
-        1. "Поставь на сегодня встречу в 19:00" -> [2024-12-21; 19:00:00]
-        2. "Встреча завтра в 16:00" -> [2024-12-22; 16:00:00]
-        3. "На послезавтра тренировка в 10 утра" -> [2024-12-23; 10:00:00]
-        4. "Митап в пятницу в 15:30" -> [2024-12-27; 15:30:00]
-        5. "На следующей неделе собрание в 14:00" -> [2024-12-28; 14:00:00]
-        6. "Покормить вечером бездомных собак в девять" -> [2024-12-21; 21:00:00]
-        7. "Покормить котят в час дня" -> [2024-12-21; 13:00:00]
-        8. "Экзамен по алгебре послезавтра в три часа дня" -> [2024-12-23; 15:00:00 ]'''
-
-        raw = (await self.request(message, 25))['choices'][0]['message']['content']
+        local = parse_time(content.content, content.current_time)
+        if local is not None:
+            return local.timefrom
+
+        message = self._user_message(content.content, content.current_time)
+
+        raw = (await self.request(message, 25, cache_key=self._dated_key("time_from", content), stop=bracket_closed,
+            system=TIME_FROM_SYSTEM, kind="time_from", client_id=content.client_id))['choices'][0]['message']['content']
         time = await self.normalize_time(raw)
         if "date" in time and "завтра" in time["date"].lower():
             time["date"] = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
@@ -337,42 +701,21 @@ class GPT:
     async def get_time_to(self, content: Query) -> Dict[str, str]:
         '''
         Получает дату(и время) конца события/дедлайн из сообщения пользователя. 
+        Сначала пробует локальный разбор (Date_parser), LLM — только если он не справился.
         
         :param content: Запрос пользователя
         
         :return: дату(и время)
         '''
         
-        await self.check_token()
-
-        message = f'''f"У тебя лимит в 5 слов!
-                        Ты умеешь писать только даты и часы
-                        Не используй слова!
-                        Преобразуй запрос '{content.content}' в формат '[<дата конца события>; <время конца события>]'. Учитывай, что текущее время - это {content.current_time.strftime("%Y-%m-%d %H:%M:%S")}.
-                        Примеры:
-                        "Поставь на сегодня встречу в 19:00, текущее время 2024-12-2 12:00:00" 
-                        ответ: [2024-12-02; 20:00:00]
-                        Поставь на завтра встречу в 16:00, текущее время 2024-12-02 12:00:00" 
-                        ответ: [2024-12-03; 17:00:00]
-                        Поставь на сегодня встречу в 19:00 на 15 минут, текущее время 2024-12-2 12:00:00" 
-                        ответ: [2024-12-02; 19:15:00]
-                        Поставь на завтра встречу в 16:00 на полчаса, текущее время 2024-12-02 12:00:00" 
-                        ответ: [2024-12-03; 16:30:00]'''
-
-        message = f'''Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией календаря. У тебя лимит в 5 слов! Ты умеешь писать только даты и часы. Не используй слова!!!!
-        Преобразуй запрос "{content.content}" в формат даты и времени окончания события: "[<дата конца события>; <время конца события>]". Учитывай, что текущее время: {content.current_time.strftime("%Y-%m-%d %H:%M:%S")}.
-
-        Примеры: (пример если сегодня 2024-12-21)
-        1. "Поставь на сегодня встречу в 19:00" -> [2024-12-21; 20:00:00]
-        2. "Встреча завтра в 16:00 на час" -> [2024-12-22; 17:00:00]
-        3. "На послезавтра тренировка в 10 утра, длится 2 часа" -> [2024-12-23; 12:00:00]
-        4. "Митап в пятницу в 15:30 на полчаса" -> [2024-12-27; 16:00:00]
-        5. "На следующей неделе собрание в 14:00 до 15:30" -> [2024-12-28; 15:30:00]
-        6. "Покормить котят в час дня" -> [2024-12-21; 14:00:00]
-        7. "Экзамен по алгебре послезавтра в три часа дня" -> [2024-12-21; 18:00:00]
-'''
-
-        raw = (await self.request(message, 25))['choices'][0]['message']['content']
+        local = parse_time(content.content, content.current_time)
+        if local is not None:
+            return local.dateto
+
+        message = self._user_message(content.content, content.current_time)
+
+        raw = (await self.request(message, 25, cache_key=self._dated_key("time_to", content), stop=bracket_closed,
+            system=TIME_TO_SYSTEM, kind="time_to", client_id=content.client_id))['choices'][0]['message']['content']
         time = await self.normalize_time(raw)
         if "date" in time and "завтра" in time["date"].lower():
             time["date"] = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
@@ -395,14 +738,11 @@ class GPT:
         :return: описание
         '''
         
-        await self.check_token()
-
-        message = f'''Ты обрабатываешь сообщения от пользователя чат-бота с интеграцией календаря.
-                        Пользователь отправил сообщение "{content.content}". Пользователь хочет поставить это
-                        событие в календарь. Тебе нужно определить и выписать описание этого события максимально полноценно.
-                        Напиши только описание события!'''
+        message = self._user_message(content.content)
 
-        return (await self.request(message, 10))['choices'][0]['message']['content']
+        return (await self.request(message, 10, cache_key=self.cache.make_key("description", content.content),
+                                   priority=PRIORITY_LOW, system=DESCRIPTION_SYSTEM, kind="description",
+                                   client_id=content.client_id))['choices'][0]['message']['content']
 
     async def better_times(self, parsed: Request):
         '''
@@ -414,43 +754,169 @@ class GPT:
             parsed.dateto = parsed.timefrom
         return parsed
     
-    async def parse_message(self, content: Query) -> Optional[Request]:
+    async def extract(self, content: Query, request_type: Optional[RequestType] = None) -> Optional[Request]:
+        '''
+        Извлекает тип, название, описание и даты одним запросом к LLM в виде JSON.
+
+        :param content: Запрос пользователя
+        :param request_type: Тип, заданный пользователем явно (/t, /e); ответ модели о типе тогда игнорируется
+
+        :return: Request или None, если тип запроса не определён
+        :raises ExtractionError: если ответ модели не соответствует схеме
+        '''
+
+        message = self._user_message(content.content, content.current_time)
+        params = {}
+        forced = None
+        if request_type is not None:
+            message += f' Это {"событие" if request_type == RequestType.EVENT else "задача"}.'
+            params["type"] = request_type.value
+            forced = "event" if request_type == RequestType.EVENT else "task"
+
+        raw = (await self.request(message, 150, cache_key=self._dated_key("extract", content, **params),
+                                  system=EXTRACT_SYSTEM, kind="extract", client_id=content.client_id,
+                                  cacheable=lambda answer: extraction_cacheable(answer, forced))
+               )['choices'][0]['message']['content']
+        data = parse_extraction(raw, forced)
+        parsed = to_request(data, content.client_id)
+
+        # Даты, однозначно разобранные локально, надёжнее ответа модели
+        local = parse_time(content.content, content.current_time)
+        if parsed is not None and local is not None:
+            parsed.timefrom = local.timefrom
+            if parsed.type == RequestType.EVENT:
+                parsed.dateto = local.dateto
+        return parsed
+
+    async def parse_message(self, content: Query, deadline: Optional[Deadline] = None,
+                            request_type: Optional[RequestType] = None) -> Optional[Request]:
+        '''
+        Парсит сообщение пользователя.
+
+        В режиме "json" делает один запрос extract; если модель вернула некорректный JSON,
+        переходит на поочерёдные запросы по полям (parse_message_by_fields).
+        Время этапов пишется в лог и накапливается в self.timing_stats.
+        Повторы сообщения отсекает очередь задач бота (JobQueue), а не этот метод: сообщения одного чата
+        разбираются по очереди, поэтому одинаковые разборы одновременно не выполняются.
+
+        :param content: Запрос пользователя
+        :param deadline: Бюджет времени; когда он истекает, все запросы к LLM отменяются
+        :param request_type: Тип, заданный пользователем явно (/t, /e, префиксы). Тогда тип не определяется
+                             ни LLM, ни классификатором
+        :raises DeadlineExceeded: если бюджет истёк
+        :raises RateLimitExceeded: если GigaChat перегружен и запрос не дождался своей очереди
+        '''
+        return await within(deadline, self._parse_message(content, request_type))
+
+    def parse_locally(self, content: Query, request_type: Optional[RequestType] = None) -> Optional[Request]:
         '''
-        Парсит сообщение пользователя
+        Разбирает сообщение без LLM: тип — локальным классификатором (если не задан явно), даты — Date_parser,
+        название — сам текст сообщения. Используется, когда LLM не успела ответить.
+
+        :return: Request или None, если надёжно разобрать не удалось
         '''
+        if request_type is None:
+            request_type, confidence = self.classifier.predict(content.content)
+            if confidence < 0.6:
+                return None
+        local = parse_time(content.content, content.current_time)
+        if request_type == RequestType.EVENT:
+            if local is None:
+                return None
+            return Request(request_type, content.client_id, content.content, local.timefrom, local.dateto, None)
+        return Request(request_type, content.client_id, content.content, local.timefrom if local else {}, {}, None)
+
+    async def _parse_message(self, content: Query, request_type: Optional[RequestType] = None) -> Optional[Request]:
+        timings = StageTimings()
         try:
-            parsed = Request(RequestType.ELSE, "", "", {}, None, None)
-            parsed.type = await self.get_type(content)
+            if self._extraction_mode == "json":
+                try:
+                    return await timings.measure("extract", self.extract(content, request_type))
+                except (ExtractionError, KeyError, IndexError, TypeError) as e:
+                    logging.warning("Некорректный ответ extract, переходим на запросы по полям: %s", e)
+                except RateLimitExceeded:
+                    raise
+                except Exception as e:
+                    logging.exception("Ошибка в parse_message: %s", e)
+                    return None
+            return await self.parse_message_by_fields(content, timings, request_type)
+        finally:
+            self.timing_stats.add(timings)
+            logging.info("parse_message: %s", timings)
+
+    async def get_type_with_retries(self, content: Query) -> RequestType:
+        '''
+        Получает тип запроса; если он не определён, повторяет запрос с большей температурой.
+        '''
+        request_type = await self.get_type(content)
+        for temp in (10, 100):
+            if request_type != RequestType.ELSE:
+                break
+            request_type = await self.get_type(content, temp=temp)
+        return request_type
+
+    async def parse_message_by_fields(self, content: Query, timings: Optional[StageTimings] = None,
+                                      request_type: Optional[RequestType] = None) -> Optional[Request]:
+        '''
+        Парсит сообщение пользователя отдельными запросами: тип, название, описание, даты.
+        Если тип задан явно (request_type), он не определяется, а запросы по полям его ветки уходят сразу.
 
+        В спекулятивном режиме (speculative=True) все запросы по полям отправляются одновременно
+        с определением типа; запросы для проигравшей ветки (событие или задача) отменяются.
+        '''
+        timings = timings or StageTimings()
+        stages = {
+            "event_title": self.get_event_content,
+            "description": self.get_description,
+            "time_from": self.get_time_from,
+            "time_to": self.get_time_to,
+            "task_title": self.get_task_content,
+        }
+        branches = {
+            RequestType.EVENT: ("event_title", "description", "time_from", "time_to"),
+            RequestType.GOAL: ("task_title", "time_from"),
+        }
+        started = {}
+
+        def start(stage: str) -> asyncio.Future:
+            if stage not in started:
+                started[stage] = asyncio.ensure_future(timings.measure(stage, stages[stage](content)))
+            return started[stage]
+
+        try:
+            if request_type is None:
+                type_task = asyncio.ensure_future(timings.measure("type", self.get_type_with_retries(content)))
+                # Даём get_type шанс ответить локально, тогда спекулировать незачем
+                await asyncio.sleep(0)
+                if self._speculative and not type_task.done():
+                    for stage in stages:
+                        start(stage)
+                request_type = await type_task
+
+            parsed = Request(request_type, content.client_id, "", {}, None, None)
             if parsed.type == RequestType.ELSE:
-                parsed.type = await self.get_type(content, temp=10)
-                if parsed.type == RequestType.ELSE:
-                    parsed.type = await self.get_type(content, temp=100)
-                    if parsed.type == RequestType.ELSE:
-                        return None
-            elif parsed.type == RequestType.EVENT:
-                
+                return None
+
+            # Ответы для другой ветки больше не нужны
+            for stage in set(started) - set(branches[parsed.type]):
+                started.pop(stage).cancel()
+
+            if parsed.type == RequestType.EVENT:
                 parsed.body, parsed.extra, parsed.timefrom, parsed.dateto = await asyncio.gather(
-                                                                                self.get_event_content(content),
-                                                                                self.get_description(content),
-                                                                                self.get_time_from(content),
-                                                                                self.get_time_to(content))
-                # Для EVENT мы идём дальше, получаем timefrom/timeTo
+                    *(start(stage) for stage in branches[RequestType.EVENT]))
                 parsed = await self.better_times(parsed)
             else:
-                # Если it's a task => body = get_task_content
-                parsed.body, parsed.timefrom = await asyncio.gather(self.get_task_content(content), self.get_time_from(content))
-                # КЛЮЧЕВОЕ: НЕ вызываем get_time_from / get_time_to => нет даты => FIX
-                # parsed.timefrom = {}
-                # parsed.dateto = {}
-                # Если хотите всё же попытаться вынуть дату => можно оставить,
-                # но тогда, если GPT всё же вернёт мусор => InvalidDate.
-                # Так что лучше вообще не заполнять для задач.
+                # Для задач дата окончания не нужна
+                parsed.body, parsed.timefrom = await asyncio.gather(
+                    *(start(stage) for stage in branches[RequestType.GOAL]))
                 parsed.dateto = {}
 
-            parsed.client_id = content.client_id
-
             return parsed
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logging.exception("Ошибка в parse_message: %s", e)
             return None
+        finally:
+            for task in started.values():
+                task.cancel()
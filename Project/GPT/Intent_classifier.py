@@ -0,0 +1,244 @@
+import json
+import math
+import random
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from Request import RequestType
+
+'''
+Те же примеры, что и в промпте get_type, — основа обучения локального классификатора.
+'''
+TYPE_EXAMPLES = [
+    ("Сделать домашнее задание", RequestType.GOAL),
+    ("Обнять Костю", RequestType.GOAL),
+    ("Встреча с Олегом завтра в 19:00", RequestType.EVENT),
+    ("Купить продукты", RequestType.GOAL),
+    ("Посмотреть фильм с друзьями", RequestType.GOAL),
+    ("Позвонить маме в воскресенье", RequestType.GOAL),
+    ("Покормить бездомных собак", RequestType.GOAL),
+    ("Репетиция хора в 18:00", RequestType.EVENT),
+    ("Собрание в школе в пятницу", RequestType.EVENT),
+    ("Приготовить ужин для семьи", RequestType.GOAL),
+    ("Сходить на каток с друзьями", RequestType.GOAL),
+    ("День рождения Анны завтра в 18:00", RequestType.EVENT),
+    ("Подготовка к контрольной в среду", RequestType.GOAL),
+    ("Встреча с заказчиком через неделю", RequestType.EVENT),
+    ("Уборка квартиры", RequestType.GOAL),
+]
+
+'''
+Дополнительные примеры для классификатора, взятые из промптов названий событий и задач.
+'''
+EXTRA_EXAMPLES = [
+    ("Праздник у бабушки в субботу", RequestType.EVENT),
+    ("Контрольная по матанализу в пятницу", RequestType.EVENT),
+    ("Свадьба у Лехи через неделю", RequestType.EVENT),
+    ("Поездка на природу с друзьями", RequestType.EVENT),
+    ("Презентация проекта", RequestType.EVENT),
+    ("Курсы по программированию", RequestType.EVENT),
+    ("Экзамен в университете", RequestType.EVENT),
+    ("Тренировка по алгоритмам", RequestType.EVENT),
+    ("Свидание в кафе", RequestType.EVENT),
+    ("Тусовка на крыше", RequestType.EVENT),
+    ("Митап в пятницу в 15:30", RequestType.EVENT),
+    ("Нужно купить продукты", RequestType.GOAL),
+    ("Надо сделать домашнее задание", RequestType.GOAL),
+    ("Помочь бабушке по хозяйству", RequestType.GOAL),
+    ("Убраться на кухне", RequestType.GOAL),
+    ("Погладить бельё", RequestType.GOAL),
+    ("Прочитать книгу", RequestType.GOAL),
+    ("Написать Насте про шляпу", RequestType.GOAL),
+    ("Сходить в спортзал", RequestType.GOAL),
+    ("Собрать чемодан для поездки", RequestType.GOAL),
+]
+
+EVENT_STEMS = (
+    "встреч", "собрани", "совещани", "созвон", "концерт", "экзамен", "контрольн", "праздник",
+    "день рождени", "свадьб", "репетици", "митап", "поездк", "конференц", "лекци", "семинар",
+    "вебинар", "свидани", "вечеринк", "тусовк", "спектакл", "презентаци", "матч", "корпоратив",
+    "собеседовани", "прием у", "приём у", "запись к", "рейс", "поезд", "самолет", "самолёт",
+)
+TASK_STEMS = ("нужно", "надо", "не забыть", "напомни", "сделать", "купить", "оплатить", "заплатить")
+# Основы ищутся только с начала слова: "лекци" не должна находиться в "коллекцию", "рейс" — в "прейскурант"
+EVENT_RE = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, EVENT_STEMS)) + ")")
+TASK_RE = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, TASK_STEMS)) + ")")
+# Инфинитивы в начале фразы ("купить", "позвонить", "убраться") — почти всегда задача
+INFINITIVE_RE = re.compile(r"^(?:нужно |надо |не забыть )?[а-я]+(?:ть|ти|чь)(?:ся|сь)?\b")
+
+'''
+Наивный Байес на нескольких десятках примеров сильно переуверен, поэтому без подтверждения правилом
+его отклонение от 0.5 сжимается: NGRAM_ONLY_WEIGHT — если ни одно правило не сработало
+(уверенность не выше 0.9), CONFLICT_WEIGHT — если правила указывают на разные типы
+("Сделать презентацию к встрече"; не выше 0.75, то есть ниже порога по умолчанию).
+'''
+NGRAM_ONLY_WEIGHT = 0.8
+CONFLICT_WEIGHT = 0.5
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+class IntentClassifier:
+    '''
+    Локальный классификатор типа запроса перед GPT.get_type:
+    - правила по ключевым основам слов ("встреч", "экзамен", "купить", инфинитив в начале);
+    - наивный байесовский классификатор по символьным n-граммам, обученный на примерах из промпта
+      и на истории ответов LLM.
+
+    Если уверенность ниже threshold, вызывающий код спрашивает LLM и передаёт ответ в record_llm.
+    '''
+
+    LABELS = (RequestType.EVENT, RequestType.GOAL)
+
+    def __init__(self, threshold: float = 0.85, history_path: Optional[str] = None,
+                 audit_rate: float = 0.05, ngrams: Tuple[int, ...] = (3, 4)):
+        '''
+        :param threshold: Минимальная уверенность, при которой ответ даётся без LLM
+        :param history_path: JSONL-файл с историей {"text": ..., "type": "event"|"goal"};
+                             загружается при создании и дописывается ответами LLM
+        :param audit_rate: Доля уверенных ответов, которые всё равно перепроверяются LLM для оценки точности
+        :param ngrams: Длины символьных n-грамм
+        '''
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._history_path = Path(history_path) if history_path else None
+        self._ngrams = ngrams
+        self._counts: Dict[RequestType, Counter] = {label: Counter() for label in self.LABELS}
+        self._totals: Dict[RequestType, int] = {label: 0 for label in self.LABELS}
+        self._docs: Dict[RequestType, int] = {label: 0 for label in self.LABELS}
+        self._vocabulary = set()
+        self.counters = Counter()
+
+        self.fit(TYPE_EXAMPLES + EXTRA_EXAMPLES)
+        if self._history_path is not None and self._history_path.exists():
+            self.fit(self._load_history())
+
+    def fit(self, examples: Iterable[Tuple[str, RequestType]]):
+        '''
+        Дообучает n-граммную модель на парах (текст, тип).
+        '''
+        for text, label in examples:
+            if label not in self._counts:
+                continue
+            features = self._features(text)
+            self._counts[label].update(features)
+            self._totals[label] += len(features)
+            self._docs[label] += 1
+            self._vocabulary.update(features)
+
+    def predict(self, text: str) -> Tuple[RequestType, float]:
+        '''
+        Возвращает наиболее вероятный тип и уверенность от 0.5 до 1.
+        '''
+        p_event = self._ngram_probability(text)
+        event, task = self._matches(text)
+        if event != task:
+            # Правило и модель согласны — высокая уверенность, иначе модель снижает её
+            p_rule = 0.95 if event else 0.05
+            p_event = (2 * p_rule + p_event) / 3
+        else:
+            p_event = 0.5 + (p_event - 0.5) * (CONFLICT_WEIGHT if event else NGRAM_ONLY_WEIGHT)
+        if p_event >= 0.5:
+            return RequestType.EVENT, p_event
+        return RequestType.GOAL, 1 - p_event
+
+    def classify(self, text: str) -> Optional[RequestType]:
+        '''
+        Возвращает тип, если классификатор достаточно уверен, иначе None (нужно спросить LLM).
+        Обновляет счётчики попаданий.
+        '''
+        label, confidence = self.predict(text)
+        if confidence < self.threshold:
+            self.counters["below_threshold"] += 1
+            return None
+        if self.audit_rate and random.random() < self.audit_rate:
+            self.counters["audited"] += 1
+            return None
+        self.counters["local_hits"] += 1
+        return label
+
+    def record_llm(self, text: str, llm_label: RequestType):
+        '''
+        Учитывает ответ LLM: сравнивает с локальным предсказанием и дообучает модель.
+        '''
+        self.counters["llm_calls"] += 1
+        if llm_label not in self.LABELS:
+            self.counters["llm_else"] += 1
+            return
+
+        label, _ = self.predict(text)
+        self.counters["agree" if label == llm_label else "disagree"] += 1
+        self.fit([(text, llm_label)])
+        if self._history_path is not None:
+            with self._history_path.open("a", encoding="utf-8") as history:
+                history.write(json.dumps({"text": text, "type": llm_label.value}, ensure_ascii=False) + "\n")
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Счётчики для подбора порога:
+        - hit_rate: доля запросов, на которые ответили без LLM;
+        - accuracy: доля совпадений локального предсказания с ответом LLM там, где LLM спрашивали.
+        '''
+        hits, llm = self.counters["local_hits"], self.counters["llm_calls"]
+        agree, disagree = self.counters["agree"], self.counters["disagree"]
+        result = {key: self.counters[key] for key in
+                  ("local_hits", "below_threshold", "audited", "llm_calls", "llm_else", "agree", "disagree")}
+        result["hit_rate"] = hits / (hits + llm) if hits + llm else 0.0
+        result["accuracy"] = agree / (agree + disagree) if agree + disagree else 0.0
+        return result
+
+    def _load_history(self):
+        with self._history_path.open(encoding="utf-8") as history:
+            for line in history:
+                try:
+                    record = json.loads(line)
+                    yield record["text"], RequestType(record["type"])
+                except (ValueError, KeyError):
+                    continue
+
+    def _features(self, text: str):
+        features = []
+        for word in _normalize(text).split():
+            word = f"<{word}>"
+            for n in self._ngrams:
+                features.extend(word[i:i + n] for i in range(len(word) - n + 1))
+        return features
+
+    def _ngram_probability(self, text: str) -> float:
+        '''
+        Апостериорная вероятность события по наивному Байесу со сглаживанием Лапласа.
+        '''
+        vocabulary = len(self._vocabulary) + 1
+        documents = sum(self._docs.values())
+        scores = {}
+        for label in self.LABELS:
+            score = math.log((self._docs[label] + 1) / (documents + 2))
+            denominator = self._totals[label] + vocabulary
+            for feature in self._features(text):
+                score += math.log((self._counts[label][feature] + 1) / denominator)
+            scores[label] = score
+        diff = scores[RequestType.GOAL] - scores[RequestType.EVENT]
+        # Ограничиваем разницу, чтобы exp не переполнялся на длинных сообщениях
+        return 1 / (1 + math.exp(max(min(diff, 50), -50)))
+
+    @staticmethod
+    def _matches(text: str) -> Tuple[bool, bool]:
+        '''
+        Сработали ли правила события и правила задачи.
+        '''
+        text = _normalize(text)
+        event = bool(EVENT_RE.search(text))
+        task = bool(TASK_RE.search(text)) or bool(INFINITIVE_RE.match(text))
+        return event, task
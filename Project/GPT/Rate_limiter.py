@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+'''
+Приоритеты запросов к GigaChat: чем меньше число, тем раньше запрос выходит из очереди.
+'''
+PRIORITY_HIGH = 0      # определение типа — пользователь ждёт ответа
+PRIORITY_NORMAL = 1    # названия и даты
+PRIORITY_LOW = 2       # описания и прочая фоновая работа
+
+
+class RateLimitExceeded(Exception):
+    '''
+    Очередь лимитера переполнена или GigaChat продолжает отвечать 429.
+    '''
+
+
+class RateLimiter:
+    '''
+    Общий лимитер запросов к GigaChat:
+    - не больше max_concurrency запросов одновременно;
+    - token bucket на запросы в секунду (rps) и на токены в минуту (tpm);
+    - ожидающие запросы стоят в очереди по приоритету, очередь ограничена max_queue.
+
+    Ответ 429 передаётся в backoff: лимитер приостанавливает выдачу и вдвое снижает rps,
+    после успешных запросов rps постепенно возвращается к исходному (AIMD).
+    '''
+
+    def __init__(self, rps: float = 10, tpm: Optional[float] = None, max_concurrency: int = 20,
+                 max_queue: int = 500, min_rps: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        '''
+        :param rps: Запросов в секунду
+        :param tpm: Токенов в минуту. None — без ограничения
+        :param max_concurrency: Максимальное число запросов, ожидающих ответа
+        :param max_queue: Максимальная длина очереди ожидания
+        :param min_rps: Ниже этого значения rps после 429 не снижается
+        :param clock: Источник текущего времени в секундах
+        '''
+        self._base_rps = rps
+        self.rps = rps
+        self._min_rps = min_rps
+        self._tpm = tpm
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._clock = clock
+
+        self._requests = float(rps)
+        self._tokens = float(tpm) if tpm else 0.0
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._in_flight = 0
+
+        self._queue = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.counters = Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        '''
+        Занимает место под один запрос на время блока async with.
+
+        :param tokens: Оценка числа токенов запроса
+        :param priority: Приоритет в очереди
+        :raises RateLimitExceeded: если очередь переполнена
+        '''
+        await self.acquire(tokens, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        '''
+        Ждёт своей очереди. После запроса нужно вызвать release.
+        '''
+        if len(self._queue) >= self._max_queue:
+            self.counters["rejected"] += 1
+            raise RateLimitExceeded("Очередь запросов к GigaChat переполнена")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), tokens, future))
+        self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], len(self._queue))
+        started = self._clock()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Место выдано, но ожидающего уже отменили — возвращаем его
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        waited = self._clock() - started
+        self.counters["acquired"] += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def correct(self, estimated: int, actual: int):
+        '''
+        Списывает из бакета токенов разницу между оценкой и фактическим расходом из usage.
+        '''
+        if self._tpm:
+            self._tokens -= actual - estimated
+
+    def success(self):
+        '''
+        Успешный ответ: rps понемногу возвращается к исходному значению.
+        '''
+        self.rps = min(self._base_rps, self.rps + self._base_rps * 0.05)
+
+    def backoff(self, retry_after: Optional[float] = None):
+        '''
+        Ответ 429: приостанавливает выдачу на retry_after секунд (по умолчанию 1 с) и вдвое снижает rps.
+        '''
+        self.counters["throttled"] += 1
+        self.rps = max(self._min_rps, self.rps / 2)
+        self._requests = min(self._requests, 0.0)
+        self._paused_until = max(self._paused_until, self._clock() + (1.0 if retry_after is None else retry_after))
+        self._dispatch()
+
+    def stats(self) -> Dict[str, float]:
+        '''
+        Глубина очереди, время ожидания, текущий rps и счётчики отказов и 429.
+        '''
+        acquired = self.counters["acquired"]
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.counters["max_queue_depth"],
+            "in_flight": self._in_flight,
+            "acquired": acquired,
+            "rejected": self.counters["rejected"],
+            "throttled": self.counters["throttled"],
+            "avg_wait": self._wait_total / acquired if acquired else 0.0,
+            "max_wait": self._wait_max,
+            "rps": self.rps,
+        }
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, _, _, future in self._queue:
+            future.cancel()
+        self._queue = []
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(max(self.rps, 1.0), self._requests + elapsed * self.rps)
+        if self._tpm:
+            self._tokens = min(self._tpm, self._tokens + elapsed * self._tpm / 60)
+
+    def _dispatch(self):
+        '''
+        Выпускает запросы из головы очереди, пока позволяют лимиты.
+        Голова очереди не обгоняется: если ей не хватает токенов, ждут и остальные.
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = self._clock()
+        self._refill(now)
+
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.done():
+                # Ожидающий отменён (например, по дедлайну)
+                heapq.heappop(self._queue)
+                continue
+            if self._in_flight >= self._max_concurrency:
+                return
+
+            delay = self._paused_until - now
+            if delay <= 0 and self._requests < 1:
+                delay = (1 - self._requests) / self.rps
+            needed = min(tokens, self._tpm) if self._tpm else 0
+            if delay <= 0 and self._tokens < needed:
+                delay = (needed - self._tokens) * 60 / self._tpm
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            self._requests -= 1
+            self._tokens -= needed
+            self._in_flight += 1
+            future.set_result(None)
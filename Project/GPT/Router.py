@@ -0,0 +1,200 @@
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+
+class CircuitBreaker:
+    '''
+    Предохранитель для одной модели:
+    - CLOSED: запросы идут, ошибки считаются в скользящем окне;
+    - OPEN: доля ошибок превысила порог — модель не используется open_seconds секунд;
+    - HALF_OPEN: пропускается один пробный запрос; успех закрывает предохранитель, ошибка снова открывает.
+      Пробный запрос, который отменили (release) или который не ответил за probe_timeout секунд,
+      освобождает место для следующего.
+    '''
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate: float = 0.5, min_requests: int = 4, window: int = 20,
+                 open_seconds: float = 30, probe_timeout: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        '''
+        :param failure_rate: Доля ошибок в окне, при которой предохранитель открывается
+        :param min_requests: Минимум запросов в окне, чтобы судить о доле ошибок
+        :param window: Размер скользящего окна последних запросов
+        :param open_seconds: Сколько секунд модель не используется после открытия
+        :param probe_timeout: Через сколько секунд пробный запрос без результата считается потерянным
+        :param clock: Источник текущего времени в секундах
+        '''
+        self._failure_rate = failure_rate
+        self._min_requests = min_requests
+        self._open_seconds = open_seconds
+        self._probe_timeout = probe_timeout
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.state = self.CLOSED
+
+    def allow(self) -> bool:
+        '''
+        Можно ли сейчас отправить запрос. В HALF_OPEN разрешает только один пробный запрос.
+        '''
+        if self.state == self.OPEN and self._clock() - self._opened_at >= self._open_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_busy():
+            self._probe_in_flight = True
+            self._probe_started = self._clock()
+            return True
+        return False
+
+    def available(self) -> bool:
+        '''
+        То же, что allow, но без резервирования пробного запроса.
+        '''
+        if self.state == self.OPEN:
+            return self._clock() - self._opened_at >= self._open_seconds
+        return self.state == self.CLOSED or not self._probe_busy()
+
+    def release(self):
+        '''
+        Запрос завершился без результата (отменён или не дошёл до модели): пробный запрос
+        освобождается, ничего не записывая в окно ошибок.
+        '''
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def _probe_busy(self) -> bool:
+        return self._probe_in_flight and self._clock() - self._probe_started < self._probe_timeout
+
+    def record(self, ok: bool):
+        '''
+        Учитывает результат запроса.
+        '''
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if ok:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self._min_requests and failures / len(self._outcomes) >= self._failure_rate:
+            self._open()
+
+    @property
+    def error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+
+class ModelRouter:
+    '''
+    Выбирает модель GigaChat для каждого запроса.
+
+    Для каждой модели ведётся экспоненциально сглаженная задержка и свой CircuitBreaker.
+    Политики выбора среди доступных моделей:
+    - "quality": первая по списку модель, чья задержка укладывается в latency_budget;
+    - "latency": модель с наименьшей задержкой;
+    - "cost": самая дешёвая модель.
+    '''
+
+    DEFAULT_MODELS = (("GigaChat-Max", 3.0), ("GigaChat-Pro", 2.0), ("GigaChat", 1.0))
+
+    def __init__(self, models: Sequence[Tuple[str, float]] = DEFAULT_MODELS, policy: str = "quality",
+                 latency_budget: float = 5.0, smoothing: float = 0.2,
+                 clock: Callable[[], float] = time.monotonic, **breaker_options):
+        '''
+        :param models: Пары (модель, относительная стоимость) в порядке убывания качества
+        :param policy: "quality", "latency" или "cost"
+        :param latency_budget: Допустимая задержка в секундах для политики "quality"
+        :param smoothing: Вес нового замера в сглаженной задержке
+        :param clock: Источник текущего времени в секундах
+        :param breaker_options: Параметры CircuitBreaker
+        '''
+        if policy not in ("quality", "latency", "cost"):
+            raise ValueError(f"Неизвестная политика {policy}")
+        self._models = [name for name, _ in models]
+        self._cost = dict(models)
+        self._policy = policy
+        self._latency_budget = latency_budget
+        self._smoothing = smoothing
+        self._latency: Dict[str, Optional[float]] = {name: None for name in self._models}
+        self._breakers = {name: CircuitBreaker(clock=clock, **breaker_options) for name in self._models}
+        self._requests = {name: 0 for name in self._models}
+
+    def choose(self) -> str:
+        '''
+        Возвращает модель для очередного запроса.
+        Если все предохранители открыты, возвращает последнюю (самую простую) модель.
+        '''
+        candidates = [name for name in self._models if self._breakers[name].available()]
+        if not candidates:
+            return self._models[-1]
+
+        if self._policy == "cost":
+            ordered = sorted(candidates, key=lambda name: self._cost[name])
+        elif self._policy == "latency":
+            # Модели без замеров пробуем первыми, чтобы узнать их задержку
+            ordered = sorted(candidates, key=lambda name: self._latency[name] or 0.0)
+        else:
+            fast = [name for name in candidates
+                    if self._latency[name] is None or self._latency[name] <= self._latency_budget]
+            ordered = fast + [name for name in candidates if name not in fast]
+
+        for name in ordered:
+            if self._breakers[name].allow():
+                self._requests[name] += 1
+                return name
+        return self._models[-1]
+
+    def record(self, model: str, latency: float, ok: bool):
+        '''
+        Учитывает результат запроса к модели.
+
+        :param model: Модель, которую вернул choose
+        :param latency: Время ответа в секундах
+        :param ok: Успешен ли запрос
+        '''
+        if model not in self._breakers:
+            return
+        self._breakers[model].record(ok)
+        if ok:
+            previous = self._latency[model]
+            self._latency[model] = latency if previous is None else \
+                previous + self._smoothing * (latency - previous)
+
+    def release(self, model: str):
+        '''
+        Сообщает, что запрос к модели, выбранной choose, завершился без результата
+        (см. CircuitBreaker.release).
+        '''
+        if model in self._breakers:
+            self._breakers[model].release()
+
+    def stats(self) -> Dict[str, Dict]:
+        '''
+        Состояние моделей: предохранитель, доля ошибок, сглаженная задержка, число запросов.
+        '''
+        return {
+            name: {
+                "state": self._breakers[name].state,
+                "error_rate": self._breakers[name].error_rate,
+                "latency": self._latency[name],
+                "requests": self._requests[name],
+            }
+            for name in self._models
+        }
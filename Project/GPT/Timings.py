@@ -0,0 +1,64 @@
+import time
+from collections import defaultdict
+from typing import Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    '''
+    Время выполнения этапов разбора одного сообщения (get_type, get_time_from, ...).
+    '''
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    async def measure(self, stage: str, awaitable: Awaitable[T]) -> T:
+        '''
+        Дожидается awaitable и записывает, сколько секунд занял этап stage.
+        Отменённые этапы тоже записываются — видно, сколько работы выброшено.
+        '''
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[stage] = time.perf_counter() - started
+
+    @property
+    def total(self) -> float:
+        '''
+        Время от создания объекта до текущего момента.
+        '''
+        return time.perf_counter() - self._started
+
+    def __str__(self):
+        stages = ", ".join(f"{stage}={duration * 1000:.0f}ms" for stage, duration in self.stages.items())
+        return f"total={self.total * 1000:.0f}ms ({stages})"
+
+
+class TimingStats:
+    '''
+    Накопленная статистика по этапам: число замеров, среднее и максимальное время.
+    '''
+
+    def __init__(self):
+        self._count = defaultdict(int)
+        self._total = defaultdict(float)
+        self._max = defaultdict(float)
+
+    def add(self, timings: StageTimings):
+        '''
+        Добавляет замеры одного сообщения, включая общее время под ключом "total".
+        '''
+        stages = dict(timings.stages, total=timings.total)
+        for stage, duration in stages.items():
+            self._count[stage] += 1
+            self._total[stage] += duration
+            self._max[stage] = max(self._max[stage], duration)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {"count": count, "avg": self._total[stage] / count, "max": self._max[stage]}
+            for stage, count in self._count.items()
+        }
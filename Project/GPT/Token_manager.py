@@ -0,0 +1,123 @@
+import asyncio
+import time
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class TokenError(Exception):
+    '''
+    Не удалось получить OAuth токен GigaChat.
+    '''
+
+
+class TokenManager:
+    '''
+    Хранит OAuth токен GigaChat и следит за сроком его действия:
+    - обновляет токен заранее, за refresh_margin секунд до истечения, в фоне;
+    - одновременные запросы токена ждут одно общее обновление, а не запускают своё;
+    - токен, на который API ответил 401, можно сбросить через invalidate.
+    '''
+
+    # Время жизни токена GigaChat, если в ответе нет expires_at
+    DEFAULT_LIFETIME = 30 * 60
+
+    def __init__(self, fetch: Callable[[], Awaitable[Dict]], refresh_margin: float = 60,
+                 clock: Callable[[], float] = time.time):
+        '''
+        :param fetch: Корутина, запрашивающая новый токен. Возвращает ответ OAuth-сервера
+                      ({"access_token": ..., "expires_at": <мс>})
+        :param refresh_margin: За сколько секунд до истечения обновлять токен
+        :param clock: Источник текущего времени в секундах
+        '''
+        self._fetch = fetch
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def expires_at(self) -> float:
+        '''
+        Момент истечения текущего токена (unix time, секунды).
+        '''
+        return self._expires_at
+
+    def is_valid(self) -> bool:
+        '''
+        Проверяет, что токен получен и ещё не истёк.
+        '''
+        return self._token is not None and self._clock() < self._expires_at
+
+    async def get_token(self) -> str:
+        '''
+        Возвращает действующий токен. Если токена нет или он истёк — дожидается обновления.
+        Если токен скоро истечёт — запускает обновление в фоне и сразу возвращает текущий.
+        '''
+        if self.is_valid():
+            if self._clock() >= self._expires_at - self._refresh_margin:
+                self._start_refresh()
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        '''
+        Обновляет токен. Все одновременные вызовы ждут один и тот же запрос к OAuth-серверу.
+        '''
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self, token: Optional[str] = None):
+        '''
+        Сбрасывает токен, например после ответа 401.
+
+        :param token: Токен, с которым был получен отказ. Если токен уже обновили, ничего не делаем
+        '''
+        if token is None or token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+
+    def close(self):
+        '''
+        Отменяет запланированное фоновое обновление.
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _start_refresh(self) -> asyncio.Future:
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._do_refresh())
+        return self._inflight
+
+    async def _do_refresh(self) -> str:
+        try:
+            response = await self._fetch()
+            if not isinstance(response, dict) or "access_token" not in response:
+                raise TokenError(f"Некорректный ответ OAuth-сервера: {response}")
+
+            now = self._clock()
+            expires_at = response.get("expires_at")
+            # GigaChat отдаёт expires_at в миллисекундах
+            expires_at = expires_at / 1000 if expires_at else now + self.DEFAULT_LIFETIME
+
+            self._token = response["access_token"]
+            self._expires_at = expires_at
+            self._schedule_refresh(expires_at - self._refresh_margin - now)
+            return self._token
+        finally:
+            self._inflight = None
+
+    def _schedule_refresh(self, delay: float):
+        self.close()
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0), self._background_refresh)
+
+    def _background_refresh(self):
+        self._timer = None
+        refresh = self._start_refresh()
+        refresh.add_done_callback(self._log_refresh_error)
+
+    @staticmethod
+    def _log_refresh_error(refresh: asyncio.Future):
+        if not refresh.cancelled() and refresh.exception() is not None:
+            logging.warning("Фоновое обновление токена GigaChat не удалось: %s", refresh.exception())
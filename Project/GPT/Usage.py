@@ -0,0 +1,203 @@
+import csv
+import logging
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+USAGE_FIELDS = ("requests", "prompt_tokens", "precached_prompt_tokens", "completion_tokens", "total_tokens",
+                "estimated_requests")
+GROUPS = ("day", "kind", "model", "client_id")
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTracker:
+    '''
+    Учёт расхода токенов GigaChat по дням, видам промптов, моделям и пользователям.
+
+    Блоки usage из ответов складываются в счётчики в памяти; раз в flush_interval секунд
+    (при очередной записи) и при close счётчики добавляются к таблице t_gpt_usage в SQLite.
+    Запросы, в ответе на которые не было usage (например, поток, закрытый досрочно),
+    учитываются по оценке и считаются отдельно в estimated_requests.
+
+    Файл может быть общим для нескольких процессов бота (webhook-воркеры), поэтому база работает
+    в режиме WAL, а занятый другим процессом файл ждём не дольше busy_timeout секунд.
+    Если сброс не удался, счётчики остаются в памяти до следующего сброса.
+    '''
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 60,
+                 prices: Optional[Dict[str, float]] = None, busy_timeout: float = 0.2,
+                 clock: Callable[[], float] = time.time):
+        '''
+        :param path: Файл SQLite. None — только счётчики в памяти
+        :param flush_interval: Как часто (в секундах) сбрасывать счётчики в SQLite
+        :param prices: Цена 1000 токенов по моделям для расчёта стоимости в отчётах
+        :param busy_timeout: Сколько секунд ждать файл, занятый другим процессом
+        :param clock: Источник текущего времени в секундах
+        '''
+        self._flush_interval = flush_interval
+        self._prices = prices or {}
+        self._clock = clock
+        self._flushed_at = clock()
+        self._pending: Dict[Tuple[str, str, str, str], Counter] = defaultdict(Counter)
+        self._totals: Dict[Tuple[str, str, str, str], Counter] = defaultdict(Counter)
+
+        # Таблицу создаём один раз при запуске, когда воркеры стартуют одновременно,
+        # поэтому здесь ждём занятый файл дольше, чем при сбросах
+        self.conn = sqlite3.connect(path, timeout=30) if path else None
+        if self.conn is not None:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS t_gpt_usage (
+                    day TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    client_id TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    precached_prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    completion_tokens INTEGER NOT NULL DEFAULT 0,
+                    total_tokens INTEGER NOT NULL DEFAULT 0,
+                    estimated_requests INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, kind, model, client_id)
+                )
+            ''')
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(t_gpt_usage)')}
+            if "estimated_requests" not in columns:
+                # Таблица создана до появления оценочного учёта
+                self.conn.execute('ALTER TABLE t_gpt_usage ADD COLUMN estimated_requests INTEGER NOT NULL DEFAULT 0')
+            self.conn.commit()
+            self.conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+
+    def record(self, kind: Optional[str], model: str, client_id: Union[str, Sequence[str], None], usage: Dict,
+               estimated: bool = False):
+        '''
+        Учитывает блок usage одного ответа.
+
+        :param kind: Вид промпта ("type", "event_title", ...)
+        :param model: Модель, которая ответила
+        :param client_id: Пользователь или список пользователей, если запрос общий (пакет get_type);
+                          в последнем случае токены делятся между ними поровну
+        :param usage: Блок usage из ответа GigaChat
+        :param estimated: usage не пришёл в ответе и посчитан по оценке
+        '''
+        clients = [client_id] if client_id is None or isinstance(client_id, str) else list(client_id)
+        values = dict(usage, requests=1, estimated_requests=int(estimated))
+        day = date.fromtimestamp(self._clock()).isoformat()
+        for index, client in enumerate(clients):
+            counters = self._pending[(day, kind or "other", model, client or "")]
+            for field in USAGE_FIELDS:
+                # Остаток от деления достаётся первому, чтобы сумма сходилась
+                share, rest = divmod(int(values.get(field) or 0), len(clients))
+                counters[field] += share + (rest if index == 0 else 0)
+
+        if self._clock() - self._flushed_at >= self._flush_interval:
+            self._try_flush()
+
+    def flush(self):
+        '''
+        Добавляет накопленные счётчики к таблице SQLite и очищает их.
+        Если файл занят, счётчики возвращаются в память, а ошибка пробрасывается.
+        '''
+        self._flushed_at = self._clock()
+        pending, self._pending = self._pending, defaultdict(Counter)
+        if self.conn is None:
+            for key, counters in pending.items():
+                self._totals[key].update(counters)
+            return
+        if not pending:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(f'''
+                    INSERT INTO t_gpt_usage ({", ".join(GROUPS + USAGE_FIELDS)})
+                    VALUES ({", ".join("?" * len(GROUPS + USAGE_FIELDS))})
+                    ON CONFLICT (day, kind, model, client_id) DO UPDATE SET
+                    {", ".join(f"{field} = {field} + excluded.{field}" for field in USAGE_FIELDS)}
+                ''', [key + tuple(counters[field] for field in USAGE_FIELDS) for key, counters in pending.items()])
+        except sqlite3.Error:
+            for key, counters in pending.items():
+                self._pending[key].update(counters)
+            raise
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось записать расход токенов в SQLite, повторим позже: {e}")
+
+    def report(self, group_by: Sequence[str] = ("kind",), since: Optional[date] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        '''
+        Сводка расхода, отсортированная по убыванию total_tokens.
+
+        :param group_by: Поля группировки из ("day", "kind", "model", "client_id")
+        :param since: Учитывать только дни начиная с этого
+        :param limit: Максимальное число строк
+        :return: список словарей: поля группировки, счётчики USAGE_FIELDS и cost — стоимость по ценам prices
+        '''
+        group_by = tuple(group_by)
+        if not set(group_by) <= set(GROUPS):
+            raise ValueError(f"Группировать можно только по {GROUPS}")
+        self._try_flush()
+
+        rows: Dict[Tuple, Counter] = defaultdict(Counter)
+        for key, counters in self._rows(since):
+            record = dict(zip(GROUPS, key))
+            rows[tuple(record[group] for group in group_by) + (record["model"],)].update(counters)
+
+        merged: Dict[Tuple, Dict] = {}
+        for key, counters in rows.items():
+            group, model = key[:-1], key[-1]
+            row = merged.setdefault(group, dict(zip(group_by, group), **{field: 0 for field in USAGE_FIELDS}, cost=0.0))
+            for field in USAGE_FIELDS:
+                row[field] += counters[field]
+            row["cost"] += counters["total_tokens"] / 1000 * self._prices.get(model, 0.0)
+
+        result = sorted(merged.values(), key=lambda row: row["total_tokens"], reverse=True)
+        return result[:limit] if limit else result
+
+    def export(self, path: str, since: Optional[date] = None) -> int:
+        '''
+        Выгружает все строки (день, вид промпта, модель, пользователь) в CSV.
+
+        :return: число выгруженных строк
+        '''
+        rows = self.report(GROUPS, since)
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=GROUPS + USAGE_FIELDS + ("cost",))
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+    def close(self):
+        '''
+        Сбрасывает счётчики и закрывает соединение с SQLite.
+        '''
+        if self.conn is not None:
+            # При остановке цикл событий уже не обслуживает пользователей, можно подождать файл
+            self.conn.execute('PRAGMA busy_timeout = 30000')
+        self._try_flush()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _rows(self, since: Optional[date]):
+        since = since.isoformat() if since else ""
+        if self.conn is None:
+            for key, counters in self._totals.items():
+                if key[0] >= since:
+                    yield key, counters
+            return
+        cursor = self.conn.execute(f'''
+            SELECT {", ".join(GROUPS + USAGE_FIELDS)} FROM t_gpt_usage WHERE day >= ?
+        ''', (since,))
+        for row in cursor:
+            yield row[:len(GROUPS)], Counter(dict(zip(USAGE_FIELDS, row[len(GROUPS):])))
+        # Счётчики, которые не удалось сбросить, пока занят файл
+        for key, counters in list(self._pending.items()):
+            if key[0] >= since:
+                yield key, counters
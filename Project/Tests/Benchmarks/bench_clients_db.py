@@ -0,0 +1,79 @@
+'''
+Бенчмарк схемы t_client до и после миграции 1 (WITHOUT ROWID, INTEGER telegram_id):
+размер файла, время миграции и задержка поиска по telegram_id на синтетической таблице.
+
+Запуск из папки Project: python Tests/Benchmarks/bench_clients_db.py [число строк]
+'''
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from Database.Database import migrate
+
+
+def lookup_latency(conn: sqlite3.Connection, ids, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for telegram_id in ids:
+            conn.execute('SELECT telegram_id, google_calendar_id, todoist_token FROM t_client WHERE telegram_id = ?',
+                         (telegram_id,)).fetchone()
+        best = min(best, (time.perf_counter() - start) / len(ids))
+    return best
+
+
+def file_size(conn: sqlite3.Connection, path: str) -> int:
+    conn.execute('VACUUM')
+    return os.path.getsize(path)
+
+
+def main(rows: int = 1_000_000, lookups: int = 100_000):
+    random.seed(0)
+    telegram_ids = random.sample(range(10 ** 8, 8 * 10 ** 9), rows)
+    probe = [str(telegram_id) for telegram_id in random.sample(telegram_ids, min(lookups, rows))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clients.db")
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE t_client (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_id TEXT UNIQUE NOT NULL,
+                google_calendar_id TEXT NOT NULL,
+                todoist_token TEXT NOT NULL
+            )
+        ''')
+        conn.executemany(
+            'INSERT INTO t_client (telegram_id, google_calendar_id, todoist_token) VALUES (?, ?, ?)',
+            ((str(telegram_id), f"user{telegram_id}@gmail.com", f"{telegram_id:040x}") for telegram_id in telegram_ids)
+        )
+        conn.commit()
+
+        size_before = file_size(conn, path)
+        latency_before = lookup_latency(conn, probe)
+
+        start = time.perf_counter()
+        migrate(conn, batch_size=50000)
+        migration_time = time.perf_counter() - start
+
+        size_after = file_size(conn, path)
+        latency_after = lookup_latency(conn, probe)
+        conn.close()
+
+    print(f"строк: {rows}, поисков: {len(probe)}")
+    print(f"размер файла: {size_before / 2 ** 20:.1f} МБ -> {size_after / 2 ** 20:.1f} МБ "
+          f"({size_after / size_before - 1:+.0%})")
+    print(f"поиск по telegram_id: {latency_before * 1e6:.2f} мкс -> {latency_after * 1e6:.2f} мкс "
+          f"({latency_after / latency_before - 1:+.0%})")
+    print(f"миграция: {migration_time:.1f} с")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,39 @@
+'''
+Бенчмарк локального разбора дат: скорость и доля фраз, разобранных без LLM.
+
+Запуск из папки Project: python Tests/Benchmarks/bench_date_parser.py
+'''
+import json
+import time
+
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from datetime import datetime
+from GPT.Date_parser import parse_time
+
+CORPUS = Path(__file__).parent.parent / "Unit" / "date_parser_corpus.json"
+
+
+def main(rounds: int = 2000):
+    cases = [(case["text"], datetime.fromisoformat(case["now"]))
+             for case in json.loads(CORPUS.read_text(encoding="utf-8"))]
+
+    parsed = sum(parse_time(text, now) is not None for text, now in cases)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, now in cases:
+            parse_time(text, now)
+    elapsed = time.perf_counter() - start
+
+    calls = rounds * len(cases)
+    print(f"фраз в корпусе: {len(cases)}")
+    print(f"разобрано локально: {parsed} ({parsed / len(cases):.0%})")
+    print(f"среднее время разбора: {elapsed / calls * 1e6:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import pytest
+
+from pathlib import Path
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from Database.Database import Client, Errors
+from Database.Async_database import AsyncClientsDB
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+@pytest.mark.asyncio
+async def test_same_api_as_clients_db(tmp_path):
+    db = AsyncClientsDB(str(tmp_path / "clients.db"))
+    assert await db.add_client("@client", "calendar_id", "todoist_token") > 0
+    assert await db.add_client("@client", "calendar_id", "todoist_token") == Errors.INTEGRITY_ERROR
+    assert await db.get_client("@client") == Client("@client", "calendar_id", "todoist_token")
+    assert await db.update_calendar_id("@client", "new_calendar_id")
+    assert await db.get_calendar_id("@client") == "new_calendar_id"
+    assert not await db.update_todoist_token("@stranger", "token")
+    await db.delete_client("@client")
+    assert await db.get_todoist_token("@client") == None
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_registrations_share_transactions(tmp_path):
+    db = AsyncClientsDB(str(tmp_path / "clients.db"))
+    results = await asyncio.gather(*(
+        db.add_client(f"@client_{index}", "calendar_id", "todoist_token") for index in range(50)
+    ), db.add_client("@client_0", "calendar_id", "todoist_token"))
+
+    # Повторная регистрация не откатывает остальные записи пакета
+    assert all(result > 0 for result in results[:-1])
+    assert results[-1] == Errors.INTEGRITY_ERROR
+    assert db.stats()["batches"] < 51
+    assert await db.get_client("@client_49") is not None
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_wal_mode(tmp_path):
+    db = AsyncClientsDB(str(tmp_path / "clients.db"))
+    mode = await db._run(lambda: db.db.conn.execute("PRAGMA journal_mode").fetchone()[0])
+    assert mode == "wal"
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_is_counted_once(tmp_path):
+    db = AsyncClientsDB(str(tmp_path / "clients.db"))
+    assert await db.add_client("@client", "calendar_id", "todoist_token") > 0
+    assert await db.get_client("@client") is not None
+    assert await db.get_client("@client") is not None
+    assert await db.get_client("@stranger") is None
+    stats = db.db.cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    await db.close()
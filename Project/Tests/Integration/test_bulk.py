@@ -0,0 +1,138 @@
+import pytest
+
+from pathlib import Path
+
+search_directory = Path('../')
+
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import sqlite3
+import threading
+
+from Database.Database import Client, ClientsDB
+from Database.Bulk import export_clients, import_clients, main, read_clients
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ClientsDB(str(tmp_path / "clients.db"))
+    yield db
+    db.conn.close()
+
+
+def test_import_reports_conflicts_per_row(db, tmp_path):
+    path = tmp_path / "clients.csv"
+    path.write_text(
+        "telegram_id,google_calendar_id,todoist_token\n"
+        "101,calendar_1,token_1\n"
+        "102,calendar_2,token_2\n"
+        "101,calendar_1b,token_1b\n"
+        "103,,token_3\n"
+        "104,calendar_4,token_4\n",
+        encoding="utf-8"
+    )
+    assert db.add_client("104", "old_calendar", "old_token") > 0
+
+    conflicts = []
+    report = import_clients(db, read_clients(str(path)), batch_size=2,
+                            on_conflict=lambda *conflict: conflicts.append(conflict))
+    # Повтор 101 попал в следующую пачку и там уже есть в таблице
+    assert (report.imported, report.conflicts, report.invalid) == (2, 2, 1)
+    assert sorted(conflicts) == [(4, "101", "exists"), (5, "103", "invalid"), (6, "104", "exists")]
+    assert db.get_client("101") == Client("101", "calendar_1", "token_1")
+    assert db.get_calendar_id("104") == "old_calendar"
+
+
+def test_duplicate_in_one_batch_and_replace(db, tmp_path):
+    path = tmp_path / "clients.jsonl"
+    path.write_text(
+        '{"telegram_id": 101, "google_calendar_id": "calendar_1", "todoist_token": "token_1"}\n'
+        '{"telegram_id": "101", "google_calendar_id": "calendar_1b", "todoist_token": "token_1b"}\n',
+        encoding="utf-8"
+    )
+    assert db.add_client("101", "old_calendar", "old_token") > 0
+    assert db.get_calendar_id("101") == "old_calendar"
+
+    conflicts = []
+    report = import_clients(db, read_clients(str(path)), replace=True,
+                            on_conflict=lambda *conflict: conflicts.append(conflict))
+    assert (report.imported, report.updated, report.conflicts) == (0, 1, 1)
+    assert conflicts == [(2, "101", "duplicate")]
+    # Кэш сброшен после импорта
+    assert db.get_calendar_id("101") == "calendar_1"
+
+
+def test_malformed_lines_are_reported(db, tmp_path):
+    path = tmp_path / "clients.jsonl"
+    path.write_text(
+        '{"telegram_id": 101, "google_calendar_id": "calendar_1", "todoist_token": "token_1"}\n'
+        '{"telegram_id": 102, "google_calendar_id": \n'
+        '[102, "calendar_2", "token_2"]\n'
+        '{"telegram_id": "@name", "google_calendar_id": "calendar_3", "todoist_token": "token_3"}\n'
+        '{"telegram_id": 104, "google_calendar_id": "calendar_4", "todoist_token": "token_4"}\n',
+        encoding="utf-8"
+    )
+    conflicts = []
+    report = import_clients(db, read_clients(str(path)), on_conflict=lambda *conflict: conflicts.append(conflict))
+    assert (report.imported, report.invalid) == (3, 2)
+    assert conflicts == [(2, "", "invalid"), (3, "", "invalid")]
+    assert db.get_calendar_id("104") == "calendar_4"
+    # Текстовый telegram_id таблица хранит как есть
+    assert db.get_calendar_id("@name") == "calendar_3"
+
+
+def test_non_canonical_ids_match_existing_clients(db):
+    assert db.add_client("123", "old_calendar", "old_token") > 0
+    records = [(1, ("0123", "calendar_1", "token_1")), (2, ("+124", "calendar_2", "token_2")),
+               (3, ("124", "calendar_3", "token_3")), (4, ("123.0", "calendar_4", "token_4"))]
+
+    conflicts = []
+    report = import_clients(db, records, on_conflict=lambda *conflict: conflicts.append(conflict))
+    assert (report.imported, report.conflicts, report.invalid) == (1, 2, 1)
+    assert sorted(conflicts) == [(1, "123", "exists"), (3, "124", "duplicate"), (4, "123.0", "invalid")]
+    assert db.get_client("124") == Client("124", "calendar_2", "token_2")
+
+    report = import_clients(db, [(1, ("0123", "calendar_1", "token_1"))], replace=True)
+    assert (report.imported, report.updated) == (0, 1)
+    assert db.get_calendar_id("123") == "calendar_1"
+
+
+@pytest.mark.parametrize("name", ["clients.csv", "clients.jsonl"])
+def test_export_import_round_trip(tmp_path, name):
+    source = ClientsDB(str(tmp_path / "source.db"))
+    for index in range(25):
+        source.add_client(str(1000 + index), f"calendar_{index}", f"token_{index}")
+    source.add_client("2000", "calendar, with comma", "token \"quoted\"")
+    source.add_client("@name", "calendar_name", "token_name")
+    assert export_clients(source, str(tmp_path / name), batch_size=7) == 27
+    source.conn.close()
+
+    assert main(["import", str(tmp_path / name), "--db", str(tmp_path / "target.db"), "--batch-size", "10"]) == 0
+    target = ClientsDB(str(tmp_path / "target.db"))
+    assert target.get_client("2000") == Client("2000", "calendar, with comma", "token \"quoted\"")
+    assert target.get_todoist_token("1024") == "token_24"
+    assert target.get_client("@name") == Client("@name", "calendar_name", "token_name")
+    assert target.conn.execute("SELECT COUNT(*) FROM t_client").fetchone()[0] == 27
+    target.conn.close()
+
+
+def test_batch_waits_for_busy_database(tmp_path):
+    path = str(tmp_path / "clients.db")
+    db = ClientsDB(path, busy_timeout=0.01, retries=5)
+    other = sqlite3.connect(path, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(0.1, other.commit)
+    release.start()
+    try:
+        report = import_clients(db, [(1, ("101", "calendar_1", "token_1"))])
+    finally:
+        release.join()
+        other.close()
+    assert report.imported == 1
+    assert db.lock_stats()["retries"] > 0
+    assert db.get_calendar_id("101") == "calendar_1"
+    db.conn.close()
@@ -10,7 +10,9 @@ for file_path in search_directory.rglob("Project"):
 import sys
 sys.path.append('project')
 
-from Database.Database import ClientsDB, Errors
+import multiprocessing
+import sqlite3
+from Database.Database import Client, ClientsDB, Errors, migrate, schema_version
 
 @pytest.fixture
 def db():
@@ -31,4 +33,172 @@ def test_get_info(db):
 
 def test_get_info_no_client(db):
     assert db.get_calendar_id("@stranger") == None
-    assert db.get_todoist_token("@stranger") == None
\ No newline at end of file
+    assert db.get_todoist_token("@stranger") == None
+
+
+def test_get_client(db):
+    db.delete_client("@client_record")
+    assert db.add_client("@client_record", "calendar_id", "todoist_token") > 0
+    assert db.get_client("@client_record") == Client("@client_record", "calendar_id", "todoist_token")
+    assert db.get_client("@stranger") == None
+
+def test_cached_client_is_invalidated_on_write(db):
+    db.delete_client("@cached_client")
+    assert db.get_client("@cached_client") == None
+    assert db.add_client("@cached_client", "calendar_id", "todoist_token") > 0
+    assert db.get_calendar_id("@cached_client") == "calendar_id"
+
+    misses = db.cache_stats()["misses"]
+    assert db.get_todoist_token("@cached_client") == "todoist_token"
+    assert db.cache_stats()["misses"] == misses
+
+    assert db.update_calendar_id("@cached_client", "new_calendar_id")
+    assert db.get_calendar_id("@cached_client") == "new_calendar_id"
+    assert db.update_todoist_token("@cached_client", "new_todoist_token")
+    assert db.get_todoist_token("@cached_client") == "new_todoist_token"
+
+    db.delete_client("@cached_client")
+    assert db.get_client("@cached_client") == None
+
+def test_failed_delete_keeps_batch(tmp_path):
+    db = ClientsDB(str(tmp_path / "clients.db"))
+    db.conn.execute("""CREATE TRIGGER keep_client BEFORE DELETE ON t_client WHEN OLD.telegram_id = '@kept'
+                       BEGIN SELECT RAISE(ABORT, 'kept'); END""")
+    db.add_client("@kept", "calendar_id", "todoist_token")
+    results = db.write_batch([("add_client", ("@first", "calendar_id", "todoist_token")),
+                              ("delete_client", ("@kept",)),
+                              ("add_client", ("@second", "calendar_id", "todoist_token"))])
+    assert results[0] == results[2] == 1
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert db.get_client("@first") and db.get_client("@second") and db.get_client("@kept")
+    with pytest.raises(sqlite3.IntegrityError):
+        db.delete_client("@kept")
+    db.close()
+
+class InterruptedConnection(sqlite3.Connection):
+    """Падает после двух скопированных пачек, как процесс, остановленный посреди миграции."""
+    batches = 0
+
+    def execute(self, sql, *args):
+        if sql.startswith("UPDATE t_migration_progress"):
+            self.batches += 1
+            if self.batches > 2:
+                raise sqlite3.OperationalError("interrupted")
+        return super().execute(sql, *args)
+
+def legacy_db(path, rows, factory=sqlite3.Connection):
+    conn = sqlite3.connect(path, factory=factory)
+    conn.execute('''
+        CREATE TABLE t_client (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id TEXT UNIQUE NOT NULL,
+            google_calendar_id TEXT NOT NULL,
+            todoist_token TEXT NOT NULL
+        )
+    ''')
+    conn.executemany('INSERT INTO t_client (telegram_id, google_calendar_id, todoist_token) VALUES (?, ?, ?)',
+                     [(str(1000 + index), f"calendar_{index}", f"token_{index}") for index in range(rows)])
+    conn.commit()
+    return conn
+
+def test_migration_to_without_rowid(tmp_path):
+    legacy_db(str(tmp_path / "clients.db"), 25).close()
+    db = ClientsDB(str(tmp_path / "clients.db"))
+    assert schema_version(db.conn) == 1
+    assert "WITHOUT ROWID" in db.conn.execute("SELECT sql FROM sqlite_master WHERE name = 't_client'").fetchone()[0]
+    assert db.get_client("1007") == Client("1007", "calendar_7", "token_7")
+    assert db.add_client("@name", "calendar_id", "todoist_token") > 0
+    assert db.get_todoist_token("@name") == "todoist_token"
+
+def test_interrupted_migration_resumes_with_concurrent_writes(tmp_path):
+    conn = legacy_db(str(tmp_path / "clients.db"), 25, factory=InterruptedConnection)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, batch_size=5)
+    conn.close()
+
+    conn = sqlite3.connect(str(tmp_path / "clients.db"))
+    assert schema_version(conn) == 0
+    assert conn.execute("SELECT last_id FROM t_migration_progress").fetchone()[0] == 10
+
+    # Пока миграция не закончена, старая таблица продолжает меняться
+    conn.execute("UPDATE t_client SET todoist_token = 'new_token' WHERE telegram_id = '1000'")
+    conn.execute("DELETE FROM t_client WHERE telegram_id = '1024'")
+    conn.execute("INSERT INTO t_client (telegram_id, google_calendar_id, todoist_token) VALUES ('2000', 'c', 't')")
+    conn.commit()
+
+    assert migrate(conn, batch_size=5) == 1
+    rows = dict(conn.execute("SELECT telegram_id, todoist_token FROM t_client").fetchall())
+    assert len(rows) == 25
+    assert rows[1000] == "new_token" and 1024 not in rows and rows[2000] == "t"
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0] == 0
+
+
+def start_client_db(path: str, barrier, results) -> None:
+    barrier.wait()
+    try:
+        db = ClientsDB(path, wal=True)
+        results.put((schema_version(db.conn), db.conn.execute("SELECT COUNT(*) FROM t_client").fetchone()[0]))
+        db.close()
+    except Exception as e:
+        results.put(repr(e))
+
+def test_processes_migrate_at_startup(tmp_path):
+    path = str(tmp_path / "clients.db")
+    legacy_db(path, 50000).close()
+
+    context = multiprocessing.get_context("fork")
+    barrier, results = context.Barrier(4), context.Queue()
+    workers = [context.Process(target=start_client_db, args=(path, barrier, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    started = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    # Мигрирует один процесс, остальные дожидаются его или продолжают его пачки
+    assert started == [(1, 50000)] * 4
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 't_%'").fetchone()[0] == 2
+    conn.close()
+
+
+def register_clients(path: str, worker: int, count: int, results) -> None:
+    db = ClientsDB(path, readers=2, wal=True, cache_size=0, busy_timeout=0.05, retries=50)
+    added = 0
+    for index in range(count):
+        telegram_id = f"{worker * count + index}"
+        added += db.add_client(telegram_id, "calendar_id", "todoist_token") > 0
+        added += db.get_client(telegram_id) is not None
+    results.put((added, db.lock_stats()))
+    db.close()
+
+def test_processes_share_database(tmp_path):
+    path = str(tmp_path / "clients.db")
+    ClientsDB(path, wal=True).close()
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=register_clients, args=(path, worker, 100, results)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    stats = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    # Каждая регистрация и последующее чтение прошли, несмотря на короткий busy_timeout
+    assert [added for added, _ in stats] == [200] * 4
+    assert all(lock["write_waits"] == 100 and lock["read_waits"] == 100 for _, lock in stats)
+    db = ClientsDB(path)
+    assert db.conn.execute("SELECT COUNT(*) FROM t_client").fetchone()[0] == 400
+    db.close()
+
+def test_read_only_pool(tmp_path):
+    db = ClientsDB(str(tmp_path / "clients.db"), readers=2, wal=True)
+    assert db.add_client("@client", "calendar_id", "todoist_token") > 0
+    assert db.get_client("@client") == Client("@client", "calendar_id", "todoist_token")
+    reader = db._readers.get()
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("DELETE FROM t_client")
+    db._readers.put(reader)
+    assert db.lock_stats()["read_waits"] == 1
+    db.close()
@@ -0,0 +1,67 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from GPT.Batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_items_share_one_batch(self):
+        batches = []
+
+        async def process(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process, window=0.01, max_items=10)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        self.assertEqual(results, [0, 2, 4, 6, 8])
+        self.assertEqual(batches, [[0, 1, 2, 3, 4]])
+
+    async def test_full_batch_is_sent_without_waiting(self):
+        batches = []
+
+        async def process(items):
+            batches.append(items)
+            return items
+
+        batcher = MicroBatcher(process, window=10, max_items=2)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), 1)
+        self.assertEqual(results, [0, 1, 2, 3])
+        self.assertEqual(batches, [[0, 1], [2, 3]])
+        self.assertEqual(batcher.stats()["avg_size"], 2)
+
+    async def test_error_reaches_every_caller(self):
+        async def process(items):
+            raise RuntimeError("quota")
+
+        batcher = MicroBatcher(process, window=0.01)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    async def test_cancelled_caller_is_dropped_from_batch(self):
+        batches = []
+
+        async def process(items):
+            batches.append(items)
+            return items
+
+        batcher = MicroBatcher(process, window=0.02)
+        cancelled = asyncio.ensure_future(batcher.submit(1))
+        kept = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        self.assertEqual(await kept, 2)
+        self.assertEqual(batches, [[2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import tempfile
+import os
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from datetime import date
+from GPT.Cache import ResponseCache, relative_to_now
+
+RESPONSE = {'choices': [{'message': {'content': 'event'}}]}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_key_normalization(self):
+        self.assertEqual(ResponseCache.make_key("type", "Тренировка  в 10!"),
+                         ResponseCache.make_key("type", "тренировка в 10"))
+        self.assertNotEqual(ResponseCache.make_key("type", "купить продукты"),
+                            ResponseCache.make_key("task_title", "купить продукты"))
+        self.assertNotEqual(ResponseCache.make_key("time_from", "завтра в 10", date(2024, 12, 21)),
+                            ResponseCache.make_key("time_from", "завтра в 10", date(2024, 12, 22)))
+
+    def test_memory_and_disk_tiers(self):
+        cache = ResponseCache(self.path, clock=self.clock)
+        key = cache.make_key("type", "купить продукты")
+        self.assertIsNone(cache.get(key))
+        cache.set(key, RESPONSE)
+        self.assertEqual(cache.get(key), RESPONSE)
+        cache.close()
+
+        restarted = ResponseCache(self.path, clock=self.clock)
+        self.assertEqual(restarted.get(key), RESPONSE)
+        self.assertEqual(restarted.get(key), RESPONSE)
+        stats = restarted.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"]), (1, 1))
+        restarted.close()
+
+    def test_ttl(self):
+        cache = ResponseCache(self.path, ttl=60, clock=self.clock)
+        key = cache.make_key("type", "купить продукты")
+        cache.set(key, RESPONSE)
+        self.clock.now += 61
+        self.assertIsNone(cache.get(key))
+        cache.close()
+
+    def test_size_limits(self):
+        cache = ResponseCache(self.path, max_items=2, max_rows=3, clock=self.clock)
+        keys = [cache.make_key("type", str(i)) for i in range(5)]
+        for key in keys:
+            self.clock.now += 1
+            cache.set(key, RESPONSE)
+        self.assertEqual(cache.stats()["memory_size"], 2)
+        cache.evict()
+        rows = cache.conn.execute('SELECT COUNT(*) FROM t_gpt_cache').fetchone()[0]
+        self.assertEqual(rows, 3)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(cache.get(keys[4]), RESPONSE)
+        cache.close()
+
+
+    def test_writes_are_batched(self):
+        cache = ResponseCache(self.path, max_items=1, flush_size=3, clock=self.clock)
+        keys = [cache.make_key("type", str(i)) for i in range(4)]
+        for key in keys[:2]:
+            cache.set(key, RESPONSE)
+        self.assertEqual(cache.conn.execute('SELECT COUNT(*) FROM t_gpt_cache').fetchone()[0], 0)
+        # Вытесненный из памяти, но ещё не записанный ответ не теряется
+        self.assertEqual(cache.get(keys[0]), RESPONSE)
+
+        cache.set(keys[2], RESPONSE)
+        self.assertEqual(cache.conn.execute('SELECT COUNT(*) FROM t_gpt_cache').fetchone()[0], 3)
+        cache.set(keys[3], RESPONSE)
+        cache.close()
+        restarted = ResponseCache(self.path, clock=self.clock)
+        self.assertEqual(restarted.get(keys[3]), RESPONSE)
+        restarted.close()
+
+    def test_relative_time(self):
+        self.assertTrue(relative_to_now("Созвон через час"))
+        self.assertTrue(relative_to_now("Напомни позже"))
+        self.assertFalse(relative_to_now("Встреча завтра в 15:00"))
+        self.assertFalse(relative_to_now("Купить черешню"))
+
+
+class TestAsyncRead(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    async def test_disk_is_read_off_the_loop(self):
+        cache = ResponseCache(self.path)
+        key = cache.make_key("type", "купить продукты")
+        cache.set(key, RESPONSE)
+        cache.close()
+
+        restarted = ResponseCache(self.path)
+        self.assertEqual(await restarted.aget(key), RESPONSE)
+        self.assertEqual(await restarted.aget(key), RESPONSE)
+        self.assertIsNone(await restarted.aget(cache.make_key("type", "другое")))
+        stats = restarted.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"], stats["misses"]), (1, 1, 1))
+        restarted.close()
+
+    async def test_read_error_is_a_miss(self):
+        cache = ResponseCache(self.path)
+        key = cache.make_key("type", "купить продукты")
+        cache.conn.execute('DROP TABLE t_gpt_cache')
+        with self.assertLogs("GPT.Cache", "WARNING"):
+            self.assertIsNone(await cache.aget(key))
+        with self.assertLogs("GPT.Cache", "WARNING"):
+            self.assertIsNone(cache.get(key))
+        self.assertEqual((cache.stats()["misses"], cache.stats()["read_errors"]), (2, 2))
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from GPT.Credential_pool import CredentialPool
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def fetch(encoded):
+    return {"access_token": encoded, "expires_at": 0}
+
+
+class TestCredentialPool(unittest.TestCase):
+    def take(self, pool, count):
+        names = []
+        for _ in range(count):
+            credential = pool.acquire()
+            names.append(credential.name)
+            pool.release(credential)
+        return names
+
+    def test_weighted_round_robin(self):
+        pool = CredentialPool(["a:1", ("b:2", 2)], fetch)
+        names = self.take(pool, 6)
+        self.assertEqual(names.count("0-a"), 2)
+        self.assertEqual(names.count("1-b"), 4)
+
+    def test_least_loaded_key_is_chosen(self):
+        pool = CredentialPool(["a:1", "b:2"], fetch)
+        busy = pool.acquire()
+        self.assertNotEqual(pool.acquire().name, busy.name)
+
+    def test_exhausted_key_leaves_rotation_until_window_resets(self):
+        clock = FakeClock()
+        pool = CredentialPool(["a:1", "b:2"], fetch, clock=clock)
+        first = pool.credentials[0]
+        pool.exhausted(first, retry_after=30)
+        self.assertNotIn("0-a", self.take(pool, 4))
+        self.assertTrue(pool.available())
+
+        pool.exhausted(pool.credentials[1], retry_after=10)
+        self.assertFalse(pool.available())
+        self.assertEqual(pool.reset_in(), 10)
+
+        clock.now += 31
+        self.assertIn("0-a", self.take(pool, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
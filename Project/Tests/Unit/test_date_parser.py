@@ -0,0 +1,48 @@
+import unittest
+import json
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from datetime import datetime
+from GPT.Date_parser import parse_time
+
+CORPUS = Path(__file__).with_name("date_parser_corpus.json")
+
+
+class TestDateParser(unittest.TestCase):
+    def test_golden_corpus(self):
+        '''
+        Сверяет разбор с эталонным корпусом. None в корпусе означает, что фраза уходит в LLM.
+        '''
+        for case in json.loads(CORPUS.read_text(encoding="utf-8")):
+            with self.subTest(text=case["text"]):
+                parsed = parse_time(case["text"], datetime.fromisoformat(case["now"]))
+                if case["timefrom"] is None:
+                    self.assertIsNone(parsed)
+                else:
+                    self.assertIsNotNone(parsed)
+                    self.assertEqual(parsed.timefrom, case["timefrom"])
+                    self.assertEqual(parsed.dateto, case["dateto"])
+
+    def test_weekday_same_as_today_is_next_week(self):
+        parsed = parse_time("Концерт в субботу", datetime(2024, 12, 21, 12, 0))
+        self.assertEqual(parsed.timefrom, {'date': '2024-12-28'})
+
+    def test_past_explicit_date_rolls_to_next_year(self):
+        parsed = parse_time("Дедлайн 20 декабря", datetime(2024, 12, 21, 12, 0))
+        self.assertEqual(parsed.timefrom, {'date': '2025-12-20'})
+
+    def test_unparsed_numbers_fall_back(self):
+        self.assertIsNone(parse_time("Купить 2 литра молока завтра", datetime(2024, 12, 21, 12, 0)))
+        self.assertIsNone(parse_time("Встреча завтра и в пятницу", datetime(2024, 12, 21, 12, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from Deadline import Deadline, DeadlineExceeded, within
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_call_is_cancelled(self):
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with self.assertRaises(DeadlineExceeded):
+            await Deadline(0.05).run(slow())
+        self.assertTrue(cancelled.is_set())
+
+    async def test_fast_call_returns_result(self):
+        async def fast():
+            return 42
+        self.assertEqual(await within(Deadline(1), fast()), 42)
+        self.assertEqual(await within(None, fast()), 42)
+
+    async def test_expired_deadline_does_not_start(self):
+        async def never():
+            raise AssertionError("не должно запускаться")
+        with self.assertRaises(DeadlineExceeded):
+            await Deadline(0).run(never())
+
+    def test_sub_deadline_is_bounded_by_parent(self):
+        parent = Deadline(5)
+        self.assertLessEqual(parent.sub(1).remaining(), 1)
+        self.assertLessEqual(parent.sub(100).expires_at, parent.expires_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from GPT.Extraction import ExtractionError, parse_extraction, to_request, to_time
+from Request import RequestType
+
+
+class TestExtraction(unittest.TestCase):
+    def test_event(self):
+        raw = '''```json
+        {"type": "event", "title": "Встреча с Олегом", "description": null,
+         "start": "2024-12-22T19:00", "end": "2024-12-22T20:00"}
+        ```'''
+        request = to_request(parse_extraction(raw), "client")
+        self.assertEqual(request.type, RequestType.EVENT)
+        self.assertEqual(request.body, "Встреча с Олегом")
+        self.assertEqual(request.timefrom, {'dateTime': '2024-12-22T19:00:00+03:00'})
+        self.assertEqual(request.dateto, {'dateTime': '2024-12-22T20:00:00+03:00'})
+        self.assertIsNone(request.extra)
+
+    def test_event_without_end_and_swapped_times(self):
+        data = parse_extraction('{"type": "event", "title": "Митап", "start": "2024-12-27"}')
+        self.assertEqual(to_request(data, "client").dateto, {'date': '2024-12-27'})
+
+        data = parse_extraction('{"type": "event", "title": "Митап", "start": "2024-12-27T16:00", "end": "2024-12-27T15:30:00"}')
+        request = to_request(data, "client")
+        self.assertEqual(request.timefrom, {'dateTime': '2024-12-27T15:30:00+03:00'})
+        self.assertEqual(request.dateto, {'dateTime': '2024-12-27T16:00:00+03:00'})
+
+    def test_task(self):
+        data = parse_extraction('{"type": "task", "title": "Купить продукты", "description": "", "start": null, "end": null}')
+        request = to_request(data, "client")
+        self.assertEqual(request.type, RequestType.GOAL)
+        self.assertEqual(request.timefrom, {})
+        self.assertEqual(request.dateto, {})
+        self.assertIsNone(request.extra)
+
+    def test_else(self):
+        self.assertIsNone(to_request(parse_extraction('{"type": "else", "title": "привет"}'), "client"))
+
+    def test_malformed(self):
+        for raw in ['event', '{"type": "event"', '{"type": "meeting", "title": "x"}',
+                    '{"type": "task", "title": 5}', '{"type": "event", "title": "x", "start": null}',
+                    '{"type": "event", "title": "x", "start": "завтра"}', '[1, 2]']:
+            with self.assertRaises(ExtractionError, msg=raw):
+                parse_extraction(raw)
+
+    def test_forced_type_is_validated(self):
+        raw = '{"type": "task", "title": "Купить продукты", "start": null}'
+        self.assertEqual(parse_extraction(raw, "task")["type"], "task")
+        # Событие, заданное явно (/e), без даты начала — ошибка, а не событие без времени
+        with self.assertRaises(ExtractionError):
+            parse_extraction(raw, "event")
+        data = parse_extraction('{"type": "event", "title": "Митап", "start": "2024-12-27"}', "task")
+        self.assertEqual(to_request(data, "client").type, RequestType.GOAL)
+
+    def test_to_time(self):
+        self.assertEqual(to_time("2024-12-03 16:00"), {'dateTime': '2024-12-03T16:00:00+03:00'})
+        self.assertEqual(to_time("2024-02-30"), {})
+        self.assertEqual(to_time(None), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
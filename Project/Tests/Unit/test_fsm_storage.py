@@ -0,0 +1,128 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import os
+import sqlite3
+import tempfile
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from Bot.Fsm_storage import SQLiteStorage
+
+
+class Form(StatesGroup):
+    waiting = State()
+
+
+def key(user_id):
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSQLiteStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.clock = Clock()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def storage(self, **kwargs):
+        return SQLiteStorage(self.path, clock=self.clock, **kwargs)
+
+    async def test_state_survives_restart(self):
+        storage = self.storage()
+        await storage.set_state(key(1), Form.waiting)
+        await storage.update_data(key(1), {"calendar_id": "abc"})
+        await storage.close()
+
+        storage = self.storage()
+        self.assertEqual(await storage.get_state(key(1)), Form.waiting.state)
+        self.assertEqual(await storage.get_data(key(1)), {"calendar_id": "abc"})
+        self.assertIsNone(await storage.get_state(key(2)))
+        await storage.close()
+
+    async def test_writes_are_batched(self):
+        storage = self.storage(batch_size=3)
+        for user_id in range(5):
+            await storage.set_state(key(user_id), Form.waiting)
+        self.assertEqual(storage.stats()["flushes"], 1)
+        self.assertEqual(storage.stats()["dirty"], 2)
+        await storage.close()
+        self.assertEqual(storage.stats()["written"], 5)
+
+    async def test_cleared_state_is_deleted(self):
+        storage = self.storage()
+        await storage.set_state(key(1), Form.waiting)
+        storage.flush()
+        await storage.set_state(key(1), None)
+        await storage.close()
+
+        storage = self.storage()
+        count = storage._connection().execute("SELECT COUNT(*) FROM t_fsm").fetchone()[0]
+        self.assertEqual(count, 0)
+        await storage.close()
+
+    async def test_idle_state_expires(self):
+        storage = self.storage(ttl=60)
+        await storage.set_state(key(1), Form.waiting)
+        await storage.set_state(key(2), Form.waiting)
+        storage.flush()
+
+        self.clock.now += 30
+        await storage.set_state(key(2), Form.waiting)
+        self.clock.now += 40
+        storage.flush()
+        self.assertIsNone(await storage.get_state(key(1)))
+        self.assertEqual(await storage.get_state(key(2)), Form.waiting.state)
+        self.assertEqual(storage.stats()["expired"], 1)
+        await storage.close()
+
+    async def test_memory_is_bounded(self):
+        storage = self.storage(max_entries=10)
+        for user_id in range(50):
+            await storage.set_state(key(user_id), Form.waiting)
+        self.assertLessEqual(storage.stats()["entries"], 10)
+        # Вытесненные из памяти состояния читаются из SQLite
+        self.assertEqual(await storage.get_state(key(0)), Form.waiting.state)
+        await storage.close()
+
+    async def test_failed_flush_keeps_changes(self):
+        storage = self.storage(batch_size=1, max_entries=1, busy_timeout=0.01)
+        await storage.get_state(key(1))
+        # Другой процесс держит блокировку записи
+        other = sqlite3.connect(self.path)
+        other.execute("BEGIN IMMEDIATE")
+        await storage.set_state(key(1), Form.waiting)
+        await storage.set_state(key(2), Form.waiting)
+        self.assertEqual(storage.stats()["dirty"], 2)
+        self.assertEqual(storage.stats()["entries"], 2)
+        self.assertGreater(storage.stats()["failed_flushes"], 0)
+        other.rollback()
+        other.close()
+
+        storage.flush()
+        await storage.close()
+        storage = self.storage()
+        self.assertEqual(await storage.get_state(key(1)), Form.waiting.state)
+        self.assertEqual(await storage.get_state(key(2)), Form.waiting.state)
+        await storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,10 +12,89 @@ sys.path.append('project')
 
 from unittest.mock import patch
 from datetime import datetime
-from GPT.GPT_module import GPT
+from GPT.GPT_module import GPT, bracket_closed, type_decided
+from GPT.Extraction import ExtractionError
+from GPT.Router import CircuitBreaker, ModelRouter
 from Query import Query
-from Request import RequestType
+from Request import Request, RequestType
 import asyncio
+import json
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    """Ответ aiohttp: тело для json() или строки потока для content."""
+    def __init__(self, body=None, lines=(), status=200, headers=None, delay=0):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+        self.lines = [line.encode('utf-8') for line in lines]
+        self.delay = delay
+        self.read = 0
+        self.closed = False
+        self.content = self._content()
+
+    async def _content(self):
+        for line in self.lines:
+            self.read += 1
+            yield line
+
+    async def json(self):
+        return self.body
+
+    def close(self):
+        self.closed = True
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Сессия aiohttp: на запрос токена отвечает токеном, на запросы к модели — ответами по очереди."""
+    closed = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.token_requests = 0
+
+    def post(self, url, headers=None, data=None):
+        if "oauth" in url:
+            self.token_requests += 1
+            return FakeResponse({"access_token": "token", "expires_at": 4102444800000})
+        self.requests.append((json.loads(data), headers))
+        return self.responses.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def answer(content, **usage):
+    return FakeResponse({"choices": [{"message": {"role": "assistant", "content": content}}],
+                         **({"usage": usage} if usage else {})})
+
+
+def stream(*parts):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}" for part in parts]
+    return FakeResponse(lines=lines + ["data: [DONE]"])
+
+
+def make_gpt(*responses, **kwargs):
+    gpt = GPT(credentials=["client:secret"], batch_window=0, **kwargs)
+    gpt._session = FakeSession(*responses)
+    return gpt
+
 
 class TestGPTModule(unittest.TestCase):
     def setUp(self):
@@ -102,5 +181,243 @@ class TestGPTModule(unittest.TestCase):
         expected_time = {'dateTime': '2024-12-03T16:00:00+03:00'}
         self.assertEqual(time, expected_time)
 
+
+class TestGPTRequests(unittest.IsolatedAsyncioTestCase):
+    async def test_prompt_fetches_token_only_in_post(self):
+        gpt = make_gpt(answer("Созвон"))
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='Созвон завтра')
+        with patch.object(gpt, 'check_token') as check_token:
+            self.assertEqual(await gpt.get_event_content(content), "Созвон")
+        check_token.assert_not_called()
+        self.assertEqual(gpt._session.token_requests, 1)
+        await gpt.close()
+
+    async def test_cancelled_probe_is_released(self):
+        clock = FakeClock()
+        gpt = make_gpt(FakeResponse(delay=10), answer("ok"))
+        gpt.router = ModelRouter(clock=clock, min_requests=1, open_seconds=10)
+        gpt.router.record("GigaChat-Max", 1.0, False)
+        clock.now += 11
+
+        # Пробный запрос к GigaChat-Max отменён дедлайном, не дождавшись ответа
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(gpt.request("message"), 0.05)
+        self.assertEqual(gpt.router.stats()["GigaChat-Max"]["state"], CircuitBreaker.HALF_OPEN)
+
+        await gpt.request("message")
+        self.assertEqual([payload["model"] for payload, _ in gpt._session.requests], ["GigaChat-Max"] * 2)
+        self.assertEqual(gpt.router.stats()["GigaChat-Max"]["state"], CircuitBreaker.CLOSED)
+        await gpt.close()
+
+    async def test_quick_add_skips_classification(self):
+        gpt = make_gpt(answer('{"type": "event", "title": "Купить продукты", "start": "2024-12-22"}'))
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='купить продукты')
+        with patch.object(gpt.classifier, 'classify') as classify:
+            parsed = await gpt.parse_message(content, request_type=RequestType.GOAL)
+        classify.assert_not_called()
+        self.assertEqual(parsed, Request(RequestType.GOAL, 'test_client', 'Купить продукты', {'date': '2024-12-22'}, {}, None))
+        self.assertEqual(len(gpt._session.requests), 1)
+        self.assertIn('Это задача.', gpt._session.requests[0][0]["messages"][-1]["content"])
+        await gpt.close()
+
+    async def test_forced_event_without_start_falls_back_to_fields(self):
+        gpt = make_gpt(answer('{"type": "task", "title": "Купить продукты", "start": null}'))
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='купить продукты')
+        with self.assertRaises(ExtractionError):
+            await gpt.extract(content, RequestType.EVENT)
+
+        with patch.object(gpt, 'parse_message_by_fields', return_value=None) as by_fields:
+            self.assertIsNone(await gpt.parse_message(content, request_type=RequestType.EVENT))
+        self.assertEqual(by_fields.call_args.args[-1], RequestType.EVENT)
+        await gpt.close()
+
+    async def test_early_stopped_stream_is_counted_by_estimate(self):
+        gpt = make_gpt(stream("[2024-12-22; ", "19:00]", " и ещё текст"), answer("task", prompt_tokens=20,
+                                                                               completion_tokens=1, total_tokens=21))
+        await gpt.request("message", 25, stop=bracket_closed, kind="time_from", client_id="1")
+        await gpt.request("message", 25, kind="type", client_id="1")
+
+        usage = {row["kind"]: row for row in gpt.usage.report(("kind",))}
+        self.assertEqual((usage["time_from"]["requests"], usage["time_from"]["estimated_requests"]), (1, 1))
+        self.assertGreater(usage["time_from"]["total_tokens"], 0)
+        self.assertEqual((usage["type"]["requests"], usage["type"]["estimated_requests"]), (1, 0))
+        await gpt.close()
+
+    async def test_failed_type_answers_are_not_cached(self):
+        gpt = make_gpt(stream("else"), stream("task"), stream("task"), stream("task"))
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='абракадабра')
+        self.assertEqual(await gpt.get_type(content), RequestType.ELSE)
+        self.assertEqual(await gpt.get_type(content, temp=10), RequestType.GOAL)
+        self.assertEqual(await gpt.get_type(content, temp=10), RequestType.GOAL)
+        self.assertEqual(await gpt.get_type(content), RequestType.GOAL)
+        self.assertEqual(len(gpt._session.requests), 4)
+        await gpt.close()
+
+    async def test_cached_type_answer_is_not_recorded_again(self):
+        gpt = make_gpt(stream("event"))
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='обсудить бюджет с Петей')
+        with patch.object(gpt.classifier, 'classify', return_value=None), \
+                patch.object(gpt.classifier, 'record_llm') as record_llm:
+            self.assertEqual(await gpt.get_type(content), RequestType.EVENT)
+            self.assertEqual(await gpt.get_type(content), RequestType.EVENT)
+        record_llm.assert_called_once_with('обсудить бюджет с Петей', RequestType.EVENT)
+        self.assertEqual(len(gpt._session.requests), 1)
+        await gpt.close()
+
+    async def test_relative_and_invalid_extractions_are_not_cached(self):
+        event = '{"type": "event", "title": "Созвон", "start": "2024-12-21T13:00"}'
+        gpt = make_gpt(answer(event), answer(event), answer('не JSON'), answer('не JSON'),
+                       answer(event.replace("Созвон", "Митап")))
+        now = datetime(2024, 12, 21, 12, 0)
+        relative = Query(client_id='test_client', current_time=now, content='Созвон через час')
+        await gpt.extract(relative)
+        await gpt.extract(relative)
+        self.assertEqual(len(gpt._session.requests), 2)
+
+        content = Query(client_id='test_client', current_time=now, content='Митап сегодня')
+        for _ in range(2):
+            with self.assertRaises(ExtractionError):
+                await gpt.extract(content)
+        self.assertEqual((await gpt.extract(content)).body, "Митап")
+        self.assertEqual((await gpt.extract(content)).body, "Митап")
+        self.assertEqual(len(gpt._session.requests), 5)
+        await gpt.close()
+
+    async def test_extract_builds_request_from_json(self):
+        gpt = make_gpt(answer('```json\n{"type": "event", "title": "Созвон", "description": "с командой", '
+                              '"start": "2024-12-22T16:00", "end": null}\n```'),
+                       answer('{"type": "else", "title": "Как дела?"}'))
+        now = datetime(2024, 12, 21, 12, 0)
+        parsed = await gpt.extract(Query(client_id='test_client', current_time=now,
+                                         content='Созвон с командой завтра в 15:00'))
+        # Время, однозначно разобранное Date_parser, надёжнее ответа модели
+        self.assertEqual(parsed, Request(RequestType.EVENT, 'test_client', 'Созвон',
+                                         {'dateTime': '2024-12-22T15:00:00+03:00'},
+                                         {'dateTime': '2024-12-22T16:00:00+03:00'}, 'с командой'))
+        self.assertEqual(gpt._session.requests[0][0]["messages"][0]["role"], "system")
+
+        self.assertIsNone(await gpt.extract(Query(client_id='test_client', current_time=now, content='Как дела?')))
+        self.assertEqual(len(gpt._session.requests), 2)
+        await gpt.close()
+
+    def test_parse_locally(self):
+        gpt = make_gpt()
+        now = datetime(2024, 12, 21, 12, 0)
+        event = Query(client_id='test_client', current_time=now, content='Созвон завтра в 15:00')
+        self.assertEqual(gpt.parse_locally(event, RequestType.EVENT),
+                         Request(RequestType.EVENT, 'test_client', 'Созвон завтра в 15:00',
+                                 {'dateTime': '2024-12-22T15:00:00+03:00'},
+                                 {'dateTime': '2024-12-22T16:00:00+03:00'}, None))
+
+        # Событие без даты локально не разобрать, а задача может быть и без неё
+        task = Query(client_id='test_client', current_time=now, content='Купить продукты')
+        self.assertIsNone(gpt.parse_locally(task, RequestType.EVENT))
+        self.assertEqual(gpt.parse_locally(task, RequestType.GOAL),
+                         Request(RequestType.GOAL, 'test_client', 'Купить продукты', {}, {}, None))
+
+        with patch.object(gpt.classifier, 'predict', return_value=(RequestType.GOAL, 0.55)):
+            self.assertIsNone(gpt.parse_locally(task))
+        with patch.object(gpt.classifier, 'predict', return_value=(RequestType.GOAL, 0.9)):
+            self.assertEqual(gpt.parse_locally(task).type, RequestType.GOAL)
+
+
+class TestSpeculativeParsing(unittest.IsolatedAsyncioTestCase):
+    async def test_requests_of_other_branch_are_cancelled(self):
+        content = Query(client_id='test_client', current_time=datetime(2024, 12, 21, 12, 0), content='купить продукты')
+        for speculative in (False, True):
+            gpt = GPT(speculative=speculative)
+            calls, cancelled = [], []
+
+            def stage(name, value, delay=0.0):
+                async def run(content):
+                    calls.append(name)
+                    try:
+                        await asyncio.sleep(delay)
+                    except asyncio.CancelledError:
+                        cancelled.append(name)
+                        raise
+                    return value
+                return run
+
+            async def get_type(content):
+                await asyncio.sleep(0.01)
+                return RequestType.GOAL
+
+            gpt.get_type_with_retries = get_type
+            gpt.get_event_content = stage("event_title", "Встреча", 10)
+            gpt.get_description = stage("description", None, 10)
+            gpt.get_time_to = stage("time_to", {}, 10)
+            gpt.get_time_from = stage("time_from", {'date': '2024-12-22'})
+            gpt.get_task_content = stage("task_title", "Купить продукты")
+
+            parsed = await gpt.parse_message_by_fields(content)
+            await asyncio.sleep(0)
+            self.assertEqual(parsed, Request(RequestType.GOAL, 'test_client', 'Купить продукты',
+                                             {'date': '2024-12-22'}, {}, None))
+            with self.subTest(speculative=speculative):
+                if speculative:
+                    # Запросы по полям ушли до ответа о типе, запросы ветки события отменены
+                    self.assertEqual(len(calls), 5)
+                    self.assertEqual(sorted(cancelled), ["description", "event_title", "time_to"])
+                else:
+                    self.assertEqual(sorted(calls), ["task_title", "time_from"])
+                    self.assertEqual(cancelled, [])
+            await gpt.close()
+
+
+class TestStreaming(unittest.IsolatedAsyncioTestCase):
+    def test_stop_predicates(self):
+        self.assertTrue(type_decided("Это Event"))
+        self.assertTrue(type_decided("задача: todo"))
+        self.assertFalse(type_decided("Это"))
+        self.assertTrue(bracket_closed("[2024-12-22; 19:00]"))
+        self.assertFalse(bracket_closed("[2024-12-22; 19:"))
+
+    async def test_stream_is_closed_once_answer_is_decided(self):
+        decided = stream("Это ", "event", ", потому что есть время", " и место")
+        undecided = stream("[2024-12-22; ", "19:00")
+        gpt = make_gpt(decided, undecided)
+
+        result = await gpt.request("message", stop=type_decided)
+        self.assertEqual(result["choices"][0]["message"]["content"], "Это event")
+        self.assertEqual(result["choices"][0]["finish_reason"], "early_stop")
+        self.assertTrue(decided.closed)
+        self.assertEqual(decided.read, 2)
+        self.assertTrue(gpt._session.requests[0][0]["stream"])
+
+        # Условие так и не выполнилось: поток дочитывается до [DONE]
+        result = await gpt.request("message", stop=bracket_closed)
+        self.assertEqual(result["choices"][0]["message"]["content"], "[2024-12-22; 19:00")
+        self.assertFalse(undecided.closed)
+        self.assertEqual(undecided.read, 3)
+        self.assertEqual(gpt.stream_counters, {"streams": 2, "early_stops": 1})
+        await gpt.close()
+
+
+class TestPromptSessions(unittest.IsolatedAsyncioTestCase):
+    async def test_sessions_per_credential_and_kind(self):
+        usage = {"prompt_tokens": 100, "precached_prompt_tokens": 300, "completion_tokens": 1, "total_tokens": 101}
+        gpt = GPT(credentials=["first:secret", "second:secret"], batch_window=0)
+        gpt._session = FakeSession(*(answer("task", **usage) for _ in range(4)), answer("ok"))
+        # Ключи пула чередуются: first, second, first, second
+        for kind in ("event_title", "event_title", "event_title", "description"):
+            await gpt.request("message", kind=kind)
+        await gpt.request("message")
+
+        sessions = [headers.get("X-Session-ID") for _, headers in gpt._session.requests]
+        self.assertEqual(sessions[0], sessions[2])
+        self.assertEqual(len(set(sessions[:4])), 3)
+        self.assertIsNone(sessions[4])
+        first, second = gpt.credentials.credentials
+        self.assertEqual(sessions[0], gpt._session_id(first.name, "event_title"))
+        self.assertEqual(sessions[3], gpt._session_id(second.name, "description"))
+
+        stats = gpt.prompt_cache_stats()
+        self.assertEqual(stats["event_title"]["requests"], 3)
+        self.assertEqual(stats["event_title"]["precached_prompt_tokens"], 900)
+        self.assertAlmostEqual(stats["event_title"]["cached_share"], 0.75)
+        await gpt.close()
+
+
 if __name__ == '__main__':
     unittest.main()
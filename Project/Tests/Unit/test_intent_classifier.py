@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import os
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from GPT.Intent_classifier import IntentClassifier, TYPE_EXAMPLES
+from Request import RequestType
+
+
+class TestIntentClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = IntentClassifier(threshold=0.85, audit_rate=0)
+
+    def test_obvious_cases(self):
+        self.assertEqual(self.classifier.classify("Встреча с командой завтра в 15:00"), RequestType.EVENT)
+        self.assertEqual(self.classifier.classify("Экзамен по алгебре послезавтра"), RequestType.EVENT)
+        self.assertEqual(self.classifier.classify("Нужно купить продукты"), RequestType.GOAL)
+        self.assertEqual(self.classifier.classify("Позвонить маме"), RequestType.GOAL)
+
+    def test_prompt_examples(self):
+        correct = sum(self.classifier.predict(text)[0] == label for text, label in TYPE_EXAMPLES)
+        self.assertGreaterEqual(correct, len(TYPE_EXAMPLES) - 1)
+
+    def test_stems_match_word_starts(self):
+        self.assertEqual(IntentClassifier._matches("Убрать коллекцию марок"), (False, True))
+        self.assertEqual(IntentClassifier._matches("Сверить прейскурант"), (False, True))
+        self.assertEqual(IntentClassifier._matches("Лекция и рейс в Москву"), (True, False))
+        self.assertEqual(IntentClassifier._matches("Заплатить за день рождения"), (True, True))
+
+    def test_audit_sends_confident_answers_to_llm(self):
+        classifier = IntentClassifier(audit_rate=1)
+        self.assertIsNone(classifier.classify("Встреча с командой завтра в 15:00"))
+        self.assertEqual(classifier.counters["audited"], 1)
+        self.assertEqual(IntentClassifier().audit_rate, 0.05)
+
+    def test_unclear_goes_to_llm(self):
+        self.assertIsNone(self.classifier.classify("привет как дела"))
+        self.assertEqual(self.classifier.counters["below_threshold"], 1)
+
+    def test_rule_conflict_goes_to_llm(self):
+        # "Сделать" — задача, "встреч" — событие: n-граммы сами по себе переуверены
+        _, confidence = self.classifier.predict("Сделать презентацию к встрече")
+        self.assertLess(confidence, 0.85)
+        self.assertIsNone(self.classifier.classify("Сделать презентацию к встрече"))
+        self.assertIsNone(self.classifier.classify("Подготовить отчёт для совещания"))
+
+    def test_counters(self):
+        self.classifier.classify("Купить продукты")
+        self.classifier.record_llm("Подготовка к контрольной в среду", RequestType.GOAL)
+        self.classifier.record_llm("абракадабра", RequestType.ELSE)
+        stats = self.classifier.stats()
+        self.assertEqual(stats["local_hits"], 1)
+        self.assertEqual(stats["llm_calls"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+        self.assertEqual(stats["agree"] + stats["disagree"], 1)
+
+    def test_history_is_saved_and_loaded(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        try:
+            IntentClassifier(history_path=path).record_llm("Стрижка у Маши", RequestType.EVENT)
+            self.assertIn("Стрижка у Маши", Path(path).read_text(encoding="utf-8"))
+            reloaded = IntentClassifier(history_path=path)
+            self.assertEqual(sum(reloaded._docs.values()), sum(self.classifier._docs.values()) + 1)
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from Bot.Job_queue import JobQueue
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_jobs_of_one_chat_run_in_order(self):
+        jobs = JobQueue(workers=4)
+        jobs.start()
+        done = []
+
+        def job(chat_id, index, delay):
+            async def run():
+                await asyncio.sleep(delay)
+                done.append((chat_id, index))
+            return run
+
+        # Первая задача чата 1 самая долгая: вторая не должна её обогнать
+        jobs.submit(1, job(1, 0, 0.05))
+        jobs.submit(1, job(1, 1, 0))
+        jobs.submit(2, job(2, 0, 0))
+        await jobs.close()
+
+        self.assertEqual([index for chat_id, index in done if chat_id == 1], [0, 1])
+        # Чат 2 не ждёт чат 1
+        self.assertLess(done.index((2, 0)), done.index((1, 0)))
+
+    async def test_chats_run_in_parallel_up_to_workers(self):
+        jobs = JobQueue(workers=2)
+        jobs.start()
+        running = []
+        peak = []
+
+        async def run():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+
+        for chat_id in range(5):
+            jobs.submit(chat_id, run)
+        await jobs.close()
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(jobs.stats()["completed"], 5)
+
+    async def test_full_queue_rejects(self):
+        jobs = JobQueue(workers=1, max_size=2)
+
+        async def run():
+            pass
+
+        self.assertTrue(jobs.submit(1, run))
+        self.assertTrue(jobs.submit(2, run))
+        self.assertFalse(jobs.submit(3, run))
+        jobs.start()
+        await jobs.close()
+
+        stats = jobs.stats()
+        self.assertEqual((stats["completed"], stats["rejected"], stats["depth"], stats["max_depth"]), (2, 1, 0, 2))
+
+    async def test_failed_job_does_not_stop_chat(self):
+        jobs = JobQueue(workers=1)
+        jobs.start()
+        done = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def run():
+            done.append(1)
+
+        jobs.submit(1, fail)
+        jobs.submit(1, run)
+        await jobs.close()
+        self.assertEqual(done, [1])
+        self.assertEqual(jobs.stats()["failed"], 1)
+
+    async def test_duplicate_of_queued_or_running_job_is_coalesced(self):
+        jobs = JobQueue(workers=2)
+        jobs.start()
+        done = []
+
+        def job(name):
+            async def run():
+                await asyncio.sleep(0.02)
+                done.append(name)
+            return run
+
+        self.assertTrue(jobs.submit(1, job("first"), key="купить молоко"))
+        await asyncio.sleep(0)
+        # Первая задача уже выполняется, вторая ждёт: повтор любой из них не ставится
+        self.assertTrue(jobs.submit(1, job("second"), key="позвонить маме"))
+        self.assertFalse(jobs.submit(1, job("first again"), key="купить молоко"))
+        self.assertFalse(jobs.submit(1, job("second again"), key="позвонить маме"))
+        self.assertTrue(jobs.has_job(1, "купить молоко"))
+        # Тот же текст в другом чате — другая задача
+        self.assertTrue(jobs.submit(2, job("other chat"), key="купить молоко"))
+        await jobs._drain()
+
+        self.assertFalse(jobs.has_job(1, "купить молоко"))
+        self.assertTrue(jobs.submit(1, job("later"), key="купить молоко"))
+        await jobs.close()
+        self.assertEqual(sorted(done), ["first", "later", "other chat", "second"])
+        self.assertEqual((jobs.stats()["coalesced"], jobs.stats()["rejected"]), (2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from GPT.Rate_limiter import RateLimiter, RateLimitExceeded, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_high_priority_overtakes_waiting_low_priority(self):
+        limiter = RateLimiter(rps=100, max_concurrency=1)
+        order = []
+
+        async def worker(name, priority):
+            async with limiter.limit(priority=priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.ensure_future(worker("first", PRIORITY_LOW))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, worker("low", PRIORITY_LOW), worker("high", PRIORITY_HIGH))
+        self.assertEqual(order, ["first", "high", "low"])
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    async def test_requests_per_second_are_spread(self):
+        limiter = RateLimiter(rps=20)
+        limiter._requests = 1.0
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            async with limiter.limit():
+                pass
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+
+    async def test_backoff_pauses_and_slows_down(self):
+        limiter = RateLimiter(rps=10)
+        limiter.backoff(0.05)
+        self.assertEqual(limiter.rps, 5)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async with limiter.limit():
+            pass
+        self.assertGreaterEqual(loop.time() - started, 0.05)
+        self.assertEqual(limiter.stats()["throttled"], 1)
+
+    async def test_full_queue_rejects(self):
+        limiter = RateLimiter(max_concurrency=1, max_queue=1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with self.assertRaises(RateLimitExceeded):
+            await limiter.acquire()
+        limiter.release()
+        await waiting
+        limiter.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
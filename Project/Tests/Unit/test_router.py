@@ -0,0 +1,96 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+from GPT.Router import CircuitBreaker, ModelRouter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_breaker_opens_and_recovers(self):
+        router = ModelRouter(clock=self.clock, min_requests=4, open_seconds=30)
+        for _ in range(4):
+            self.assertEqual(router.choose(), "GigaChat-Max")
+            router.record("GigaChat-Max", 1.0, False)
+        self.assertEqual(router.stats()["GigaChat-Max"]["state"], CircuitBreaker.OPEN)
+        self.assertEqual(router.choose(), "GigaChat-Pro")
+
+        # После open_seconds пропускается один пробный запрос
+        self.clock.now += 31
+        self.assertEqual(router.choose(), "GigaChat-Max")
+        self.assertEqual(router.choose(), "GigaChat-Pro")
+        router.record("GigaChat-Max", 1.0, True)
+        self.assertEqual(router.stats()["GigaChat-Max"]["state"], CircuitBreaker.CLOSED)
+        self.assertEqual(router.choose(), "GigaChat-Max")
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(min_requests=1, open_seconds=10, clock=self.clock)
+        breaker.record(False)
+        self.assertFalse(breaker.allow())
+        self.clock.now += 11
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_released_probe_lets_next_probe_through(self):
+        router = ModelRouter(clock=self.clock, min_requests=1, open_seconds=10)
+        router.record("GigaChat-Max", 1.0, False)
+        self.clock.now += 11
+        self.assertEqual(router.choose(), "GigaChat-Max")
+        self.assertEqual(router.choose(), "GigaChat-Pro")
+
+        # Пробный запрос отменили, не получив ответа: модель снова можно пробовать
+        router.release("GigaChat-Max")
+        self.assertEqual(router.stats()["GigaChat-Max"]["state"], CircuitBreaker.HALF_OPEN)
+        self.assertEqual(router.choose(), "GigaChat-Max")
+
+    def test_lost_probe_expires(self):
+        breaker = CircuitBreaker(min_requests=1, open_seconds=10, probe_timeout=60, clock=self.clock)
+        breaker.record(False)
+        self.clock.now += 11
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.available())
+        self.clock.now += 61
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+    def test_slow_model_is_skipped_by_quality_policy(self):
+        router = ModelRouter(latency_budget=5.0, clock=self.clock)
+        router.record("GigaChat-Max", 12.0, True)
+        self.assertEqual(router.choose(), "GigaChat-Pro")
+
+    def test_cost_and_latency_policies(self):
+        self.assertEqual(ModelRouter(policy="cost", clock=self.clock).choose(), "GigaChat")
+        router = ModelRouter(policy="latency", clock=self.clock)
+        for name, latency in (("GigaChat-Max", 3.0), ("GigaChat-Pro", 1.0), ("GigaChat", 2.0)):
+            router.record(name, latency, True)
+        self.assertEqual(router.choose(), "GigaChat-Pro")
+
+    def test_all_open_falls_back_to_last_model(self):
+        router = ModelRouter(clock=self.clock, min_requests=1)
+        for name in ("GigaChat-Max", "GigaChat-Pro", "GigaChat"):
+            router.record(name, 1.0, False)
+        self.assertEqual(router.choose(), "GigaChat")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+from GPT.Token_manager import TokenManager, TokenError
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenManager(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.calls = 0
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"access_token": f"token-{self.calls}", "expires_at": (self.clock.now + 1800) * 1000}
+
+    async def test_concurrent_callers_share_one_fetch(self):
+        manager = TokenManager(self.fetch, clock=self.clock)
+        tokens = await asyncio.gather(*(manager.get_token() for _ in range(50)))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(tokens), {"token-1"})
+        manager.close()
+
+    async def test_expired_token_is_refreshed(self):
+        manager = TokenManager(self.fetch, clock=self.clock)
+        self.assertEqual(await manager.get_token(), "token-1")
+        self.clock.now += 1801
+        self.assertEqual(await manager.get_token(), "token-2")
+        manager.close()
+
+    async def test_refresh_ahead_of_expiry_returns_current_token(self):
+        manager = TokenManager(self.fetch, refresh_margin=60, clock=self.clock)
+        await manager.get_token()
+        self.clock.now += 1790
+        self.assertEqual(await manager.get_token(), "token-1")
+        await asyncio.sleep(0.05)
+        self.assertEqual(await manager.get_token(), "token-2")
+        manager.close()
+
+    async def test_invalidate_only_stale_token(self):
+        manager = TokenManager(self.fetch, clock=self.clock)
+        await manager.get_token()
+        manager.invalidate("some-old-token")
+        self.assertTrue(manager.is_valid())
+        manager.invalidate("token-1")
+        self.assertFalse(manager.is_valid())
+        self.assertEqual(await manager.get_token(), "token-2")
+        manager.close()
+
+    async def test_bad_response_raises(self):
+        async def fetch():
+            return -1
+        manager = TokenManager(fetch, clock=self.clock)
+        with self.assertRaises(TokenError):
+            await manager.get_token()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import csv
+import os
+import sqlite3
+import tempfile
+from GPT.Usage import UsageTracker
+
+
+class FakeClock:
+    def __init__(self, now=1735000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+USAGE = {"prompt_tokens": 30, "precached_prompt_tokens": 300, "completion_tokens": 5, "total_tokens": 35}
+
+
+class TestUsageTracker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "usage.db")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_report_groups_by_kind_and_client(self):
+        tracker = UsageTracker(self.path, prices={"GigaChat": 1.0}, clock=self.clock)
+        tracker.record("type", "GigaChat", "1", USAGE)
+        tracker.record("type", "GigaChat", "2", USAGE)
+        tracker.record("description", "GigaChat", "1", USAGE)
+
+        by_kind = {row["kind"]: row for row in tracker.report(("kind",))}
+        self.assertEqual(by_kind["type"]["requests"], 2)
+        self.assertEqual(by_kind["type"]["total_tokens"], 70)
+        self.assertAlmostEqual(by_kind["type"]["cost"], 0.07)
+
+        by_client = {row["client_id"]: row for row in tracker.report(("client_id",))}
+        self.assertEqual(by_client["1"]["precached_prompt_tokens"], 600)
+        tracker.close()
+
+    def test_batch_usage_is_split_between_clients(self):
+        tracker = UsageTracker(None, clock=self.clock)
+        tracker.record("type_batch", "GigaChat", ["1", "2"], USAGE)
+        by_client = {row["client_id"]: row for row in tracker.report(("client_id",))}
+        self.assertEqual(by_client["1"]["total_tokens"] + by_client["2"]["total_tokens"], 35)
+        self.assertEqual(by_client["1"]["requests"] + by_client["2"]["requests"], 1)
+
+    def test_counters_survive_restart(self):
+        tracker = UsageTracker(self.path, flush_interval=3600, clock=self.clock)
+        tracker.record("type", "GigaChat", "1", USAGE)
+        tracker.close()
+
+        tracker = UsageTracker(self.path, clock=self.clock)
+        tracker.record("type", "GigaChat", "1", USAGE)
+        self.assertEqual(tracker.report(("kind",))[0]["requests"], 2)
+
+        export = os.path.join(self.directory.name, "usage.csv")
+        self.assertEqual(tracker.export(export), 1)
+        with open(export, encoding="utf-8") as file:
+            self.assertEqual(next(csv.DictReader(file))["total_tokens"], "70")
+        tracker.close()
+
+
+    def test_estimated_requests_are_counted(self):
+        tracker = UsageTracker(None, clock=self.clock)
+        tracker.record("time_from", "GigaChat", "1", USAGE)
+        tracker.record("time_from", "GigaChat", "1", {"prompt_tokens": 40, "completion_tokens": 2, "total_tokens": 42},
+                       estimated=True)
+        row = tracker.report(("kind",))[0]
+        self.assertEqual((row["requests"], row["estimated_requests"], row["total_tokens"]), (2, 1, 77))
+
+    def test_old_table_gets_estimated_column(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            CREATE TABLE t_gpt_usage (
+                day TEXT NOT NULL, kind TEXT NOT NULL, model TEXT NOT NULL, client_id TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0, prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                precached_prompt_tokens INTEGER NOT NULL DEFAULT 0, completion_tokens INTEGER NOT NULL DEFAULT 0,
+                total_tokens INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, kind, model, client_id)
+            )
+        ''')
+        conn.execute("INSERT INTO t_gpt_usage VALUES ('2024-12-21', 'type', 'GigaChat', '1', 3, 30, 0, 3, 33)")
+        conn.commit()
+        conn.close()
+
+        tracker = UsageTracker(self.path, clock=self.clock)
+        tracker.record("type", "GigaChat", "1", USAGE, estimated=True)
+        row = tracker.report(("kind",))[0]
+        self.assertEqual((row["requests"], row["estimated_requests"]), (4, 1))
+        tracker.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+
+from pathlib import Path
+
+search_directory = Path('../')
+for file_path in search_directory.rglob("Project"):
+    project = file_path.resolve()
+
+import sys
+sys.path.append('project')
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import sqlite3
+import tempfile
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram.fsm.storage.base import StorageKey
+from Bot.Fsm_storage import SQLiteStorage
+from Bot.Webhook_server import WebhookServer, shard_for, update_user_id
+from GPT.Cache import ResponseCache
+from GPT.Usage import UsageTracker
+
+
+def message_update(update_id, user_id):
+    return {"update_id": update_id, "message": {"message_id": 1, "from": {"id": user_id}, "text": "привет"}}
+
+
+class TestSharding(unittest.TestCase):
+    def test_user_id_from_update(self):
+        self.assertEqual(update_user_id(message_update(1, 42)), 42)
+        self.assertEqual(update_user_id({"update_id": 2, "callback_query": {"from": {"id": 7}}}), 7)
+        self.assertEqual(update_user_id({"update_id": 3, "poll_answer": {"user": {"id": 9}}}), 9)
+        self.assertIsNone(update_user_id({"update_id": 4, "poll": {"id": "p"}}))
+
+    def test_same_user_same_shard(self):
+        shards = {shard_for(message_update(update_id, 1234567), 4) for update_id in range(20)}
+        self.assertEqual(shards, {1234567 % 4})
+        self.assertEqual(shard_for({"update_id": 6, "poll": {"id": "p"}}, 4), 2)
+
+
+class TestWebhookHandler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = WebhookServer(workers=2, secret="s3cret")
+        self.server.queues = [queue.Queue(maxsize=1), queue.Queue(maxsize=1)]
+        app = web.Application()
+        app.router.add_post(self.server.path, self.server.handle)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def post(self, update, secret="s3cret"):
+        response = await self.client.post(self.server.path, json=update,
+                                          headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+        return response.status
+
+    async def test_routes_update_to_user_shard(self):
+        self.assertEqual(await self.post(message_update(1, 3)), 200)
+        self.assertEqual(self.server.queues[1].get_nowait()["update_id"], 1)
+        self.assertTrue(self.server.queues[0].empty())
+
+    async def test_rejects_wrong_secret_and_full_shard(self):
+        self.assertEqual(await self.post(message_update(1, 2), secret="wrong"), 403)
+        self.assertEqual(await self.post(message_update(2, 2)), 200)
+        self.assertEqual(await self.post(message_update(3, 2)), 503)
+        self.assertEqual(self.server.counters, {"accepted": 1, "rejected": 1, "forbidden": 1})
+
+    async def test_draining_server_refuses_updates(self):
+        self.server._draining = True
+        self.assertEqual(await self.post(message_update(1, 2)), 503)
+
+
+def use_shared_stores(directory: str, worker: int, count: int, barrier):
+    # Как воркер вебхук-сервера: свои соединения к тем же файлам, что и у остальных
+    cache = ResponseCache(os.path.join(directory, "gpt_cache.db"), flush_size=1, busy_timeout=0.01)
+    usage = UsageTracker(os.path.join(directory, "gpt_usage.db"), flush_interval=0, busy_timeout=0.01)
+    storage = SQLiteStorage(os.path.join(directory, "fsm_storage.db"), batch_size=1, busy_timeout=0.01)
+
+    async def main():
+        for index in range(count):
+            user_id = worker * count + index
+            cache.set(f"{worker}:{index}", {"type": "TASK"})
+            usage.record("type", "GigaChat", str(user_id), {"total_tokens": 10})
+            await storage.update_data(StorageKey(bot_id=1, chat_id=user_id, user_id=user_id), {"step": index})
+        await storage.close()
+
+    barrier.wait()
+    asyncio.run(main())
+    cache.close()
+    usage.close()
+
+
+class TestSharedStores(unittest.TestCase):
+    def test_workers_share_files(self):
+        workers, count = 4, 50
+        with tempfile.TemporaryDirectory() as directory:
+            context = multiprocessing.get_context("fork")
+            barrier = context.Barrier(workers)
+            processes = [context.Process(target=use_shared_stores, args=(directory, worker, count, barrier))
+                         for worker in range(workers)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join(60)
+            self.assertEqual([process.exitcode for process in processes], [0] * workers)
+
+            # Ни одна запись не потерялась, хотя процессы писали одновременно с коротким busy_timeout
+            for name, table in (("gpt_cache.db", "t_gpt_cache"), ("fsm_storage.db", "t_fsm")):
+                conn = sqlite3.connect(os.path.join(directory, name))
+                self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], workers * count)
+                self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+                conn.close()
+            usage = UsageTracker(os.path.join(directory, "gpt_usage.db"))
+            self.assertEqual(usage.report(("kind",))[0]["requests"], workers * count)
+            self.assertEqual(usage.report(("kind",))[0]["total_tokens"], workers * count * 10)
+            usage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
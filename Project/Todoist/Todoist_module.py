@@ -1,6 +1,7 @@
 import requests
 from typing import Optional
 from Request import Request
+from Deadline import Deadline, DeadlineExceeded, within
 import aiohttp
 
 class TodoistModule:
@@ -42,7 +43,7 @@ class TodoistModule:
                     return True
                 return False
 
-    async def create_task(self, task_request: Request) -> Optional[str]:
+    async def create_task(self, task_request: Request, deadline: Optional[Deadline] = None) -> Optional[str]:
         """
         Создаёт задачу в Todoist.
 
@@ -55,6 +56,7 @@ class TodoistModule:
 
         Args:
             task_request (Request): Request с типом GOAL, body = имя задачи, extra = описание задачи.
+            deadline (Optional[Deadline]): Бюджет времени на запрос. Если истёк — возвращаем ошибку.
 
         Returns:
             Optional[str]: None при успехе, иначе строка вида "Error <код>: <текст>".
@@ -76,10 +78,16 @@ class TodoistModule:
             if due_string:
                 data["due_string"] = due_string  # Передаём в корректном формате
 
+        try:
+            return await within(deadline, self._post_task(url, data))
+        except DeadlineExceeded:
+            return "Error timeout: Todoist не ответил вовремя"
+
+    async def _post_task(self, url: str, data: dict) -> Optional[str]:
         async with aiohttp.ClientSession() as session:
             async with session.post(url, headers=self.headers, json=data, ssl=False) as response:
                 if response.status == 200 or response.status == 204:
                     return None  # Успех
                 else:
-                    return f"Error {response.status_code}: {response.text}"
+                    return f"Error {response.status}: {await response.text()}"
 